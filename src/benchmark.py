@@ -0,0 +1,183 @@
+"""
+Benchmark headless do GraphicsEngine.
+
+    python src/benchmark.py --objects 100 1000 10000 --frames 300 --output bench.json
+    python src/benchmark.py --compare bench_antigo.json
+    python src/benchmark.py --objects 10000 100000 --workers 1 4 8 --instanced on
+
+Gera cenas com N cubos/esferas via Scene.add_objects_from_arrays, roda frames sem limite de FPS
+num contexto standalone e grava FPS, tempo de CPU por etapa e pico de memória em JSON.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+import psutil
+from main import GraphicsEngine
+from profiler import COUNTERS
+from scene_file import TYPE_NAMES
+from parallel import DEFAULT_WORKERS, gil_enabled
+from scheduler import STEP_RATE
+
+STAGES = ('simulate', 'begin', 'scene_update', 'draw', 'gpu_sync')  # as do meio vêm de render_stages()
+SPACING = 3.0
+
+
+def populate(app, count, obj_type):
+    """ Distribui `count` objetos numa grade no plano XZ à frente da câmera """
+    side = int(np.ceil(np.sqrt(count)))
+    i = np.arange(count)
+    pos = np.stack([(i % side - side / 2) * SPACING, np.full(count, -2.0), -(i // side) * SPACING], axis=1)
+    types = np.full(count, TYPE_NAMES.index(obj_type), dtype='u1')
+    app.scene.add_objects_from_arrays(types, np.zeros(count, dtype='i4'), pos,
+                                      np.zeros((count, 3)), np.ones((count, 3)))
+
+
+def run_case(count, obj_type, frames, warmup, window_size, instanced, culling, step_rate, workers):
+    app = GraphicsEngine(window_size=window_size, instanced=instanced, headless=True, step_rate=step_rate,
+                         workers=workers)
+    app.scene.culling = culling
+    populate(app, count, obj_type)
+    app.mesh.texture.wait()
+    renderer = app.ctx.info['GL_RENDERER']
+
+    process = psutil.Process()
+    peak_rss = process.memory_info().rss
+    app.run_frames(warmup)
+
+    stage_times = {stage: np.zeros(frames) for stage in STAGES}
+    frame_times = np.zeros(frames)
+    for frame in range(frames):
+        app.profiler.begin_frame()
+        t0 = time.perf_counter()
+        app.get_time()
+        app.scheduler.advance()
+        start = time.perf_counter()
+        stage_times['simulate'][frame] = start - t0
+        # Mesmas etapas, na mesma ordem, que GraphicsEngine.render
+        for stage, _, run in app.render_stages():
+            run()
+            end = time.perf_counter()
+            stage_times[stage][frame] += end - start
+            start = end
+        app.ctx.finish()
+        t1 = time.perf_counter()
+        stage_times['gpu_sync'][frame] = t1 - start
+        frame_times[frame] = t1 - t0
+        peak_rss = max(peak_rss, process.memory_info().rss)
+    app.profiler.begin_frame()
+    app.profiler.resolve_gpu(latency=0)
+    rows = list(app.profiler.rows)[-frames:]
+    gpu_times = [row['gpu_ms'] for row in rows if row['gpu_ms'] is not None]
+    app.destroy()
+
+    return {
+        'objects': count,
+        'type': obj_type,
+        'instanced': instanced,
+        'culling': culling,
+        'frames': frames,
+        'step_rate': step_rate,
+        'workers': workers,
+        'renderer': renderer,
+        'fps': frames / frame_times.sum(),
+        'frame_ms': {'mean': frame_times.mean() * 1000,
+                     'p50': np.percentile(frame_times, 50) * 1000,
+                     'p95': np.percentile(frame_times, 95) * 1000},
+        'stages_ms': {stage: times.mean() * 1000 for stage, times in stage_times.items()},
+        'gpu_ms': float(np.mean(gpu_times)) if gpu_times else None,
+        'counters': {name: float(np.mean([row[name] for row in rows])) for name in COUNTERS},
+        'peak_rss_mb': peak_rss / 2 ** 20,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(result):
+    return result['objects'], result['type'], result['instanced'], result['culling'], result.get('workers', 1)
+
+
+def report_speedup(results):
+    """ Speedup de cada quantidade de workers em relação ao menor número testado """
+    groups = {}
+    for result in results:
+        groups.setdefault(case_key(result)[:4], []).append(result)
+    print("\nSpeedup por workers (FPS e etapa scene_update)")
+    for (count, obj_type, instanced, _), cases in groups.items():
+        cases.sort(key=lambda r: r['workers'])
+        base = cases[0]
+        for case in cases[1:]:
+            print(f"  {count:>7} {obj_type:<6} instanced={instanced!s:<5} {base['workers']} -> {case['workers']} workers: "
+                  f"{case['fps'] / base['fps']:.2f}x FPS, "
+                  f"{base['stages_ms']['scene_update'] / case['stages_ms']['scene_update']:.2f}x scene_update")
+
+
+def compare(results, baseline_path):
+    """ Imprime a razão de FPS entre os resultados atuais e um JSON salvo anteriormente """
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    previous = {case_key(r): r for r in baseline['results']}
+    print(f"\nComparação com {baseline_path} (commit {baseline.get('commit')})")
+    for result in results:
+        old = previous.get(case_key(result))
+        if old:
+            ratio = result['fps'] / old['fps']
+            print(f"  {result['objects']:>7} {result['type']:<6} instanced={result['instanced']!s:<5} "
+                  f"{old['fps']:8.1f} -> {result['fps']:8.1f} FPS ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--objects', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--types', nargs='+', default=['cube', 'sphere'], choices=['cube', 'sphere'])
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--size', type=int, nargs=2, default=[1600, 900])
+    parser.add_argument('--instanced', choices=['on', 'off', 'both'], default='both')
+    parser.add_argument('--no-culling', action='store_true')
+    parser.add_argument('--workers', type=int, nargs='+', default=[DEFAULT_WORKERS],
+                        help='threads da etapa de preparação; várias para medir o speedup (ex.: 1 4 8)')
+    parser.add_argument('--step-rate', type=int, default=STEP_RATE, help='passos fixos de simulação por segundo')
+    parser.add_argument('--output', default=None, help='arquivo JSON (padrão: bench_<commit>.json)')
+    parser.add_argument('--compare', default=None, help='JSON anterior para comparar')
+    args = parser.parse_args()
+
+    modes = {'on': [True], 'off': [False], 'both': [False, True]}[args.instanced]
+    results = []
+    for obj_type in args.types:
+        for count in args.objects:
+            for instanced in modes:
+                for workers in args.workers:
+                    result = run_case(count, obj_type, args.frames, args.warmup, tuple(args.size),
+                                      instanced, not args.no_culling, args.step_rate, workers)
+                    stages = ' '.join(f"{stage}={ms:.2f}" for stage, ms in result['stages_ms'].items())
+                    print(f"{count:>7} {obj_type:<6} instanced={instanced!s:<5} workers={workers:<2} "
+                          f"{result['fps']:8.1f} FPS  p95={result['frame_ms']['p95']:.2f} ms  {stages}  "
+                          f"rss={result['peak_rss_mb']:.0f} MB")
+                    results.append(result)
+    if len(args.workers) > 1:
+        report_speedup(results)
+
+    commit = git_commit()
+    output = args.output or f'bench_{commit or "local"}.json'
+    report = {'commit': commit, 'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+              'gil': gil_enabled(), 'cpus': os.cpu_count(), 'config': vars(args), 'results': results}
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Resultados salvos em {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import numpy as np
+from parallel import PARALLEL_MIN
+
+LEAF_SIZE = 8
+MIN_PENDING = 64  # inserções testadas por força bruta antes de reconstruir
+
+OUTSIDE, INTERSECT, INSIDE = 0, 1, 2
+
+
+def classify_aabbs(aabb_min, aabb_max, planes):
+    """ Classifica AABBs contra os planos do frustum: OUTSIDE, INTERSECT ou INSIDE """
+    center = (aabb_min + aabb_max) * 0.5
+    extent = (aabb_max - aabb_min) * 0.5
+    dist = center @ planes[:, :3].T + planes[:, 3]
+    radius = extent @ np.abs(planes[:, :3]).T
+    state = np.full(len(center), INSIDE)
+    state[(dist < radius).any(axis=1)] = INTERSECT
+    state[(dist < -radius).any(axis=1)] = OUTSIDE
+    return state
+
+
+def gather_ranges(order, starts, ends):
+    """ Concatena order[start:end] para vários intervalos sem laço em Python """
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return order[offsets + np.arange(len(offsets))]
+
+
+class BVH:
+    """ Hierarquia de volumes (AABBs) sobre os índices do TransformStore, para frustum culling """
+    def __init__(self, transforms, pool=None):
+        self.transforms = transforms
+        self.pool = pool  # WorkerPool: consultas em árvores grandes dividem as subárvores entre threads
+        self.members = set()   # índices vivos na cena
+        self.pending = set()   # inseridos desde a última construção (fora da árvore)
+        self.removed = 0       # removidos que ainda estão na árvore
+        self.alive = np.zeros(0, dtype=bool)
+        self.leaf_of = np.zeros(0, dtype=np.int64)
+        self.build()
+
+    def ensure_capacity(self):
+        capacity = self.transforms.capacity
+        if len(self.alive) < capacity:
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:len(self.alive)] = self.alive
+            leaf_of = np.full(capacity, -1, dtype=np.int64)
+            leaf_of[:len(self.leaf_of)] = self.leaf_of
+            self.alive, self.leaf_of = alive, leaf_of
+
+    def insert(self, index):
+        self.ensure_capacity()
+        self.members.add(index)
+        self.alive[index] = True
+        if self.leaf_of[index] < 0:
+            self.pending.add(index)
+        elif self.removed:
+            self.removed -= 1  # volta para a folha onde já estava
+
+    def insert_many(self, indices):
+        """ insert() para um array de índices (carga em lote) """
+        self.ensure_capacity()
+        self.members.update(indices.tolist())
+        self.alive[indices] = True
+        fresh = indices[self.leaf_of[indices] < 0]
+        self.pending.update(fresh.tolist())
+        self.removed = max(0, self.removed - (len(indices) - len(fresh)))
+
+    def remove(self, index):
+        self.members.discard(index)
+        self.alive[index] = False
+        if index in self.pending:
+            self.pending.discard(index)
+        else:
+            self.removed += 1
+
+    def build(self):
+        """ Reconstrói a árvore inteira, dividindo pela mediana no eixo mais longo """
+        self.ensure_capacity()
+        self.leaf_of[:] = -1
+        self.pending.clear()
+        self.removed = 0
+        self.order = np.fromiter(self.members, dtype=np.int64, count=len(self.members))
+        nodes = {'start': [], 'end': [], 'left': [], 'right': [], 'parent': [], 'depth': []}
+        if len(self.order):
+            t = self.transforms
+            centers = (t.aabb_min[self.order] + t.aabb_max[self.order]) * 0.5
+            self.build_node(0, len(self.order), -1, 0, centers, nodes)
+        for name, values in nodes.items():
+            setattr(self, name, np.array(values, dtype=np.int64))
+        size = len(self.start)
+        self.node_min = np.zeros((size, 3), dtype='f4')
+        self.node_max = np.zeros((size, 3), dtype='f4')
+        for leaf in np.flatnonzero(self.left < 0):
+            self.leaf_of[self.order[self.start[leaf]:self.end[leaf]]] = leaf
+        self.refit_all()
+
+    def build_node(self, lo, hi, parent, depth, centers, nodes):
+        node = len(nodes['start'])
+        for name, value in (('start', lo), ('end', hi), ('left', -1), ('right', -1),
+                            ('parent', parent), ('depth', depth)):
+            nodes[name].append(value)
+        if hi - lo > LEAF_SIZE:
+            c = centers[lo:hi]
+            axis = np.argmax(c.max(axis=0) - c.min(axis=0))
+            mid = (hi - lo) // 2
+            part = np.argpartition(c[:, axis], mid)
+            self.order[lo:hi] = self.order[lo:hi][part]
+            centers[lo:hi] = c[part]
+            nodes['left'][node] = self.build_node(lo, lo + mid, node, depth + 1, centers, nodes)
+            nodes['right'][node] = self.build_node(lo + mid, hi, node, depth + 1, centers, nodes)
+        return node
+
+    def refit_all(self):
+        """ Recalcula todas as caixas: folhas com reduceat e nós internos nível a nível """
+        if not len(self.start):
+            return
+        t = self.transforms
+        leaves = np.flatnonzero(self.left < 0)
+        leaves = leaves[np.argsort(self.start[leaves])]
+        self.node_min[leaves] = np.minimum.reduceat(t.aabb_min[self.order], self.start[leaves])
+        self.node_max[leaves] = np.maximum.reduceat(t.aabb_max[self.order], self.start[leaves])
+        internal = np.flatnonzero(self.left >= 0)
+        for depth in range(self.depth.max() - 1, -1, -1):
+            self.refit_nodes(internal[self.depth[internal] == depth])
+
+    def refit_nodes(self, nodes):
+        left, right = self.left[nodes], self.right[nodes]
+        self.node_min[nodes] = np.minimum(self.node_min[left], self.node_min[right])
+        self.node_max[nodes] = np.maximum(self.node_max[left], self.node_max[right])
+
+    def refit(self, moved):
+        """ Atualiza as folhas dos objetos movidos e sobe pelos ancestrais """
+        self.ensure_capacity()
+        if len(self.pending) > max(MIN_PENDING, len(self.order) // 4) or self.removed > len(self.order) // 2:
+            self.build()
+            return
+        if not len(moved) or not len(self.start):
+            return
+        leaves = self.leaf_of[moved]
+        leaves = np.unique(leaves[leaves >= 0])
+        if len(leaves) > len(self.start) // 4:
+            self.refit_all()
+            return
+        t = self.transforms
+        for leaf in leaves.tolist():
+            items = self.order[self.start[leaf]:self.end[leaf]]
+            self.node_min[leaf] = t.aabb_min[items].min(axis=0)
+            self.node_max[leaf] = t.aabb_max[items].max(axis=0)
+        # Cada ancestral é recalculado depois do filho no seu caminho
+        nodes = self.parent[leaves]
+        nodes = np.unique(nodes[nodes >= 0])
+        while len(nodes):
+            self.refit_nodes(nodes)
+            nodes = self.parent[nodes]
+            nodes = np.unique(nodes[nodes >= 0])
+
+    def query(self, planes):
+        """ Índices dos objetos vivos cuja AABB intersecta o frustum """
+        t = self.transforms
+        result = [np.zeros(0, dtype=np.int64)]
+        if self.pending:
+            items = np.fromiter(self.pending, dtype=np.int64, count=len(self.pending))
+            result.append(items[classify_aabbs(t.aabb_min[items], t.aabb_max[items], planes) != OUTSIDE])
+
+        roots = np.zeros(1 if len(self.start) else 0, dtype=np.int64)
+        if self.pool is not None and self.pool.workers > 1 and len(self.order) >= 2 * PARALLEL_MIN:
+            # Uma fatia das subárvores de um nível mais fundo para cada thread
+            depth = int(np.ceil(np.log2(4 * self.pool.workers)))
+            roots = np.flatnonzero((self.depth == depth) | ((self.depth < depth) & (self.left < 0)))
+            parts = np.array_split(roots, self.pool.workers)
+            for part in self.pool.map(lambda part: self.query_nodes(part, planes), parts):
+                result.extend(part)
+        else:
+            result.extend(self.query_nodes(roots, planes))
+
+        visible = np.concatenate(result)
+        return visible[self.alive[visible]]
+
+    def query_nodes(self, frontier, planes):
+        """ Desce a árvore a partir dos nós `frontier`; retorna os pedaços de índices visíveis """
+        t = self.transforms
+        result = []
+        while len(frontier):
+            state = classify_aabbs(self.node_min[frontier], self.node_max[frontier], planes)
+            # Subárvores inteiramente dentro entram sem testes adicionais
+            inside = frontier[state == INSIDE]
+            result.append(gather_ranges(self.order, self.start[inside], self.end[inside]))
+            partial = frontier[state == INTERSECT]
+            is_leaf = self.left[partial] < 0
+            leaves = partial[is_leaf]
+            items = gather_ranges(self.order, self.start[leaves], self.end[leaves])
+            result.append(items[classify_aabbs(t.aabb_min[items], t.aabb_max[items], planes) != OUTSIDE])
+            internal = partial[~is_leaf]
+            frontier = np.concatenate([self.left[internal], self.right[internal]])
+        return result
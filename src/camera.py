@@ -1,4 +1,5 @@
 import glm
+import numpy as np
 import pygame as pg
 
 FOV = 50
@@ -17,6 +18,11 @@ class Camera:
         self.forward = glm.vec3(0,0,-1)
         self.yaw = yaw
         self.pitch = pitch
+        # Estado antes do último passo fixo (None fora do FrameScheduler) e posição usada no render
+        self.previous = None
+        self.view_position = glm.vec3(self.position)
+        # Sem janela (headless) não há mouse/teclado para ler
+        self.input = not getattr(app, 'headless', False)
 
         # view matrix
         self.m_view = self.get_view_matrix()
@@ -29,22 +35,52 @@ class Camera:
         self.pitch -= rel_y * SENSIVITY
         self.pitch = max(-89, min(89, self.pitch))
     
-    def update_cam_vectors(self):
-        yaw, pitch = glm.radians(self.yaw), glm.radians(self.pitch)
-        self.forward.x = glm.cos(yaw) * glm.cos(pitch)
-        self.forward.y = glm.sin(pitch)
-        self.forward.z = glm.sin(yaw) * glm.cos(pitch)
+    @staticmethod
+    def get_vectors(yaw, pitch):
+        yaw, pitch = glm.radians(yaw), glm.radians(pitch)
+        forward = glm.vec3(glm.cos(yaw) * glm.cos(pitch), glm.sin(pitch), glm.sin(yaw) * glm.cos(pitch))
+        forward = glm.normalize(forward)
+        right = glm.normalize(glm.cross(forward, glm.vec3(0,1,0)))
+        up = glm.normalize(glm.cross(right, forward))
+        return forward, right, up
 
-        self.forward = glm.normalize(self.forward)
-        self.right = glm.normalize(glm.cross(self.forward, glm.vec3(0,1,0)))
-        self.up = glm.normalize(glm.cross(self.right, self.forward))
+    def update_cam_vectors(self):
+        self.forward, self.right, self.up = self.get_vectors(self.yaw, self.pitch)
 
     def update(self):
-        self.move()
-        self.rotate()
+        self.previous = None
+        if self.input:
+            self.move()
+            self.rotate()
         self.update_cam_vectors()
+        self.view_position = glm.vec3(self.position)
         self.m_view = self.get_view_matrix()
 
+    def step(self):
+        """ Um passo fixo de simulação, guardando o estado anterior para a interpolação """
+        previous = (glm.vec3(self.position), self.yaw, self.pitch)
+        self.update()
+        self.previous = previous
+
+    def follow(self, pose):
+        """ Passo fixo guiado por uma pose (posição, yaw, pitch) de CameraPath, sem ler o input """
+        previous = (glm.vec3(self.position), self.yaw, self.pitch)
+        position, self.yaw, self.pitch = pose
+        self.position = glm.vec3(position)
+        self.update_cam_vectors()
+        self.view_position = glm.vec3(self.position)
+        self.m_view = self.get_view_matrix()
+        self.previous = previous
+
+    def interpolate(self, alpha):
+        """ View entre o estado anterior e o atual (alpha em [0, 1)) """
+        if self.previous is None:
+            return
+        position, yaw, pitch = self.previous
+        self.view_position = glm.mix(position, self.position, alpha)
+        _, _, up = self.get_vectors(yaw + (self.yaw - yaw) * alpha, pitch + (self.pitch - pitch) * alpha)
+        self.m_view = glm.lookAt(self.view_position, glm.vec3(0), up)
+
     def move(self):
         velocity = SPEED * self.app.delta_time
         keys = pg.key.get_pressed()
@@ -66,4 +102,55 @@ class Camera:
 
     def get_projection_matrix(self):
         return glm.perspective(glm.radians(FOV), self.aspect_ratio, NEAR, FAR)
-    
\ No newline at end of file
+
+    def get_ray(self, screen_pos):
+        """ Origem e direção (mundo) do raio que sai da câmera pelo pixel `screen_pos` """
+        x = 2 * screen_pos[0] / self.app.WIN_SIZE[0] - 1
+        y = 1 - 2 * screen_pos[1] / self.app.WIN_SIZE[1]
+        inverse = glm.inverse(self.m_proj * self.m_view)
+        near = inverse * glm.vec4(x, y, -1, 1)
+        far = inverse * glm.vec4(x, y, 1, 1)
+        near, far = glm.vec3(near) / near.w, glm.vec3(far) / far.w
+        return np.array(near), np.array(glm.normalize(far - near))
+
+    def get_frustum_planes(self):
+        # 6 planes (a, b, c, d) pointing inwards, from the rows of proj * view
+        m_clip = np.frombuffer((self.m_proj * self.m_view).to_bytes(), dtype='f4').reshape(4, 4).T
+        planes = np.array([m_clip[3] + m_clip[0], m_clip[3] - m_clip[0],   # left, right
+                           m_clip[3] + m_clip[1], m_clip[3] - m_clip[1],   # bottom, top
+                           m_clip[3] + m_clip[2], m_clip[3] - m_clip[2]])  # near, far
+        return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+    
+
+class CameraPath:
+    """ Poses-chave (tempo em s, posição, yaw, pitch) da câmera, interpoladas linearmente """
+    def __init__(self, keyframes):
+        keyframes = sorted(keyframes, key=lambda key: key[0])
+        if not keyframes:
+            raise ValueError("CameraPath precisa de pelo menos uma pose")
+        self.times = np.array([key[0] for key in keyframes], dtype='f8')
+        self.positions = np.array([key[1] for key in keyframes], dtype='f8').reshape(-1, 3)
+        self.angles = np.array([(key[2], key[3]) for key in keyframes], dtype='f8')
+
+    @classmethod
+    def orbit(cls, radius=6.0, height=1.0, duration=4.0, keys=64, center=(0, 0, 0)):
+        """ Volta completa em torno de `center` (a câmera sempre olha para a origem) """
+        times = np.linspace(0, duration, keys)
+        angles = np.linspace(0, 2 * np.pi, keys)
+        return cls([(t, (center[0] + radius * np.sin(a), center[1] + height, center[2] + radius * np.cos(a)),
+                     -90 - np.degrees(a), 0) for t, a in zip(times, angles)])
+
+    @property
+    def duration(self):
+        return float(self.times[-1] - self.times[0])
+
+    def __len__(self):
+        return len(self.times)
+
+    def pose(self, t):
+        """ (posição, yaw, pitch) no instante `t` (segundos desde o início do caminho) """
+        t = self.times[0] + t
+        position = [np.interp(t, self.times, self.positions[:, axis]) for axis in range(3)]
+        yaw, pitch = (float(np.interp(t, self.times, self.angles[:, i])) for i in range(2))
+        return tuple(float(v) for v in position), yaw, pitch
+
@@ -0,0 +1,109 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pygame as pg
+
+RING_SIZE = 3          # pixel buffers em rodízio: o frame N é lido no frame N + RING_SIZE - 1
+WRITER_THREADS = 4
+MAX_PENDING = 16       # frames esperando codificação/disco; além disso o frame é descartado
+LATE_MS = 4.0          # leitura do buffer mais lenta que isso: a GPU ainda não tinha terminado
+FORMATS = ('png', 'raw')
+# Cabeçalho dos arquivos .raw (igual ao cache de texturas): largura, altura, componentes, reservado
+HEADER_SIZE = 16
+
+
+def write_frame(path, data, size, fmt):
+    """ Grava um frame (RGB, linhas de baixo para cima como o OpenGL lê); roda nas threads de escrita """
+    if fmt == 'png':
+        pg.image.save(pg.image.frombytes(data, size, 'RGB', True), path)
+    else:
+        header = np.array([size[0], size[1], 3, 0], dtype='<u4').tobytes()
+        with open(path, 'wb') as file:
+            file.write(header + data)
+
+
+class FrameRecorder:
+    """
+    Gravação de sequências de imagens sem travar o pipeline da GPU.
+
+    Cada frame é copiado do framebuffer para um de RING_SIZE pixel buffers (fbo.read_into num
+    Buffer: a cópia fica na fila da GPU e a chamada retorna na hora). O buffer só é lido quando
+    volta a vez dele, RING_SIZE - 1 frames depois, com a GPU já adiantada; os bytes vão para um
+    pool de threads que codifica o PNG (ou grava o .raw) em disco. Leituras que ainda esperaram a
+    GPU contam como atrasadas; frames que encontram a fila de escrita cheia são descartados.
+    """
+    def __init__(self, app, directory, fmt='png', ring_size=RING_SIZE, writers=WRITER_THREADS):
+        if fmt not in FORMATS:
+            raise ValueError(f"fmt deve ser um de {FORMATS}")
+        self.app = app
+        self.ctx = app.ctx
+        self.profiler = app.profiler
+        self.directory = directory
+        self.fmt = fmt
+        self.source = app.resolution.output  # frame final, antes do overlay
+        self.size = tuple(self.source.size)
+        os.makedirs(directory, exist_ok=True)
+        frame_bytes = self.size[0] * self.size[1] * 3
+        self.buffers = [self.ctx.buffer(reserve=frame_bytes) for _ in range(max(2, ring_size))]
+        self.slots = [None] * len(self.buffers)  # número do frame guardado em cada buffer
+        self.executor = ThreadPoolExecutor(max_workers=writers)
+        self.pending = deque()  # futures das escritas em andamento
+        self.frame = 0
+        self.written = 0
+        self.dropped = 0
+        self.late = 0
+        self.capture_ms = 0.0   # tempo de CPU gasto em capture(), somado
+        self.readback_ms = 0.0  # parte disso esperando os buffers
+        self.start = time.perf_counter()
+
+    def capture(self):
+        """ Copia o frame atual para o próximo buffer do anel, lendo antes o frame que estava nele """
+        start = time.perf_counter()
+        slot = self.frame % len(self.buffers)
+        self.collect(slot)
+        self.source.read_into(self.buffers[slot], components=3, alignment=1)
+        self.slots[slot] = self.frame
+        self.frame += 1
+        self.capture_ms += (time.perf_counter() - start) * 1000
+
+    def collect(self, slot):
+        """ Lê o frame guardado no buffer `slot` (se houver) e o entrega às threads de escrita """
+        frame = self.slots[slot]
+        if frame is None:
+            return
+        self.slots[slot] = None
+        while self.pending and self.pending[0].done():
+            self.pending.popleft().result()
+            self.written += 1
+        if len(self.pending) >= MAX_PENDING:
+            self.dropped += 1
+            return
+        start = time.perf_counter()
+        data = self.buffers[slot].read()
+        elapsed = (time.perf_counter() - start) * 1000
+        self.readback_ms += elapsed
+        if elapsed > LATE_MS:
+            self.late += 1
+        path = os.path.join(self.directory, f'frame_{frame:06d}.{self.fmt}')
+        self.pending.append(self.executor.submit(write_frame, path, data, self.size, self.fmt))
+
+    def finish(self):
+        """ Lê o que sobrou no anel, espera as escritas e devolve o relatório """
+        for offset in range(len(self.buffers)):
+            self.collect((self.frame + offset) % len(self.buffers))
+        while self.pending:
+            self.pending.popleft().result()
+            self.written += 1
+        self.executor.shutdown(wait=True)
+        for buffer in self.buffers:
+            buffer.release()
+        return self.report()
+
+    def report(self):
+        frames = max(self.frame, 1)
+        return {'directory': self.directory, 'format': self.fmt, 'size': self.size,
+                'frames': self.frame, 'written': self.written, 'dropped': self.dropped, 'late': self.late,
+                'capture_ms': self.capture_ms / frames, 'readback_ms': self.readback_ms / frames,
+                'seconds': time.perf_counter() - self.start}
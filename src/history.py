@@ -0,0 +1,219 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+MAX_ENTRIES = 256                # comandos guardados (desfazer + refazer)
+MAX_BYTES = 64 * 1024 * 1024     # orçamento de memória dos comandos
+COALESCE_SECONDS = 1.0           # movimentos do mesmo objeto dentro dessa janela viram um comando só
+
+# Transformação compactada: posição, rotação (radianos) e escala
+TRANSFORM_SIZE = 9
+# Registro de um objeto criado/removido: handle (índice no TransformStore), tipo, VAO base, textura,
+# transformação (relativa ao pai) e handle do pai (-1 na raiz)
+RECORD_DTYPE = np.dtype([('index', 'i4'), ('type', 'u1'), ('vao', 'u2'), ('tex_id', 'i4'),
+                         ('transform', 'f4', TRANSFORM_SIZE), ('parent', 'i4')])
+
+
+class Command:
+    """ Operação desfazível; guarda só handles e valores, nunca referências aos objetos """
+    indices = np.zeros(0, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return 0
+
+    def merge(self, other):
+        """ Absorve `other` se for uma continuação deste comando """
+        return False
+
+    def undo(self, scene): ...
+
+    def redo(self, scene): ...
+
+
+class Spawn(Command):
+    """ Criação de objetos (desfazer remove, refazer recria a partir dos registros) """
+    def __init__(self, records):
+        self.records = records
+        self.indices = records['index'].astype(np.int64)
+
+    @property
+    def nbytes(self):
+        return self.records.nbytes
+
+    def undo(self, scene):
+        scene.despawn(self.indices)
+
+    def redo(self, scene):
+        scene.spawn(self.records)
+
+
+class Despawn(Spawn):
+    """ Remoção de objetos: o inverso de Spawn """
+    def undo(self, scene):
+        Spawn.redo(self, scene)
+
+    def redo(self, scene):
+        Spawn.undo(self, scene)
+
+
+class TransformChange(Command):
+    """ Transformações antes/depois dos objetos movidos, rotacionados ou escalados """
+    def __init__(self, indices, before, after, kind='transform'):
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.kind = kind  # só comandos do mesmo tipo ('move', 'rotate', ...) se fundem
+        self.before = before
+        self.after = after
+        self.time = time.perf_counter()
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + self.before.nbytes + self.after.nbytes
+
+    def merge(self, other):
+        # Mesmos objetos, logo em seguida
+        if (not isinstance(other, TransformChange) or other.kind != self.kind
+                or other.time - self.time > COALESCE_SECONDS or not np.array_equal(self.indices, other.indices)):
+            return False
+        self.after = other.after
+        self.time = other.time
+        return True
+
+    def undo(self, scene):
+        scene.set_transforms(self.indices, self.before)
+
+    def redo(self, scene):
+        scene.set_transforms(self.indices, self.after)
+
+
+class Batch(Command):
+    """ Vários comandos desfeitos e refeitos num passo só """
+    def __init__(self, commands):
+        self.commands = commands
+        self.indices = np.concatenate([command.indices for command in commands])
+
+    @property
+    def nbytes(self):
+        return sum(command.nbytes for command in self.commands)
+
+    def undo(self, scene):
+        for command in reversed(self.commands):
+            command.undo(scene)
+
+    def redo(self, scene):
+        for command in self.commands:
+            command.redo(scene)
+
+
+class History:
+    """
+    Desfazer/refazer por comandos, limitado por número de entradas e por bytes.
+
+    Os comandos referenciam objetos pelo handle (índice no TransformStore). Um handle citado no
+    histórico não volta para a lista livre do TransformStore mesmo com o objeto removido, então
+    desfazer a remoção recria o objeto no mesmo índice; o índice só é liberado quando o último
+    comando que o cita sai do histórico.
+    """
+    def __init__(self, scene, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.scene = scene
+        self.transforms = scene.app.transforms
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.nbytes = 0
+        self.refs = np.zeros(0, dtype=np.int32)  # comandos que citam cada handle
+        self.group = None  # comandos do batch() aberto
+        self.evicted = 0
+        self.vao_names = []  # código do campo 'vao' dos registros -> nome do VAO
+        self.vao_codes = {}
+
+    def vao_code(self, name):
+        if name not in self.vao_codes:
+            self.vao_codes[name] = len(self.vao_names)
+            self.vao_names.append(name)
+        return self.vao_codes[name]
+
+    def __len__(self):
+        return len(self.undo_stack) + len(self.redo_stack)
+
+    def push(self, command, coalesce=False):
+        """ Registra um comando já executado; `coalesce` tenta fundi-lo com o anterior """
+        if self.group is not None:
+            if not (coalesce and self.group and self.group[-1].merge(command)):
+                self.group.append(command)
+            return
+        self.drop_all(self.redo_stack)
+        if coalesce and self.undo_stack:
+            top = self.undo_stack[-1]
+            before = top.nbytes
+            if top.merge(command):
+                self.nbytes += top.nbytes - before
+                return
+        self.retain(command)
+        self.undo_stack.append(command)
+        self.trim()
+
+    @contextmanager
+    def batch(self):
+        """ Os comandos registrados dentro do bloco viram uma única entrada """
+        if self.group is not None:
+            yield  # batch aninhado: entra no de fora
+            return
+        self.group = []
+        try:
+            yield
+        finally:
+            commands, self.group = self.group, None
+            if len(commands) == 1:
+                self.push(commands[0])
+            elif commands:
+                self.push(Batch(commands))
+
+    def undo(self):
+        if self.undo_stack:
+            command = self.undo_stack.pop()
+            command.undo(self.scene)
+            self.redo_stack.append(command)
+
+    def redo(self):
+        if self.redo_stack:
+            command = self.redo_stack.pop()
+            command.redo(self.scene)
+            self.undo_stack.append(command)
+
+    def clear(self):
+        self.drop_all(self.redo_stack)
+        self.drop_all(self.undo_stack)
+
+    def trim(self):
+        """ Descarta as entradas mais antigas até caber nos limites (a mais recente sempre fica) """
+        while len(self.undo_stack) > 1 and (len(self) > self.max_entries or self.nbytes > self.max_bytes):
+            self.drop(self.undo_stack.popleft())
+            self.evicted += 1
+
+    def drop_all(self, stack):
+        while stack:
+            self.drop(stack.pop())
+
+    def retain(self, command):
+        capacity = self.transforms.capacity
+        if len(self.refs) < capacity:
+            self.refs = np.concatenate([self.refs, np.zeros(capacity - len(self.refs), dtype=np.int32)])
+        np.add.at(self.refs, command.indices, 1)
+        self.nbytes += command.nbytes
+
+    def drop(self, command):
+        """ Esquece o comando e libera os handles de objetos removidos que ninguém mais cita """
+        np.subtract.at(self.refs, command.indices, 1)
+        self.nbytes -= command.nbytes
+        indices = np.unique(command.indices)
+        alive = self.scene.by_index
+        for index in indices[self.refs[indices] == 0].tolist():
+            if index not in alive:
+                self.transforms.release(index)
+
+    def stats(self):
+        return {'undo': len(self.undo_stack), 'redo': len(self.redo_stack),
+                'bytes': self.nbytes, 'evicted': self.evicted}
@@ -53,10 +53,12 @@ class HotkeyManager:
         if action:
             print(f"Ação Executada: {action}")
             # Dependendo da ação, invocar métodos na classe `Scene`
+            target = self.scene.target()
+            pos = target.world_pos if target is not None else (0, 0, 0)
             if action == "Add Cube":
-                self.scene.add_object_from_ui(self.scene.objects[-1].pos, obj_type="cube")
+                self.scene.add_object_from_ui(pos, obj_type="cube")
             elif action == "Add Sphere":
-                self.scene.add_object_from_ui(self.scene.objects[-1].pos, obj_type="sphere")
+                self.scene.add_object_from_ui(pos, obj_type="sphere")
             elif action == "Move Left":
                 self.move_object("left")
             elif action == "Move Right":
@@ -71,25 +73,27 @@ class HotkeyManager:
                 self.rotate_object("counterclockwise")
         
     def move_object(self, direction):
-        """ Mover o último objeto da cena para a direção especificada """
-        obj = self.scene.objects[-1]
+        """ Move o objeto alvo (selecionado com o mouse ou o último) na direção especificada """
+        obj = self.scene.target()
+        if obj is None:
+            return
         step = 0.5  # Tamanho do passo para movimento
         if direction == "left":
-            obj.pos = (obj.pos[0] - step, obj.pos[1], obj.pos[2])
+            self.scene.translate_object(obj, (-step, 0, 0))
         elif direction == "right":
-            obj.pos = (obj.pos[0] + step, obj.pos[1], obj.pos[2])
+            self.scene.translate_object(obj, (step, 0, 0))
         elif direction == "up":
-            obj.pos = (obj.pos[0], obj.pos[1] + step, obj.pos[2])
+            self.scene.translate_object(obj, (0, step, 0))
         elif direction == "down":
-            obj.pos = (obj.pos[0], obj.pos[1] - step, obj.pos[2])
-        obj.m_model = obj.get_model_matrix()  # Atualiza o modelo
+            self.scene.translate_object(obj, (0, -step, 0))
 
     def rotate_object(self, direction):
-        """ Rotaciona o último objeto da cena """
-        obj = self.scene.objects[-1]
+        """ Rotaciona o objeto alvo (selecionado com o mouse ou o último) """
+        obj = self.scene.target()
+        if obj is None:
+            return
         step = 5  # Ângulo de rotação
         if direction == "clockwise":
-            obj.rot = (obj.rot[0], obj.rot[1] + step, obj.rot[2])
+            self.scene.rotate_object(obj, (0, step, 0))
         elif direction == "counterclockwise":
-            obj.rot = (obj.rot[0], obj.rot[1] - step, obj.rot[2])
-        obj.m_model = obj.get_model_matrix()  # Atualiza o modelo
+            self.scene.rotate_object(obj, (0, -step, 0))
@@ -0,0 +1,217 @@
+import numpy as np
+
+# Dados por instância: matriz de modelo + camada do texture array ('16f 1i/i')
+INSTANCE_DTYPE = np.dtype([('m_model', 'f4', 16), ('layer', 'i4')])
+MIN_CAPACITY = 16
+
+
+class InstanceBatch:
+    """ Objetos que compartilham VAO e texture array, desenhados numa única chamada """
+    def __init__(self, renderer, vao_name, texture):
+        self.renderer = renderer
+        self.vao_name = vao_name
+        self.texture = texture
+        self.objects = {}  # índice no TransformStore -> objeto (remoção O(1))
+        self.stale = False  # indices/layers refeitos no próximo prepare
+        self.indices = np.zeros(0, dtype=np.int64)  # índices no TransformStore
+        self.layers = np.zeros(0, dtype='i4')       # camada de cada objeto no array
+        self.drawn = None  # índices enviados no último upload
+        self.capacity = 0
+        self.buffer = None
+        self.vao = None
+        self.dirty = True
+        self.prepared = None  # (índices, dados ou None) da etapa de preparação
+        self.triangles = renderer.mesh_vao.vbo.vbos[vao_name].index_count // 3
+
+    def changed(self):
+        # Arrays refeitos uma vez por frame, não a cada objeto adicionado ou removido
+        self.stale = True
+        self.dirty = True
+
+    def refresh(self):
+        count = len(self.objects)
+        self.indices = np.fromiter(self.objects, dtype=np.int64, count=count)
+        self.layers = np.fromiter((obj.layer for obj in self.objects.values()), dtype='i4', count=count)
+        self.stale = False
+
+    def extend(self, objects):
+        """ Acrescenta objetos com a mesma textura (mesma camada) sem recalcular os já presentes """
+        indices = np.fromiter((obj.index for obj in objects), dtype=np.int64, count=len(objects))
+        self.objects.update(zip(indices.tolist(), objects))
+        if not self.stale:
+            self.indices = np.concatenate([self.indices, indices])
+            self.layers = np.concatenate([self.layers, np.full(len(objects), objects[0].layer, dtype='i4')])
+        self.dirty = True
+        return indices
+
+    def prepare(self, visible=None):
+        """ Etapa paralela: instâncias visíveis e, se mudaram, os dados do buffer (sem chamadas GL) """
+        if self.stale:
+            self.refresh()
+        # Com culling, só as instâncias visíveis vão para o buffer
+        indices, layers = self.indices, self.layers
+        if visible is not None:
+            keep = visible[indices]
+            indices, layers = indices[keep], layers[keep]
+        data = None
+        if self.dirty or not np.array_equal(indices, self.drawn):
+            data = np.empty(len(indices), dtype=INSTANCE_DTYPE)
+            data['m_model'] = self.renderer.transforms.matrices[indices].reshape(-1, 16)
+            data['layer'] = layers
+        self.prepared = (indices, data)
+
+    def upload(self, indices, data):
+        """ Reenvia matrizes de modelo e camadas para o buffer de instâncias """
+        count = len(self.objects)
+        if count > self.capacity:
+            capacity = max(count, 2 * self.capacity, MIN_CAPACITY)
+            self.release()
+            self.buffer = self.renderer.resources.buffer(reserve=capacity * INSTANCE_DTYPE.itemsize, category='instance')
+            # O bloco do pool pode ser maior que o pedido
+            self.capacity = self.buffer.size // INSTANCE_DTYPE.itemsize
+            self.vao = self.renderer.get_vao(self.vao_name, self.buffer)
+        self.buffer.write(data.tobytes())
+        self.drawn = indices
+        self.dirty = False
+
+    def submit(self):
+        """ Etapa serial (thread do GL): envia o buffer preparado e desenha """
+        indices, data = self.prepared
+        if data is not None:
+            self.upload(indices, data)
+        if len(indices):
+            profiler = self.renderer.profiler
+            self.renderer.state.use_texture(self.texture)
+            with profiler.gpu_scope(f'{self.vao_name}/{self.texture.glo}'):
+                self.vao.render(instances=len(indices))
+            profiler.count('draw_calls')
+            profiler.count('triangles', self.triangles * len(indices))
+
+    def render(self, visible=None):
+        self.prepare(visible)
+        self.submit()
+
+    def release(self):
+        if self.vao is not None:
+            self.vao.release()
+            self.renderer.resources.release_buffer(self.buffer)
+        self.vao = None
+        self.buffer = None
+        self.capacity = 0
+
+
+class InstancedRenderer:
+    """ Agrupa os objetos da cena por (vao_name, texture array) e desenha cada grupo instanciado """
+    def __init__(self, app):
+        self.app = app
+        self.ctx = app.ctx
+        self.state = app.render_state
+        self.profiler = app.profiler
+        self.transforms = app.transforms
+        self.resources = app.resources
+        self.pool = app.pool
+        self.active = []  # lotes preparados para o próximo submit
+        self.mesh_vao = app.mesh.vao
+        self.texture = app.mesh.texture
+        self.texture_version = self.texture.version
+        self.program = None  # compilado quando o primeiro lote precisa de um VAO
+        self.batches = {}
+        self.batch_of = {}  # índice no TransformStore -> lote
+        self.mesh_vao.program.add_listener(self.on_program)
+        self.resources.add_listener('vao', self.unload)
+
+    def on_init(self):
+        self.state.set_value(self.program, "u_texture_0", 0)
+
+    def on_program(self, name, old, new):
+        """ Hot reload do programa 'instanced': refaz os VAOs dos lotes """
+        if old is None or old is not self.program:
+            return
+        self.program = new
+        for batch in self.batches.values():
+            if batch.vao is not None:
+                batch.vao.release()
+                batch.vao = self.get_vao(batch.vao_name, batch.buffer)
+
+    def get_vao(self, vao_name, instance_buffer):
+        if self.program is None:
+            self.program = self.mesh_vao.program.programs['instanced']
+            self.on_init()
+        vbo = self.mesh_vao.vbo.vbos[vao_name]
+        return self.mesh_vao.get_vao(self.program, vbo, instance_buffer=instance_buffer)
+
+    def unload(self, name):
+        """ Descarta os lotes vazios de um VAO descarregado (os VAOs deles apontam para os buffers antigos) """
+        variants = self.mesh_vao.vbo.lods.get(name, [name])
+        for key, batch in list(self.batches.items()):
+            if batch.vao_name in variants and not batch.objects:
+                batch.release()
+                del self.batches[key]
+
+    def get_batch(self, obj):
+        texture = obj.texture
+        key = (obj.vao_name, texture.glo)
+        if key not in self.batches:
+            self.batches[key] = InstanceBatch(self, obj.vao_name, texture)
+        return self.batches[key]
+
+    def regroup(self):
+        """ Refaz os lotes depois que os texture arrays foram (re)montados """
+        objects = [obj for batch in self.batches.values() for obj in batch.objects.values()]
+        self.destroy()
+        self.batches = {}
+        self.batch_of = {}
+        for obj in objects:
+            self.add(obj)
+        self.texture_version = self.texture.version
+
+    def add(self, obj):
+        batch = self.get_batch(obj)
+        batch.objects[obj.index] = obj
+        batch.changed()
+        self.batch_of[obj.index] = batch
+
+    def add_many(self, objects):
+        """ add() em lote: objetos agrupados por (vao_name, tex_id) e anexados ao lote de uma vez """
+        groups = {}
+        for obj in objects:
+            groups.setdefault((obj.vao_name, obj.tex_id), []).append(obj)
+        for group in groups.values():
+            batch = self.get_batch(group[0])
+            indices = batch.extend(group)
+            self.batch_of.update(dict.fromkeys(indices.tolist(), batch))
+
+    def remove(self, obj):
+        batch = self.batch_of.get(obj.index)
+        if batch is not None and batch.objects.get(obj.index) is obj:
+            del batch.objects[obj.index]
+            batch.changed()
+            del self.batch_of[obj.index]
+
+    def update(self, indices):
+        """ Marca para reenvio os lotes dos objetos cujas matrizes mudaram """
+        for index in indices.tolist():
+            batch = self.batch_of.get(index)
+            if batch is not None:
+                batch.dirty = True
+
+    def prepare(self, visible=None):
+        """ Prepara os lotes em paralelo; `visible` é uma máscara booleana por índice do TransformStore """
+        if self.texture.version != self.texture_version:
+            self.regroup()
+        # Lotes do mesmo VAO em sequência, depois por texture array
+        self.active = sorted((batch for batch in self.batches.values() if batch.objects),
+                             key=lambda batch: (batch.vao_name, batch.texture.glo))
+        self.pool.map(lambda batch: batch.prepare(visible), self.active)
+
+    def submit(self):
+        for batch in self.active:
+            batch.submit()
+
+    def render(self, visible=None):
+        """ Desenha todos os lotes; `visible` é uma máscara booleana por índice do TransformStore """
+        self.prepare(visible)
+        self.submit()
+
+    def destroy(self):
+        [batch.release() for batch in self.batches.values()]
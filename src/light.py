@@ -1,10 +1,181 @@
+import math
 import glm
+import moderngl as mgl
+import numpy as np
+from render_state import LIGHT_GRID_UNIT, LIGHT_INDEX_UNIT
+
+# Precisam bater com as constantes de default.frag/instanced.frag
+MAX_LIGHTS = 256     # std140: 4 vec4 por luz -> 16 KB, o mínimo garantido para um uniform block
+TILE_SIZE = 16       # pixels de cada tile da tela
+INDEX_WIDTH = 4096   # largura da textura com as listas de luzes por tile
+LIGHTS_BLOCK = 'Lights'
+LIGHTS_BINDING = 1
+# Cantos da caixa que envolve a esfera de alcance da luz
+CORNERS = np.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype='f4')
+
 
 class Light:
-    def __init__(self, position=(3, 3, -3), color=(1, 1, 1)):
+    def __init__(self, position=(3, 3, -3), color=(1, 1, 1), radius=None):
         self.position = glm.vec3(position)
         self.color = glm.vec3(color)
+        # Alcance da luz; None ilumina a cena inteira (entra em todos os tiles)
+        self.radius = radius
         # Intensities
         self.Ia = 0.1 * self.color # ambient
         self.Id = 0.8 * self.color # diffuse
-        self.Is = 1.0 * self.color # specular
\ No newline at end of file
+        self.Is = 1.0 * self.color # specular
+
+
+class LightManager:
+    """
+    Luzes da cena num uniform buffer e listas de luzes por tile da tela (forward+).
+
+    A cada frame em que a câmera ou as luzes mudam, a esfera de alcance de cada luz é projetada
+    na tela e as luzes são distribuídas pelos tiles de TILE_SIZE pixels que ela cobre, tudo em
+    NumPy. O fragment shader lê o tile do pixel e só percorre as luzes daquele tile.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.ctx = app.ctx
+        self.camera = app.camera
+        self.state = app.render_state
+        self.profiler = app.profiler
+        self.lights = []
+        self.size = app.WIN_SIZE  # resolução do alvo de render (define a grade de tiles)
+        self.ubo = self.ctx.buffer(reserve=MAX_LIGHTS * 64)
+        self.ubo.bind_to_uniform_block(LIGHTS_BINDING)
+        self.resources = app.resources
+        self.resources.track(self.ubo, 'uniform', self.ubo.size)
+        self.programs = app.mesh.vao.program.programs
+        self.grid = None
+        self.index = None
+        self.light_data = None
+        self.binned = None  # (luzes, view-projeção, tamanho) do último binning
+        self.stats = {}
+        app.mesh.vao.program.add_listener(self.on_program)
+
+    def on_program(self, name, old, new):
+        block = new.get(LIGHTS_BLOCK, None)
+        if block is None:
+            return
+        block.binding = LIGHTS_BINDING
+        self.state.set_value(new, 'u_light_grid', LIGHT_GRID_UNIT)
+        self.state.set_value(new, 'u_light_index', LIGHT_INDEX_UNIT)
+        self.state.write(new, 'u_ambient', self.ambient().tobytes())
+
+    def add(self, light):
+        if len(self.lights) >= MAX_LIGHTS:
+            raise ValueError(f"No máximo {MAX_LIGHTS} luzes")
+        self.lights.append(light)
+        return light
+
+    def remove(self, light):
+        self.lights.remove(light)
+
+    def ambient(self):
+        """ Luz ambiente da cena (u_ambient): soma do Ia de todas as luzes, aplicada em todo pixel """
+        ambient = np.zeros(3, dtype='f4')
+        for light in self.lights:
+            ambient += light.Ia
+        return ambient
+
+    def pack(self):
+        """ Luzes no layout std140 do bloco Lights: (posição, raio), Ia, Id, Is (Ia só entra em u_ambient) """
+        data = np.zeros((len(self.lights), 4, 4), dtype='f4')
+        for i, light in enumerate(self.lights):
+            data[i, 0, :3] = light.position
+            data[i, 0, 3] = light.radius or 0.0  # 0: alcance infinito
+            data[i, 1, :3] = light.Ia
+            data[i, 2, :3] = light.Id
+            data[i, 3, :3] = light.Is
+        return data
+
+    def tile_ranges(self, data, m_clip, tiles):
+        """ Tiles (x0, y0, x1, y1) cobertos por cada luz; x0 > x1 se a luz está fora da tela """
+        count = len(data)
+        tiles_x, tiles_y = tiles
+        ranges = np.tile(np.array([0, 0, tiles_x - 1, tiles_y - 1]), (count, 1))
+        radius = data[:, 0, 3]
+        finite = np.flatnonzero(radius > 0)
+        if not len(finite):
+            return ranges
+        corners = data[finite, None, 0, :3] + radius[finite, None, None] * CORNERS
+        clip = np.concatenate([corners, np.ones((*corners.shape[:2], 1), dtype='f4')], axis=2) @ m_clip.T
+        # Caixa atrás do plano da câmera: não dá para projetar, a luz fica com a tela inteira
+        projectable = (clip[:, :, 3] > 1e-4).all(axis=1)
+        ndc = clip[:, :, :2] / np.maximum(clip[:, :, 3:], 1e-4)
+        low = np.floor((ndc.min(axis=1) * 0.5 + 0.5) * self.size / TILE_SIZE).astype(np.int64)
+        high = np.floor((ndc.max(axis=1) * 0.5 + 0.5) * self.size / TILE_SIZE).astype(np.int64)
+        rect = np.concatenate([np.maximum(low, 0), np.minimum(high, (tiles_x - 1, tiles_y - 1))], axis=1)
+        ranges[finite[projectable]] = rect[projectable]
+        # Atrás da câmera por inteiro: não ilumina nada visível
+        behind = (clip[:, :, 3] <= 0).all(axis=1)
+        ranges[finite[behind]] = (1, 1, 0, 0)
+        return ranges
+
+    def bin(self, data, m_clip):
+        """ Listas de luzes por tile: (início, quantidade) na grade e os índices em sequência """
+        tiles = (math.ceil(self.size[0] / TILE_SIZE), math.ceil(self.size[1] / TILE_SIZE))
+        ranges = self.tile_ranges(data, m_clip, tiles)
+        width = np.maximum(ranges[:, 2] - ranges[:, 0] + 1, 0)
+        height = np.maximum(ranges[:, 3] - ranges[:, 1] + 1, 0)
+        area = width * height
+        # Um par (tile, luz) para cada tile de cada luz, sem laço em Python
+        lights = np.repeat(np.arange(len(data)), area)
+        offset = np.arange(area.sum()) - np.repeat(np.cumsum(area) - area, area)
+        tile_x = ranges[lights, 0] + offset % width[lights]
+        tile_y = ranges[lights, 1] + offset // width[lights]
+        tile = tile_y * tiles[0] + tile_x
+        order = np.argsort(tile, kind='stable')  # dentro de cada tile, luzes em ordem de índice
+        counts = np.bincount(tile, minlength=tiles[0] * tiles[1])
+        grid = np.stack([np.cumsum(counts) - counts, counts], axis=1).astype('i4')
+        self.stats = {'lights': len(data), 'tiles': len(counts), 'pairs': int(area.sum()),
+                      'max_per_tile': int(counts.max()) if len(counts) else 0,
+                      'avg_per_tile': float(counts.mean()) if len(counts) else 0.0}
+        return tiles, grid, lights[order].astype('i4')
+
+    def upload(self, tiles, grid, index):
+        if self.grid is None or self.grid.size != tiles:
+            if self.grid is not None:
+                self.resources.release(self.grid)
+            self.grid = self.ctx.texture(tiles, 2, dtype='i4')
+            self.grid.filter = (mgl.NEAREST, mgl.NEAREST)
+            self.resources.track(self.grid, 'texture', self.resources.texture_bytes(tiles, 2, itemsize=4))
+        self.grid.write(grid.tobytes())
+        rows = max(1, math.ceil(len(index) / INDEX_WIDTH))
+        if self.index is None or self.index.size[1] < rows:
+            if self.index is not None:
+                self.resources.release(self.index)
+            self.index = self.ctx.texture((INDEX_WIDTH, 1 << (rows - 1).bit_length()), 1, dtype='i4')
+            self.index.filter = (mgl.NEAREST, mgl.NEAREST)
+            self.resources.track(self.index, 'texture', self.resources.texture_bytes(self.index.size, 1, itemsize=4))
+        padded = np.zeros(rows * INDEX_WIDTH, dtype='i4')
+        padded[:len(index)] = index
+        self.index.write(padded.tobytes(), viewport=(0, 0, INDEX_WIDTH, rows))
+
+    def update(self):
+        """ Envia as luzes e refaz as listas por tile se câmera, luzes ou resolução mudaram """
+        with self.profiler.scope('lights'):
+            data = self.pack()
+            light_data = data.tobytes()
+            if light_data != self.light_data:
+                self.ubo.write(light_data)
+                self.light_data = light_data
+                self.profiler.count('uniform_writes')
+            m_clip = np.frombuffer((self.camera.m_proj * self.camera.m_view).to_bytes(), dtype='f4').reshape(4, 4).T
+            key = (light_data, m_clip.tobytes(), tuple(self.size))
+            if key != self.binned:
+                self.upload(*self.bin(data, m_clip))
+                self.binned = key
+            # Fora das listas por tile: um tile sem luzes ainda recebe a ambiente
+            ambient = self.ambient().tobytes()
+            for program in self.programs.values():
+                self.state.write(program, 'u_ambient', ambient)
+            self.state.use_texture(self.grid, LIGHT_GRID_UNIT)
+            self.state.use_texture(self.index, LIGHT_INDEX_UNIT)
+
+    def destroy(self):
+        self.resources.release(self.ubo)
+        for texture in (self.grid, self.index):
+            if texture is not None:
+                self.resources.release(texture)
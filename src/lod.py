@@ -0,0 +1,87 @@
+import glm
+import numpy as np
+from camera import FOV
+
+# Raio projetado (pixels) mínimo para cada nível; abaixo do último usa o nível mais grosseiro
+LOD_THRESHOLDS = (120, 50, 20)
+HYSTERESIS = 0.15  # margem relativa para trocar de nível, evita "popping"
+
+
+class LODSelector:
+    """ Escolhe por frame o nível de LOD dos objetos pelo raio projetado na tela """
+    def __init__(self, app):
+        self.app = app
+        self.camera = app.camera
+        self.transforms = app.transforms
+        self.objects = {}  # índice no TransformStore -> objeto com cadeia de LOD
+        self.levels = np.zeros(0, dtype=np.int64)
+        self.is_lod = np.zeros(0, dtype=bool)
+        self.thresholds = np.array(LOD_THRESHOLDS, dtype='f4')
+        # pixels por unidade de mundo a distância 1
+        self.pixel_scale = app.WIN_SIZE[1] * 0.5 / np.tan(glm.radians(FOV) * 0.5)
+
+    def ensure_capacity(self):
+        capacity = self.transforms.capacity
+        if len(self.levels) < capacity:
+            levels = np.full(capacity, -1, dtype=np.int64)
+            levels[:len(self.levels)] = self.levels
+            is_lod = np.zeros(capacity, dtype=bool)
+            is_lod[:len(self.is_lod)] = self.is_lod
+            self.levels, self.is_lod = levels, is_lod
+
+    def add(self, obj):
+        self.ensure_capacity()
+        self.objects[obj.index] = obj
+        self.is_lod[obj.index] = True
+        self.levels[obj.index] = -1  # escolhe sem histerese no primeiro frame
+
+    def add_many(self, objects):
+        self.ensure_capacity()
+        indices = np.array([obj.index for obj in objects], dtype=np.int64)
+        self.objects.update(zip(indices.tolist(), objects))
+        self.is_lod[indices] = True
+        self.levels[indices] = -1
+
+    def remove(self, obj):
+        if self.objects.pop(obj.index, None) is not None:
+            self.is_lod[obj.index] = False
+
+    def reset(self):
+        """ Esquece os níveis atuais: a próxima seleção usa só a distância, sem histerese """
+        self.levels[self.is_lod] = -1
+
+    def screen_radius(self, indices):
+        t = self.transforms
+        center = (t.aabb_min[indices] + t.aabb_max[indices]) * 0.5
+        radius = np.linalg.norm(t.aabb_max[indices] - t.aabb_min[indices], axis=1) * 0.5
+        dist = np.linalg.norm(center - np.array(self.camera.view_position), axis=1)
+        return np.where(dist > radius, radius * self.pixel_scale / np.maximum(dist, 1e-6), np.inf)
+
+    def select(self, visible=None):
+        """ Atualiza os níveis dos objetos visíveis e retorna [(objeto, novo nível)] que mudaram """
+        self.ensure_capacity()
+        if visible is None:
+            indices = np.flatnonzero(self.is_lod)
+        else:
+            indices = visible[self.is_lod[visible]]
+        if not len(indices):
+            return []
+
+        r_px = self.screen_radius(indices)[:, None]
+        current = self.levels[indices]
+        raw = (r_px < self.thresholds).sum(axis=1)
+        # Só fica mais grosseiro abaixo de T*(1-h) e só fica mais fino acima de T*(1+h)
+        coarser = (r_px < self.thresholds * (1 - HYSTERESIS)).sum(axis=1)
+        finer = (r_px < self.thresholds * (1 + HYSTERESIS)).sum(axis=1)
+        level = np.where(coarser > current, coarser, np.where(finer < current, finer, current))
+        level = np.where(current < 0, raw, level)
+
+        changed = np.flatnonzero(level != current)
+        self.levels[indices[changed]] = level[changed]
+        changes = []
+        for index, new_level in zip(indices[changed].tolist(), level[changed].tolist()):
+            obj = self.objects[index]
+            new_level = min(new_level, len(obj.lod_chain) - 1)
+            if new_level != obj.lod:
+                changes.append((obj, new_level))
+        return changes
@@ -1,41 +1,80 @@
 import pygame as pg
 import numpy as np
 import moderngl as mgl
+import os
 import sys
+import time
 from objects import *
-from camera import Camera
+from camera import Camera, CameraPath
+from capture import FrameRecorder
 from scene import Scene
-from light import Light
+from light import Light, LightManager
 from mesh import Mesh
+from resources import ResourceManager
+from transform import TransformStore
+from render_state import RenderState
+from profiler import Profiler
+from overlay import Overlay
+from parallel import DEFAULT_WORKERS, WorkerPool
+from scheduler import FrameScheduler, STEP_RATE, TARGET_FPS
+from resolution import ResolutionScaler, MIN_SCALE, MAX_SCALE
+
+# Backend do contexto standalone (headless): EGL no Linux, padrão da plataforma nos demais
+HEADLESS_BACKEND = 'egl' if sys.platform.startswith('linux') else None
 
 class GraphicsEngine:
-    def __init__(self, window_size=(1600,900)):
+    def __init__(self, window_size=(1600,900), instanced=False, headless=False, scene_path=None,
+                 step_rate=STEP_RATE, pacing=None, target_fps=TARGET_FPS, vsync=False, workers=DEFAULT_WORKERS,
+                 dynamic_resolution=None, min_scale=MIN_SCALE, max_scale=MAX_SCALE, resolution_scale=None):
+        self.start_time = time.perf_counter()
+        self.headless = headless
+        if headless:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
         pg.init()
         self.WIN_SIZE=window_size
-        pg.display.gl_set_attribute(pg.GL_CONTEXT_MAJOR_VERSION, 3)
-        pg.display.gl_set_attribute(pg.GL_CONTEXT_MINOR_VERSION, 3)
-        pg.display.gl_set_attribute(pg.GL_CONTEXT_PROFILE_MASK, pg.GL_CONTEXT_PROFILE_CORE)
-        
-        # Create opengl context
-        self.screen = pg.display.set_mode(self.WIN_SIZE, flags=pg.OPENGL | pg.DOUBLEBUF)
+        self.instanced = instanced
+        self.scene_path = scene_path  # cena .e3ds carregada no lugar dos objetos padrão
+
+        if not headless:
+            pg.display.gl_set_attribute(pg.GL_CONTEXT_MAJOR_VERSION, 3)
+            pg.display.gl_set_attribute(pg.GL_CONTEXT_MINOR_VERSION, 3)
+            pg.display.gl_set_attribute(pg.GL_CONTEXT_PROFILE_MASK, pg.GL_CONTEXT_PROFILE_CORE)
+
+            # Create opengl context
+            self.screen = pg.display.set_mode(self.WIN_SIZE, flags=pg.OPENGL | pg.DOUBLEBUF, vsync=int(vsync))
+
+            # Mouse settings
+            pg.event.set_grab(True)
+            pg.mouse.set_visible(False)
         self.ui_surface = pg.Surface(self.WIN_SIZE, pg.SRCALPHA)
         
-        # Mouse settings
-        pg.event.set_grab(True)
-        pg.mouse.set_visible(False)
-        
         # Spacing 
         self.objects_added = []
         self.spacing = 2
 
-        # Detect and use existing opengl context
-        self.ctx = mgl.create_context()
+        if headless:
+            # Contexto standalone + framebuffer offscreen no tamanho da janela
+            backend = {'backend': HEADLESS_BACKEND} if HEADLESS_BACKEND else {}
+            self.ctx = mgl.create_standalone_context(require=330, **backend)
+            self.fbo = self.ctx.simple_framebuffer(self.WIN_SIZE)
+            self.fbo.use()
+        else:
+            # Detect and use existing opengl context
+            self.ctx = mgl.create_context()
         self.ctx.enable(flags=mgl.DEPTH_TEST | mgl.CULL_FACE)
 
         # Create an object to help track time
         self.clock = pg.time.Clock()
         self.time = 0
         self.delta_time = 0
+        self.frame_count = 0
+
+        # Simulação em passo fixo + ritmo dos frames; headless avança um passo por frame (determinístico)
+        self.scheduler = FrameScheduler(self, step_rate, pacing or ('uncapped' if headless else 'capped'),
+                                        target_fps, deterministic=headless)
+
+        # Escopos de CPU/GPU e contadores por frame
+        self.profiler = Profiler(self)
         
         # Light
         self.light = Light()
@@ -43,12 +82,42 @@ class GraphicsEngine:
         # Initializing camera
         self.camera = Camera(self)
 
+        # Pools de buffers, referências dos objetos e memória de GPU por categoria
+        self.resources = ResourceManager(self.ctx)
+
         # Mesh
         self.mesh = Mesh(self)
 
+        # Cache de estado (uniforms, texturas) e uniform buffer do frame
+        self.render_state = RenderState(self)
+
+        # Luzes num uniform buffer + listas de luzes por tile da tela
+        self.lights = LightManager(self)
+        self.lights.add(self.light)
+
+        # Cena desenhada num alvo offscreen com escala ajustada ao orçamento do frame e ampliada
+        # para a janela; headless usa escala fixa por padrão (reprodutível)
+        self.resolution = ResolutionScaler(self, target_fps, min_scale, max_scale, resolution_scale,
+                                           adaptive=not headless if dynamic_resolution is None else dynamic_resolution)
+
+        # Threads da etapa de preparação do frame (transformações, culling, chaves de ordenação)
+        self.pool = WorkerPool(workers)
+
+        # Transformações de todos os objetos
+        self.transforms = TransformStore(pool=self.pool)
+
         # Scene - Load object
         self.scene = Scene(self)
 
+        # Painel com as estatísticas do profiler (F1 mostra/esconde, F2 grava CSV/trace)
+        self.overlay = Overlay(self)
+
+        # Gravação de frames (F4 ou record()) e caminho de câmera seguido em passo fixo
+        self.recorder = None
+        self.camera_path = None
+        self.path_time = 0.0
+        self.recording_deterministic = False
+
     def calculate_next_position(self):
         """Calcula a próxima posição com base nos objetos já adicionados"""
         if len(self.objects_added) == 0:
@@ -63,10 +132,17 @@ class GraphicsEngine:
     def check_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE):
-                self.mesh.destroy()
-                pg.quit()
+                self.destroy()
                 sys.exit()
 
+            # Clique esquerdo seleciona o objeto sob o mouse (alvo das hotkeys); com o mouse preso e
+            # invisível, event.pos não corresponde a nada na tela e a mira é o centro dela
+            elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
+                if pg.event.get_grab():
+                    self.scene.pick((self.WIN_SIZE[0] / 2, self.WIN_SIZE[1] / 2))
+                else:
+                    self.scene.pick(event.pos)
+
             # Detecta a tecla pressionada para adicionar objetos
             elif event.type == pg.KEYDOWN:
                 if event.key == pg.K_0:  
@@ -81,23 +157,153 @@ class GraphicsEngine:
                     self.scene.undo()
                 if event.key == pg.K_y:  
                     self.scene.redo()
+                if event.key == pg.K_i:
+                    self.scene.instanced = not self.scene.instanced  # Alterna o modo instanciado
+                if event.key == pg.K_o:
+                    self.scene.occlusion.enabled = not self.scene.occlusion.enabled  # Alterna o occlusion culling
+                if event.key == pg.K_F1:
+                    self.overlay.visible = not self.overlay.visible
+                if event.key == pg.K_F2:
+                    self.profiler.dump()
+                if event.key == pg.K_F3:
+                    self.resolution.adaptive = not self.resolution.adaptive  # Alterna a resolução dinâmica
+                if event.key == pg.K_F4:
+                    if self.recorder is None:
+                        self.start_recording(time.strftime('recording_%Y%m%d_%H%M%S'))
+                    else:
+                        self.stop_recording()
+
+    def simulate(self, step_ms):
+        """ Um passo fixo de simulação (chamado pelo FrameScheduler) """
+        self.delta_time = step_ms  # Camera.move escala pela duração do passo, em ms
+        self.transforms.begin_step()
+        if self.camera_path is not None:
+            self.camera.follow(self.camera_path.pose(self.path_time))
+            self.path_time += step_ms / 1000
+        else:
+            self.camera.step()
+        self.transforms.end_step()
+
+    def start_recording(self, directory, fmt='png', camera_path=None):
+        """ Grava os frames seguintes em `directory`; com `camera_path` a câmera segue o caminho """
+        self.recorder = FrameRecorder(self, directory, fmt)
+        # Um passo fixo por frame enquanto grava: a gravação não depende da velocidade da máquina
+        self.recording_deterministic = self.scheduler.deterministic
+        self.scheduler.deterministic = True
+        self.camera_path = camera_path
+        if camera_path is not None:
+            # Com alpha = 0 o frame mostra a pose anterior ao passo: o frame k fica na pose do instante k
+            self.camera.follow(camera_path.pose(0.0))
+            self.camera.previous = None
+            self.path_time = self.scheduler.step_ms / 1000
+
+    def stop_recording(self):
+        report = self.recorder.finish()
+        self.recorder = None
+        self.camera_path = None
+        self.scheduler.deterministic = self.recording_deterministic
+        print(f"Gravação: {report['written']} de {report['frames']} frames em {report['directory']} "
+              f"({report['dropped']} descartados, {report['late']} atrasados, "
+              f"captura {report['capture_ms']:.2f} ms/frame)")
+        return report
+
+    def record(self, directory, camera_path, fmt='png'):
+        """ Grava o caminho inteiro, um frame por passo fixo, e devolve o relatório """
+        frames = int(camera_path.duration * 1000 / self.scheduler.step_ms) + 1
+        self.start_recording(directory, fmt, camera_path)
+        self.run_frames(frames)
+        return self.stop_recording()
+
+    def render_stages(self):
+        """
+        Etapas do render deste frame, em ordem: (etapa, escopo do profiler ou None, função).
+
+        render() roda todas; o benchmark cronometra as mesmas, agrupadas pela etapa.
+        """
+        alpha = self.scheduler.alpha
+        stages = [('begin', 'render/begin', lambda: self.begin_frame(alpha)),
+                  ('scene_update', None, lambda: self.scene.update(alpha)),  # escopos próprios (scene/...)
+                  ('draw', None, self.scene.draw),
+                  ('draw', 'render/upscale', self.resolution.present)]
+        if self.recorder is not None:
+            stages.append(('draw', 'render/capture', self.recorder.capture))
+        stages += [('draw', 'render/overlay', self.overlay.render),
+                   ('draw', 'render/flip', self.end_frame)]
+        return stages
 
     def render(self):
+        profiler = self.profiler
+        for _, scope, run in self.render_stages():
+            if scope is None:
+                run()
+            else:
+                with profiler.scope(scope):
+                    run()
+
+    def begin_frame(self, alpha=1.0):
+        self.camera.interpolate(alpha)
+        self.resources.collect()  # VAOs/texturas que ficaram sem objetos no frame anterior
+        self.resolution.begin_frame()
         self.ctx.clear(color=(0.22, 0.16, 0.18))
-        self.scene.render()
-        pg.display.flip()
+        self.mesh.texture.poll()  # Texturas decodificadas em segundo plano
+        self.mesh.vao.program.poll()  # Shaders editados são recompilados (hot reload)
+        self.render_state.begin_frame()
+        self.lights.update()
+
+    def end_frame(self):
+        self.resolution.end_frame()
+        if not self.headless:
+            pg.display.flip()
+        self.frame_count += 1
+        if self.frame_count == 1:
+            print(f"Primeiro frame em {(time.perf_counter() - self.start_time) * 1000:.1f} ms")
     
     def get_time(self):
         self.time = pg.time.get_ticks() * 0.001
 
+    def destroy(self):
+        if self.recorder is not None:
+            self.stop_recording()
+        self.overlay.destroy()
+        self.scene.destroy()
+        self.render_state.destroy()
+        self.lights.destroy()
+        self.resolution.destroy()
+        self.mesh.destroy()
+        self.resources.destroy()
+        self.pool.destroy()
+        if self.headless:
+            self.fbo.release()
+            self.ctx.release()
+        pg.quit()
+
     def run(self):
+        profiler = self.profiler
         while True:
-            self.get_time()
-            self.check_events()
-            self.camera.update()
+            profiler.begin_frame()
+            with profiler.scope('events'):
+                self.get_time()
+                self.check_events()
+            with profiler.scope('simulate'):
+                self.scheduler.advance()
+            self.render()
+            with profiler.scope('tick'):
+                self.scheduler.pace()
+
+    def run_frames(self, frames):
+        """ Roda um número fixo de frames (headless: um passo fixo por frame, sem limitar o FPS) """
+        profiler = self.profiler
+        for _ in range(frames):
+            profiler.begin_frame()
+            with profiler.scope('events'):
+                self.get_time()
+                if not self.headless:
+                    self.check_events()
+            with profiler.scope('simulate'):
+                self.scheduler.advance()
             self.render()
-            self.delta_time = self.clock.tick(60)
+            self.scheduler.pace()
     
 if __name__ == "__main__":
-    app = GraphicsEngine()
+    app = GraphicsEngine(scene_path=sys.argv[1] if len(sys.argv) > 1 else None)
     app.run()
\ No newline at end of file
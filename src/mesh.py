@@ -4,8 +4,9 @@ from texture import Texture
 class Mesh:
     def __init__(self, app):
         self.app = app
-        self.vao = VAO(app.ctx)
-        self.texture = Texture(app.ctx)
+        # VBOs, VAOs e texturas são criados no primeiro uso, com buffers dos pools de app.resources
+        self.vao = VAO(app.ctx, app.resources)
+        self.texture = Texture(app.ctx, app.resources)
 
     def destroy(self):
         self.vao.destroy()
@@ -0,0 +1,330 @@
+"""
+Importação de malhas Wavefront OBJ e glTF 2.0 binário (.glb) para o layout '2f 3f 3f'
+(in_texcoord_0, in_normal, in_position) com índices uint32.
+
+O OBJ é lido em blocos de linhas (o texto nunca fica inteiro na memória) e cada bloco é
+convertido com NumPy; o .glb é lido por memmap direto dos accessors. O resultado de cada
+arquivo fica num cache binário (chave = sha1 do conteúdo) para recargas rápidas.
+"""
+import hashlib
+import json
+import os
+import struct
+import time
+from itertools import islice
+import numpy as np
+from vbo import BaseVBO
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'meshes')
+CACHE_VERSION = 2
+# Cabeçalho do cache: vertex_count, index_count, floats por vértice, versão (uint32)
+HEADER_SIZE = 16
+FLOATS_PER_VERTEX = 8
+LINES_PER_CHUNK = 1 << 18
+HASH_BLOCK = 1 << 20
+
+GLB_MAGIC = b'glTF'
+GLB_JSON, GLB_BIN = 0x4E4F534A, 0x004E4942
+TRIANGLES = 4
+COMPONENT_TYPES = {5120: 'i1', 5121: 'u1', 5122: '<i2', 5123: '<u2', 5125: '<u4', 5126: '<f4'}
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT4': 16}
+
+
+def file_hash(path):
+    """ sha1 do arquivo lido em blocos """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def flat_normals(positions, triangles):
+    """ Normal da face de cada triângulo, uma por canto: (n, 3, 3) """
+    p0, p1, p2 = positions[triangles[:, 0]], positions[triangles[:, 1]], positions[triangles[:, 2]]
+    normals = np.cross(p1 - p0, p2 - p0)
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = normals / np.where(length > 0, length, 1)
+    return np.repeat(normals[:, None, :], 3, axis=1)
+
+
+def build_vertices(positions, triangles, uv=None):
+    """ Triângulos sem normais: normal da face em cada canto, depois deduplica os vértices """
+    corners = triangles.reshape(-1)
+    if uv is None:
+        uv = np.zeros((len(corners), 2), dtype='f4')
+    normals = flat_normals(positions, triangles).reshape(-1, 3)
+    vertex_data = np.hstack([uv, normals, positions[corners]]).astype('f4')
+    return BaseVBO.deduplicate(vertex_data)
+
+
+# ---------------------------------------------------------------- OBJ
+
+def parse_floats(lines, columns):
+    """ Linhas 'v x y z [w]' de um bloco -> (n, columns) """
+    if not lines:
+        return np.zeros((0, columns), dtype='f4')
+    values = np.array(' '.join(line.split(None, 1)[1] for line in lines).split(), dtype='f4')
+    if len(values) % len(lines) == 0 and len(values) // len(lines) >= columns:
+        return values.reshape(len(lines), -1)[:, :columns]
+    # Linhas com quantidades diferentes de valores (ex.: cor por vértice só em algumas)
+    return np.array([line.split()[1:columns + 1] for line in lines], dtype='f4')
+
+
+def parse_corners(texts, size):
+    """ Faces com cantos em formatos misturados (v, v/vt, v//vn, v/vt/vn): um canto por vez, 0 = ausente """
+    values = [int(ref or 0) for text in texts for corner in text.split()
+              for ref in (corner.split('/') + ['', ''])[:3]]
+    return np.array(values, dtype=np.int64).reshape(len(texts), size, 3)
+
+
+def parse_faces(groups):
+    """
+    {(cantos por face, refs por canto): (textos, contagens)} -> triângulos (n, 3, 3) com refs v/vt/vn
+    base 0 (-1 = ausente); refs 0 são faces com formatos misturados entre os cantos
+    """
+    triangles = [np.zeros((0, 3, 3), dtype=np.int64)]
+    for (size, refs), (texts, counts) in groups.items():
+        if refs:
+            values = np.array(' '.join(texts).replace('//', '/0/').replace('/', ' ').split(), dtype=np.int64)
+            faces = np.zeros((len(texts), size, 3), dtype=np.int64)
+            faces[:, :, :refs] = values.reshape(len(texts), size, refs)
+        else:
+            faces = parse_corners(texts, size)
+        # Índices negativos são relativos ao total lido até a face; 0 = ausente
+        counts = np.asarray(counts, dtype=np.int64)[:, None, :]
+        faces = np.where(faces < 0, faces + counts, faces - 1)
+        # Polígonos viram leques de triângulos (0, i, i + 1)
+        fan = np.array([(0, i, i + 1) for i in range(1, size - 1)])
+        triangles.append(faces[:, fan].reshape(-1, 3, 3))
+    return np.concatenate(triangles)
+
+
+def load_obj(path):
+    positions, tex_coords, normals, triangles = [], [], [], []
+    counts = [0, 0, 0]  # v, vt, vn lidos até agora
+    with open(path, 'r', errors='replace') as file:
+        while True:
+            lines = list(islice(file, LINES_PER_CHUNK))
+            if not lines:
+                break
+            v, vt, vn, faces = [], [], [], {}
+            for line in lines:
+                # Palavra-chave separada por qualquer espaço (tabs, recuo antes dela)
+                parts = line.split(None, 1)
+                kind = parts[0] if parts else ''
+                if kind == 'v':
+                    v.append(line)
+                    counts[0] += 1
+                elif kind == 'vt':
+                    vt.append(line)
+                    counts[1] += 1
+                elif kind == 'vn':
+                    vn.append(line)
+                    counts[2] += 1
+                elif kind == 'f' and len(parts) > 1:
+                    corners = parts[1].split('#', 1)[0].split()
+                    if len(corners) >= 3:
+                        # Agrupadas também pelo formato do canto (v, v/vt, v//vn, v/vt/vn); 0 = misturados
+                        slashes = {corner.count('/') for corner in corners}
+                        refs = slashes.pop() + 1 if len(slashes) == 1 else 0
+                        texts, face_counts = faces.setdefault((len(corners), refs), ([], []))
+                        texts.append(' '.join(corners))
+                        face_counts.append(tuple(counts))
+            positions.append(parse_floats(v, 3))
+            tex_coords.append(parse_floats(vt, 2))
+            normals.append(parse_floats(vn, 3))
+            triangles.append(parse_faces(faces))
+
+    positions = np.concatenate(positions)
+    tex_coords = np.concatenate(tex_coords)
+    normals = np.concatenate(normals)
+    triangles = np.concatenate(triangles)
+    if not len(triangles):
+        raise ValueError(f"{path}: nenhuma face encontrada")
+
+    # Cada face tem só os dados que declara: sem vt, uv (0, 0); sem vn, a normal da face
+    if not len(tex_coords):
+        triangles[:, :, 1] = -1
+    if not len(normals):
+        triangles[:, :, 2] = -1
+    tex_coords = np.vstack([tex_coords, np.zeros((1, 2), dtype='f4')])  # ref -1 cai nesta linha
+    if (triangles[:, :, 2] >= 0).all():
+        # Cantos idênticos (mesmo v/vt/vn) já são o mesmo vértice: deduplica pelas referências
+        refs = triangles.reshape(-1, 3)
+        # Uma chave int64 por canto ordena bem mais rápido que np.unique(axis=0)
+        keys = (refs[:, 0] * len(tex_coords) + refs[:, 1] + 1) * (len(normals) + 1) + refs[:, 2] + 1
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        unique = refs[first]
+        vertex_data = np.hstack([tex_coords[unique[:, 1]], normals[unique[:, 2]], positions[unique[:, 0]]])
+        return vertex_data.astype('f4'), inverse.ravel().astype('u4')
+    corners = triangles.reshape(-1, 3)
+    normal = flat_normals(positions, triangles[:, :, 0]).reshape(-1, 3)
+    if len(normals):
+        declared = corners[:, 2] >= 0
+        normal[declared] = normals[corners[declared, 2]]
+    vertex_data = np.hstack([tex_coords[corners[:, 1]], normal, positions[corners[:, 0]]]).astype('f4')
+    return BaseVBO.deduplicate(vertex_data)
+
+
+# ---------------------------------------------------------------- glTF (.glb)
+
+def node_matrix(node):
+    """ Matriz local (matemática, 4x4) de um nó: `matrix` ou T * R * S """
+    if 'matrix' in node:
+        return np.array(node['matrix'], dtype='f8').reshape(4, 4).T  # glTF é column-major
+    x, y, z, w = node.get('rotation', (0, 0, 0, 1))
+    rotation = np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                         [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                         [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.asarray(node.get('scale', (1, 1, 1)), dtype='f8')
+    matrix[:3, 3] = node.get('translation', (0, 0, 0))
+    return matrix
+
+
+class GLBReader:
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype='u1', mode='r')
+        magic, version, length = struct.unpack_from('<4sII', self.data, 0)
+        if magic != GLB_MAGIC or version != 2:
+            raise ValueError(f"{path}: não é um glTF 2.0 binário")
+        self.json, self.bin_offset = None, None
+        offset = 12
+        while offset < length:
+            chunk_length, chunk_type = struct.unpack_from('<II', self.data, offset)
+            start = offset + 8
+            if chunk_type == GLB_JSON:
+                self.json = json.loads(bytes(self.data[start:start + chunk_length]))
+            elif chunk_type == GLB_BIN and self.bin_offset is None:
+                self.bin_offset = start
+            offset = start + chunk_length
+
+    def accessor(self, index):
+        """ Accessor -> array (count, componentes), sem copiar quando possível """
+        accessor = self.json['accessors'][index]
+        if 'sparse' in accessor or 'bufferView' not in accessor:
+            raise ValueError(f"{self.path}: accessors esparsos ou sem bufferView não são suportados")
+        view = self.json['bufferViews'][accessor['bufferView']]
+        if view.get('buffer', 0) != 0 or self.bin_offset is None:
+            raise ValueError(f"{self.path}: só o buffer binário embutido no .glb é suportado")
+        dtype = np.dtype(COMPONENT_TYPES[accessor['componentType']])
+        components = TYPE_SIZES[accessor['type']]
+        count = accessor['count']
+        offset = self.bin_offset + view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+        stride = view.get('byteStride') or dtype.itemsize * components
+        values = np.ndarray((count, components), dtype=dtype, buffer=self.data,
+                            offset=offset, strides=(stride, dtype.itemsize))
+        if accessor.get('normalized') and dtype.kind in 'iu':
+            # -max e -max - 1 viram -1.0 (especificação do glTF)
+            values = np.maximum(values / np.iinfo(dtype).max, -1.0)
+        return values
+
+    def primitives(self):
+        """ (primitive, matriz do mundo) de todos os nós da cena padrão """
+        gltf = self.json
+        if 'nodes' not in gltf:
+            for mesh in gltf.get('meshes', []):
+                for primitive in mesh['primitives']:
+                    yield primitive, np.eye(4)
+            return
+        scenes = gltf.get('scenes')
+        roots = scenes[gltf.get('scene', 0)]['nodes'] if scenes else range(len(gltf['nodes']))
+        stack = [(node, np.eye(4)) for node in roots]
+        while stack:
+            index, parent = stack.pop()
+            node = gltf['nodes'][index]
+            world = parent @ node_matrix(node)
+            if 'mesh' in node:
+                for primitive in gltf['meshes'][node['mesh']]['primitives']:
+                    yield primitive, world
+            stack.extend((child, world) for child in node.get('children', []))
+
+
+def load_glb(path):
+    reader = GLBReader(path)
+    vertex_parts, index_parts, base = [], [], 0
+    for primitive, world in reader.primitives():
+        if primitive.get('mode', TRIANGLES) != TRIANGLES:
+            continue
+        attributes = primitive['attributes']
+        positions = reader.accessor(attributes['POSITION']).astype('f8')
+        positions = positions @ world[:3, :3].T + world[:3, 3]
+        if 'indices' in primitive:
+            triangles = reader.accessor(primitive['indices']).reshape(-1, 3).astype(np.int64)
+        else:
+            triangles = np.arange(len(positions)).reshape(-1, 3)
+
+        tex_coords = None
+        if 'TEXCOORD_0' in attributes:
+            # glTF tem a origem da textura em cima; o OpenGL, embaixo
+            tex_coords = reader.accessor(attributes['TEXCOORD_0']).astype('f4') * (1, -1) + (0, 1)
+        if 'NORMAL' in attributes:
+            normal_matrix = np.linalg.inv(world[:3, :3]).T
+            normals = reader.accessor(attributes['NORMAL']).astype('f8') @ normal_matrix.T
+            normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+            uv = tex_coords if tex_coords is not None else np.zeros((len(positions), 2), dtype='f4')
+            vertex_data = np.hstack([uv, normals, positions]).astype('f4')
+            index_data = triangles.ravel().astype('u4')
+        else:
+            uv = tex_coords[triangles.reshape(-1)] if tex_coords is not None else None
+            vertex_data, index_data = build_vertices(positions, triangles, uv)
+        vertex_parts.append(vertex_data)
+        index_parts.append(index_data + base)
+        base += len(vertex_data)
+    if not vertex_parts:
+        raise ValueError(f"{path}: nenhuma primitiva de triângulos encontrada")
+    return np.concatenate(vertex_parts), np.concatenate(index_parts)
+
+
+# ---------------------------------------------------------------- cache
+
+LOADERS = {'.obj': load_obj, '.glb': load_glb}
+
+
+def load_mesh(path):
+    """ (vertex_data (n, 8) f4, index_data u4) de um .obj/.glb; `path` relativo a models/ """
+    start = time.perf_counter()
+    path = os.path.join(MODEL_DIR, path)
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in LOADERS:
+        raise ValueError(f"{path}: formato não suportado ({', '.join(LOADERS)})")
+    cache_path = os.path.join(CACHE_DIR, f'{file_hash(path)}.v{CACHE_VERSION}.mesh')
+
+    if os.path.exists(cache_path):
+        raw = np.memmap(cache_path, dtype='u1', mode='r')
+        vertex_count, index_count, floats, _ = raw[:HEADER_SIZE].view('<u4')
+        vertex_end = HEADER_SIZE + int(vertex_count) * int(floats) * 4
+        vertex_data = raw[HEADER_SIZE:vertex_end].view('<f4').reshape(-1, int(floats))
+        index_data = raw[vertex_end:vertex_end + int(index_count) * 4].view('<u4')
+        cached = True
+    else:
+        vertex_data, index_data = LOADERS[extension](path)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        header = np.array([len(vertex_data), len(index_data), FLOATS_PER_VERTEX, CACHE_VERSION], dtype='<u4')
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(header.tobytes())
+            file.write(np.ascontiguousarray(vertex_data, dtype='<f4').tobytes())
+            file.write(np.ascontiguousarray(index_data, dtype='<u4').tobytes())
+        os.replace(tmp_path, cache_path)
+        cached = False
+
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Malha {os.path.basename(path)}: {len(vertex_data)} vértices, {len(index_data) // 3} triângulos "
+          f"em {elapsed:.1f} ms ({'cache' if cached else 'importada'})")
+    return vertex_data, index_data
+
+
+class ImportedVBO(BaseVBO):
+    """ VBO de uma malha importada de arquivo """
+    def __init__(self, ctx, resources, path):
+        self.path = path
+        super().__init__(ctx, resources)
+        self.format = '2f 3f 3f'
+        self.attribs = ['in_texcoord_0', 'in_normal', 'in_position']
+
+    def get_vertex_data(self):
+        return load_mesh(self.path)
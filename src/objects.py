@@ -1,102 +1,157 @@
 import glm
+import numpy as np
 
 class BaseModel:
     def __init__ (self, app, vao_name, tex_id, pos=(0,0,0), rot=(0,0,0), scale=(1,1,1)):
-        self.app = app
-        self.pos = pos
-        self.rot = glm.vec3([glm.radians(a) for a in rot])
-        self.scale = scale
-        self.m_model = self.get_model_matrix()
+        self.__dict__.update(self.shared_attributes(app, vao_name))
+        # Transformação guardada no TransformStore compartilhado da cena
+        bounds = app.mesh.vao.vbo.vbos[vao_name].bounds
+        self.index = self.transforms.allocate(pos, [glm.radians(a) for a in rot], scale, bounds)
         self.tex_id = tex_id
-        self.vao = app.mesh.vao.vaos[vao_name]
-        self.program = self.vao.program
-        self.camera = self.app.camera
-    
-    def update(self): ...
+        self.on_init()
+
+    @staticmethod
+    def shared_attributes(app, vao_name):
+        """ Atributos iguais para todos os objetos do mesmo VAO """
+        return {
+            'app': app,
+            'transforms': app.transforms,
+            'vao_name': vao_name,
+            # Variantes de LOD do VAO (None se o VAO não tem cadeia de LOD)
+            'lod_chain': app.mesh.vao.vbo.lods.get(vao_name),
+            'lod': 0,
+            'triangles': app.mesh.vao.vbo.vbos[vao_name].index_count // 3,
+            'profiler': app.profiler,
+            'camera': app.camera,
+            'state': app.render_state,
+        }
+
+    @classmethod
+    def bulk(cls, app, indices, tex_ids, vao_name=None):
+        """ Cria objetos para índices já alocados no TransformStore, sem o on_init de cada um """
+        shared = cls.shared_attributes(app, vao_name or cls.default_vao)
+        new = cls.__new__
+        objects = []
+        for index, tex_id in zip(indices.tolist(), tex_ids.tolist()):
+            obj = new(cls)
+            obj.__dict__ = {**shared, 'index': index, 'tex_id': tex_id}
+            objects.append(obj)
+        # Os uniforms de on_init são do programa, basta enviá-los uma vez
+        if objects:
+            objects[0].on_init()
+        return objects
+
+    def update(self):
+        self.state.use_texture(self.texture)
+        self.state.set_value(self.program, "u_layer", self.layer)
+        # camPos e m_view vêm do uniform buffer do frame (RenderState)
+        self.state.write(self.program, "m_model", self.m_model)
+
+    def on_init(self):
+        # Luzes vêm do uniform buffer Lights (LightManager)
+        # Texture
+        self.state.set_value(self.program, "u_texture_0", 0)
+        self.state.use_texture(self.texture)
+        # MVP (m_proj e m_view estão no uniform buffer do frame)
+        self.state.write(self.program, "m_model", self.m_model)
+
+    @property
+    def pos(self):
+        # pos/rot/scale são relativos ao pai no grafo de cena (Scene.attach)
+        return glm.vec3(*self.transforms.positions[self.index])
+
+    @pos.setter
+    def pos(self, value):
+        self.transforms.positions[self.index] = tuple(value)
+        self.transforms.mark_dirty(self.index)
+
+    @property
+    def world_pos(self):
+        return glm.vec3(*self.transforms.matrices[self.index][3, :3])
+
+    @property
+    def rot(self):
+        return glm.vec3(*self.transforms.rotations[self.index])
+
+    @rot.setter
+    def rot(self, value):
+        self.transforms.rotations[self.index] = tuple(value)
+        self.transforms.mark_dirty(self.index)
+
+    @property
+    def scale(self):
+        return glm.vec3(*self.transforms.scales[self.index])
+
+    @scale.setter
+    def scale(self, value):
+        self.transforms.scales[self.index] = tuple(value)
+        self.transforms.mark_dirty(self.index)
+
+    @property
+    def vao(self):
+        # Buscado a cada uso: o hot reload de shaders troca os VAOs em VAO.vaos
+        return self.app.mesh.vao.vaos[self.vao_name]
+
+    @property
+    def program(self):
+        return self.vao.program
+
+    @property
+    def texture(self):
+        # Resolvida a cada uso: o placeholder é trocado quando a textura real termina de carregar
+        return self.app.mesh.texture.textures[self.tex_id]
+
+    @property
+    def layer(self):
+        # Camada da textura dentro do texture_array (0 no placeholder, antes de a textura ser pedida)
+        return self.app.mesh.texture.layers.get(self.tex_id, 0)
+
+    @property
+    def aabb(self):
+        """ AABB no mundo (min, max) """
+        return self.transforms.aabb_min[self.index], self.transforms.aabb_max[self.index]
+
+    @property
+    def bounding_sphere(self):
+        """ Esfera que envolve a AABB: (centro, raio) """
+        aabb_min, aabb_max = self.aabb
+        return (aabb_min + aabb_max) * 0.5, float(np.linalg.norm(aabb_max - aabb_min)) * 0.5
+
+    @property
+    def m_model(self):
+        return self.get_model_matrix()
 
     def get_model_matrix(self):
-        m_model = glm.mat4()
-        self.pos = glm.vec3(self.pos)
-        # Translate
-        m_model = glm.translate(m_model, self.pos)
-        # Rotate 
-        m_model = glm.rotate(m_model, self.rot.x, glm.vec3(1, 0, 0))
-        m_model = glm.rotate(m_model, self.rot.y, glm.vec3(0, 1, 0))
-        m_model = glm.rotate(m_model, self.rot.z, glm.vec3(0, 0, 1))
-        # scale
-        m_model = glm.scale(m_model, self.scale)
-        return m_model
+        # Matriz 4x4 float32 (column-major), recalculada em TransformStore.update()
+        return self.transforms.matrices[self.index]
+
+    def set_lod(self, level):
+        """ Troca o VAO pela variante `level` da cadeia de LOD """
+        self.lod = level
+        self.vao_name = self.lod_chain[level]
+        self.triangles = self.app.mesh.vao.vbo.vbos[self.vao_name].index_count // 3
+
+    def translate(self, delta):
+        self.transforms.translate(self.index, delta)
+
+    def rotate(self, delta):
+        """ Rotaciona o objeto em `delta` graus """
+        self.transforms.rotate(self.index, [glm.radians(a) for a in delta])
     
     def render(self):
         self.update()
         self.vao.render()
+        self.profiler.count('draw_calls')
+        self.profiler.count('triangles', self.triangles)
 
 class Cube(BaseModel):
+    default_vao = 'cube'
+
     def __init__(self, app, vao_name='cube', tex_id=0, pos=(0,0,0), rot=(0,0,0), scale=(1,1,1)):
         super().__init__(app, vao_name, tex_id, pos, rot, scale)
-        self.on_init()
-        """
-        self.app = app
-        self.ctx = app.ctx
-        self.vbo = self.get_vbo()
-        self.shader_program = self.get_shader_program('default')
-        self.vao = self.get_vao()
-        self.m_model = self.get_model_matrix()
-        self.on_init()
-        """
-
-    def update(self):
-        self.texture.use()
-        #m_model = glm.rotate(self.m_model, self.app.time * 0.5, glm.vec3(0, 1, 0))
-        self.program["camPos"].write(self.camera.position)
-        self.program["m_model"].write(self.m_model)
-        self.program["m_view"].write(self.camera.m_view)
-
-    def on_init(self):
-        self.program["light.position"].write(self.app.light.position)
-        self.program["light.Ia"].write(self.app.light.Ia)
-        self.program["light.Id"].write(self.app.light.Id)
-        self.program["light.Is"].write(self.app.light.Is)
-        # Texture
-        self.texture = self.app.mesh.texture.textures[self.tex_id]
-        self.program["u_texture_0"] = 0
-        self.texture.use()
-        # MVP
-        self.program["m_proj"].write(self.camera.m_proj)
-        self.program["m_view"].write(self.camera.m_view)
-        self.program["m_model"].write(self.m_model)
 
 class Sphere(BaseModel):
+    default_vao = 'sphere'
+
     def __init__(self, app, vao_name='sphere', tex_id=0, pos=(0,0,0), rot=(0,0,0), scale=(1,1,1)):
         super().__init__(app, vao_name, tex_id, pos, rot, scale)
-        self.on_init()
-        """
-        self.app = app
-        self.ctx = app.ctx
-        self.vbo = self.get_vbo()
-        self.shader_program = self.get_shader_program('default')
-        self.vao = self.get_vao()
-        self.m_model = self.get_model_matrix()
-        self.on_init()
-        """
-
-    def update(self):
-        self.texture.use()
-        #m_model = glm.rotate(self.m_model, self.app.time * 0.5, glm.vec3(0, 1, 0))
-        self.program["camPos"].write(self.camera.position)
-        self.program["m_model"].write(self.m_model)
-        self.program["m_view"].write(self.camera.m_view)
-
-    def on_init(self):
-        self.program["light.position"].write(self.app.light.position)
-        self.program["light.Ia"].write(self.app.light.Ia)
-        self.program["light.Id"].write(self.app.light.Id)
-        self.program["light.Is"].write(self.app.light.Is)
-        # Texture
-        self.texture = self.app.mesh.texture.textures[self.tex_id]
-        self.program["u_texture_0"] = 0
-        self.texture.use()
-        # MVP
-        self.program["m_proj"].write(self.camera.m_proj)
-        self.program["m_view"].write(self.camera.m_view)
-        self.program["m_model"].write(self.m_model)
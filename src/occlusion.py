@@ -0,0 +1,163 @@
+from collections import deque
+import moderngl as mgl
+import numpy as np
+
+MAX_QUERIES = 1024     # consultas emitidas por frame (as demais esperam a vez)
+# Frames entre emitir uma consulta e ler o resultado: o moderngl não diz se ele já está pronto, e
+# ler cedo demais trava a CPU até a GPU terminar (mesma ideia de GPU_LATENCY no Profiler)
+QUERY_LATENCY = 2
+RECHECK_INTERVAL = 8   # objetos visíveis são reconsultados a cada N frames, em rodízio
+VISIBLE_SHARE = 0.25   # fração mínima do orçamento reservada aos visíveis quando há consultas demais
+# Folga da caixa: a face da AABB coincide com a superfície de um cubo e perderia no teste de profundidade
+PADDING = 0.01
+MIN_PADDING = 1e-3
+
+
+def rotate(indices, offset):
+    """ `indices` começando na posição `offset` (módulo o tamanho) """
+    return np.roll(indices, -(offset % len(indices))) if len(indices) else indices
+
+
+class OcclusionCuller:
+    """
+    Occlusion culling por hardware com coerência temporal.
+
+    Depois do passo principal (profundidade já preenchida), a AABB de cada candidato é desenhada
+    sem gravar cor nem profundidade dentro de um `ctx.query(samples=True)` (o moderngl não expõe o
+    resultado de any_samples fora do render condicional; samples > 0 equivale). As consultas de cada
+    frame ficam num anel e só são lidas QUERY_LATENCY frames depois, quando a GPU já as terminou:
+    até lá vale a visibilidade anterior, e quem ficou oculto não é desenhado enquanto continuar
+    oculto. Os ocultos são reconsultados todo frame (reaparecem com QUERY_LATENCY frames de atraso)
+    e os visíveis a cada RECHECK_INTERVAL frames. Acima de MAX_QUERIES consultas, os dois
+    grupos dividem o orçamento e cada um é percorrido em rodízio: ninguém fica sem consulta, mas um
+    objeto oculto pode levar alguns frames a mais para reaparecer.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.ctx = app.ctx
+        self.transforms = app.transforms
+        self.profiler = app.profiler
+        self.shaders = app.mesh.vao.program
+        self.enabled = True
+        self.occluded = np.zeros(0, dtype=bool)  # último resultado conhecido de cada índice
+        self.in_flight = deque()  # (índices, consultas) de cada frame ainda não lido, do mais antigo
+        self.free_queries = []    # consultas já lidas, reaproveitadas (moderngl não as libera)
+        self.frame = 0
+        self.stats = {'visible': 0, 'occluded': 0, 'queries': 0}
+        # Programa e VAO criados na primeira consulta
+        self.program = None
+        self.vao = None
+        self.shaders.add_listener(self.on_program)
+
+    def on_program(self, name, old, new):
+        if old is not None and old is self.program:
+            self.vao.release()
+            self.set_program(new)
+
+    def set_program(self, program):
+        self.program = program
+        self.vao = self.ctx.vertex_array(program, [])
+
+    def ensure_capacity(self):
+        capacity = self.transforms.capacity
+        if len(self.occluded) < capacity:
+            occluded = np.zeros(capacity, dtype=bool)
+            occluded[:len(self.occluded)] = self.occluded
+            self.occluded = occluded
+
+    def resolve(self, latency=QUERY_LATENCY):
+        """ Lê as consultas emitidas há pelo menos `latency` frames; as mais novas continuam na GPU """
+        while self.in_flight and len(self.in_flight) >= latency:
+            indices, queries = self.in_flight.popleft()
+            occluded = np.array([not query.samples for query in queries], dtype=bool)
+            valid = indices >= 0  # -1: índice esquecido depois da consulta
+            self.occluded[indices[valid]] = occluded[valid]
+            self.free_queries.extend(queries)
+
+    def filter(self, candidates):
+        """ Tira dos candidatos (índices já no frustum) os que estavam ocultos no último resultado """
+        self.ensure_capacity()
+        self.resolve()
+        if not self.enabled:
+            return candidates
+        visible = candidates[~self.occluded[candidates]]
+        self.stats = {'visible': len(visible), 'occluded': len(candidates) - len(visible), 'queries': 0}
+        self.profiler.count('visible_objects', len(visible))
+        self.profiler.count('occluded_objects', len(candidates) - len(visible))
+        return visible
+
+    def forget(self, indices):
+        """ Índices novos ou removidos começam visíveis """
+        self.ensure_capacity()
+        self.occluded[indices] = False
+        # Consultas ainda na GPU são de outro objeto (ou de antes da remoção)
+        for pending, _ in self.in_flight:
+            pending[np.isin(pending, indices)] = -1
+
+    def select(self, candidates):
+        """
+        Quem consultar neste frame: os ocultos e uma fatia dos visíveis (1 em RECHECK_INTERVAL).
+
+        Se passam de MAX_QUERIES, os visíveis ficam com pelo menos VISIBLE_SHARE do orçamento e cada
+        grupo começa num deslocamento que anda a cada frame, então todos são consultados em
+        ceil(tamanho do grupo / orçamento do grupo) vezes.
+        """
+        occluded = candidates[self.occluded[candidates]]
+        visible = candidates[~self.occluded[candidates]]
+        visible = visible[(visible + self.frame) % RECHECK_INTERVAL == 0]
+        if len(occluded) + len(visible) <= MAX_QUERIES:
+            return np.concatenate([occluded, visible])
+        visible_budget = min(len(visible), max(MAX_QUERIES - len(occluded), int(MAX_QUERIES * VISIBLE_SHARE)))
+        occluded_budget = MAX_QUERIES - visible_budget
+        occluded = rotate(occluded, self.frame * occluded_budget)[:occluded_budget]
+        # A mesma fatia de visíveis volta a cada RECHECK_INTERVAL frames: o rodízio dela anda uma vez por volta
+        visible = rotate(visible, self.frame // RECHECK_INTERVAL * visible_budget)[:visible_budget]
+        return np.concatenate([occluded, visible])
+
+    def issue(self, candidates):
+        """ Consulta as caixas dos candidatos selecionados (após o passo principal) """
+        self.frame += 1
+        indices = np.zeros(0, dtype=np.int64)
+        if self.enabled and len(candidates):
+            indices = self.select(candidates)
+        queries = self.draw_boxes(indices) if len(indices) else []
+        # Uma entrada por frame, mesmo vazia: a latência do anel é contada em frames
+        self.in_flight.append((indices[:len(queries)].copy(), queries))
+        self.stats['queries'] = len(queries)
+
+    def draw_boxes(self, indices):
+        """ Desenha a AABB de cada índice dentro de uma consulta; retorna as consultas """
+        if self.program is None:
+            self.set_program(self.shaders.programs['occlusion'])
+        u_min, u_max = self.program.get('u_min', None), self.program.get('u_max', None)
+        if u_min is None or u_max is None:
+            return []  # occlusion.vert editado sem as caixas: sem consultas até ser corrigido
+        free = self.free_queries
+        queries = [free.pop() if free else self.ctx.query(samples=True) for _ in range(len(indices))]
+
+        t = self.transforms
+        pad = (t.aabb_max[indices] - t.aabb_min[indices]) * PADDING + MIN_PADDING
+        low, high = t.aabb_min[indices] - pad, t.aabb_max[indices] + pad
+        fbo = self.ctx.fbo
+        color_mask, depth_mask = fbo.color_mask, fbo.depth_mask
+        fbo.color_mask = (False, False, False, False)
+        fbo.depth_mask = False
+        fbo.use()  # as máscaras só valem para o GL quando o framebuffer é (re)ligado
+        # Sem descarte de faces: com a câmera dentro da caixa, as faces de trás ainda contam
+        self.ctx.disable(mgl.CULL_FACE)
+        self.ctx.depth_func = '<='
+        with self.profiler.gpu_scope('occlusion'):
+            for i, query in enumerate(queries):
+                u_min.write(low[i].tobytes())
+                u_max.write(high[i].tobytes())
+                with query:
+                    self.vao.render(mgl.TRIANGLES, vertices=36)
+        self.ctx.depth_func = '<'
+        self.ctx.enable(mgl.CULL_FACE)
+        fbo.color_mask, fbo.depth_mask = color_mask, depth_mask
+        fbo.use()
+        return queries
+
+    def destroy(self):
+        if self.vao is not None:
+            self.vao.release()
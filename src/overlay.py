@@ -0,0 +1,98 @@
+import moderngl as mgl
+import pygame as pg
+from profiler import COUNTERS
+from render_state import OVERLAY_UNIT
+
+REFRESH = 0.25  # segundos entre atualizações do texto
+TEXT_COLOR = (235, 235, 235)
+PANEL_COLOR = (0, 0, 0, 160)
+
+
+class Overlay:
+    """ Desenha as estatísticas do Profiler no ui_surface e o compõe sobre a cena """
+    def __init__(self, app):
+        self.app = app
+        self.ctx = app.ctx
+        self.profiler = app.profiler
+        self.surface = app.ui_surface
+        self.visible = False
+        self.last_refresh = 0.0
+        self.font = pg.font.SysFont('consolas,dejavusansmono,monospace', 16)
+        self.shaders = app.mesh.vao.program
+        # Programa, textura e VAO só são criados na primeira vez que o overlay aparece
+        self.program = None
+        self.texture = None
+        self.vao = None
+        self.shaders.add_listener(self.on_program)
+
+    def on_program(self, name, old, new):
+        if old is not None and old is self.program:
+            self.vao.release()
+            self.set_program(new)
+
+    def set_program(self, program):
+        self.program = program
+        self.app.render_state.set_value(self.program, 'u_overlay', OVERLAY_UNIT)
+        self.vao = self.ctx.vertex_array(self.program, [])
+
+    def get_lines(self):
+        stats = self.profiler.percentiles()
+        row = self.profiler.last_row()
+        if not stats:
+            return ['profiler: aguardando frames']
+        fps = 1000 / stats['p50'] if stats['p50'] else 0
+        gpu = row.get('gpu_ms')
+        lines = [f"frame p50 {stats['p50']:6.2f} ms  p95 {stats['p95']:6.2f}  p99 {stats['p99']:6.2f}  ({fps:.0f} FPS)",
+                 f"gpu {gpu:6.2f} ms" if gpu is not None else "gpu  --"]
+        lines += [f"{name:<16}{row[name]:8.3f} ms" for name in row
+                  if name not in ('frame', 'frame_ms', 'gpu_ms') and isinstance(row[name], float)]
+        pacing = self.app.scheduler.stats()
+        if pacing:
+            target = f"{pacing['target_fps']} FPS" if pacing['target_fps'] else 'sem limite'
+            lines.append(f"pacing {pacing['pacing']} ({target})  {pacing['steps_per_frame']:.2f} passos/frame"
+                         f"  jitter {pacing['jitter_ms']:.2f} ms")
+        lights = self.app.lights.stats
+        if lights:
+            lines.append(f"luzes {lights['lights']}  por tile: média {lights['avg_per_tile']:.1f}"
+                         f"  máx {lights['max_per_tile']}")
+        resolution = self.app.resolution.stats()
+        mode = 'dinâmica' if resolution['adaptive'] else 'fixa'
+        lines.append(f"resolução {resolution['size'][0]}x{resolution['size'][1]}"
+                     f"  escala {resolution['scale']:.2f} ({mode}, alvo {resolution['target_fps']} FPS)")
+        memory = self.app.resources.stats()
+        lines.append("GPU " + "  ".join(f"{category} {nbytes / 2 ** 20:.1f}" for category, nbytes in memory['bytes'].items()
+                                        if nbytes) + f" MB  (pool {memory['pooled_bytes'] / 2 ** 20:.1f} MB)")
+        lines += [f"{name:<16}{row.get(name, 0):8d}" for name in COUNTERS]
+        return lines
+
+    def refresh(self):
+        """ Redesenha o painel no ui_surface e envia para a textura """
+        lines = self.get_lines()
+        line_height = self.font.get_linesize()
+        width = max(self.font.size(line)[0] for line in lines) + 20
+        self.surface.fill((0, 0, 0, 0))
+        self.surface.fill(PANEL_COLOR, (10, 10, width, line_height * len(lines) + 20))
+        for i, line in enumerate(lines):
+            self.surface.blit(self.font.render(line, True, TEXT_COLOR), (20, 20 + i * line_height))
+        self.texture.write(pg.image.tostring(self.surface, 'RGBA'))
+
+    def render(self):
+        if not self.visible:
+            return
+        if self.program is None:
+            self.set_program(self.shaders.programs['overlay'])
+            self.texture = self.ctx.texture(self.surface.get_size(), components=4)
+        if self.app.time - self.last_refresh > REFRESH:
+            self.last_refresh = self.app.time
+            self.refresh()
+        self.ctx.disable(mgl.DEPTH_TEST)
+        self.ctx.enable(mgl.BLEND)
+        self.app.render_state.use_texture(self.texture, location=OVERLAY_UNIT)
+        self.vao.render(vertices=3)
+        self.ctx.disable(mgl.BLEND)
+        self.ctx.enable(mgl.DEPTH_TEST)
+
+    def destroy(self):
+        if self.vao is not None:
+            self.vao.release()
+            self.texture.release()
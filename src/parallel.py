@@ -0,0 +1,41 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+PARALLEL_MIN = 4096  # abaixo disso o trabalho roda direto na thread do GL (não compensa o despacho)
+
+
+def gil_enabled():
+    """ False num build free-threaded (python3.13t) com o GIL desligado """
+    check = getattr(sys, '_is_gil_enabled', None)
+    return check() if check else True
+
+
+class WorkerPool:
+    """ Threads da etapa de preparação do frame; operações NumPy grandes liberam o GIL """
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = max(1, int(workers))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+    def split(self, count, min_chunk=PARALLEL_MIN):
+        """ Intervalos [start, stop) com um pedaço por worker (nenhum menor que min_chunk) """
+        parts = max(1, min(self.workers, count // min_chunk))
+        bounds = np.linspace(0, count, parts + 1).astype(int)
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def map(self, function, items):
+        """ function(item) para cada item, em paralelo se houver mais de um """
+        items = list(items)
+        if self.executor is None or len(items) < 2:
+            return [function(item) for item in items]
+        return list(self.executor.map(function, items))
+
+    def map_chunks(self, function, array, min_chunk=PARALLEL_MIN):
+        """ function(array[start:stop]) para cada pedaço de `array` """
+        return self.map(lambda bounds: function(array[bounds[0]:bounds[1]]), self.split(len(array), min_chunk))
+
+    def destroy(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
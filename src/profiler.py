@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import numpy as np
+
+HISTORY = 600          # frames guardados para percentis e CSV
+MAX_EVENTS = 100_000   # eventos de trace guardados (os mais antigos são descartados)
+GPU_LATENCY = 3        # frames de atraso antes de ler as queries de tempo da GPU
+COUNTERS = ('draw_calls', 'triangles', 'uniform_writes', 'texture_binds', 'state_changes_eliminated',
+            'visible_objects', 'occluded_objects')
+
+
+class Profiler:
+    """ Escopos de CPU, tempo de GPU (queries) e contadores por frame """
+    def __init__(self, app, enabled=True):
+        self.app = app
+        self.enabled = enabled
+        self.gpu = enabled
+        self.origin = time.perf_counter()
+        self.frame = 0
+        self.frame_start = None
+        self.frame_times = deque(maxlen=HISTORY)
+        self.rows = deque(maxlen=HISTORY)   # uma linha (dict) por frame, para o CSV
+        self.events = deque(maxlen=MAX_EVENTS)  # trace events (formato do Chrome)
+        self.scopes = defaultdict(float)    # ms por escopo no frame atual
+        self.counters = defaultdict(int)
+        self.gpu_scopes = []                # (nome, query, ts) do frame atual
+        self.gpu_frames = deque()           # (linha, gpu_scopes) esperando resultado
+        self.query_pool = []
+        self.gpu_ms = None                  # tempo de GPU do frame resolvido mais recente
+
+    def now_us(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    @contextmanager
+    def scope(self, name):
+        """ Mede o tempo de CPU de um trecho do frame """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.scopes[name] += (end - start) * 1000
+            self.events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 'CPU',
+                                'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6})
+
+    @contextmanager
+    def gpu_scope(self, name):
+        """ Mede o tempo de GPU de um lote de draws (queries não podem ser aninhadas) """
+        if not (self.enabled and self.gpu):
+            yield
+            return
+        query = self.query_pool.pop() if self.query_pool else self.app.ctx.query(time=True)
+        ts = self.now_us()
+        with query:
+            yield
+        self.gpu_scopes.append((name, query, ts))
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def begin_frame(self):
+        """ Fecha o frame anterior (se houver) e começa um novo """
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.end_frame((now - self.frame_start) * 1000)
+        self.frame_start = now
+
+    def end_frame(self, frame_ms):
+        if self.enabled:
+            row = {'frame': self.frame, 'frame_ms': frame_ms, 'gpu_ms': None}
+            row.update({name: ms for name, ms in self.scopes.items()})
+            row.update({name: self.counters.get(name, 0) for name in COUNTERS})
+            self.rows.append(row)
+            self.gpu_frames.append((row, self.gpu_scopes))
+            self.frame_times.append(frame_ms)
+        self.frame += 1
+        self.scopes = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.gpu_scopes = []
+        self.resolve_gpu()
+
+    def resolve_gpu(self, latency=GPU_LATENCY):
+        """ Lê as queries de frames antigos, quando o resultado já deve estar pronto """
+        while len(self.gpu_frames) > latency:
+            row, scopes = self.gpu_frames.popleft()
+            total = 0.0
+            for name, query, ts in scopes:
+                elapsed = query.elapsed / 1e6  # ns -> ms
+                total += elapsed
+                self.events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 'GPU',
+                                    'ts': ts, 'dur': elapsed * 1000})
+                self.query_pool.append(query)
+            row['gpu_ms'] = total
+            self.gpu_ms = total
+
+    def percentiles(self):
+        if not self.frame_times:
+            return {}
+        times = np.fromiter(self.frame_times, dtype='f8')
+        p50, p95, p99 = np.percentile(times, (50, 95, 99))
+        return {'p50': p50, 'p95': p95, 'p99': p99}
+
+    def last_row(self):
+        return self.rows[-1] if self.rows else {}
+
+    def dump(self, directory='.'):
+        """ Grava CSV por frame e um trace JSON (chrome://tracing / Perfetto) """
+        self.resolve_gpu(latency=0)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        csv_path = os.path.join(directory, f'profile_{stamp}.csv')
+        trace_path = os.path.join(directory, f'trace_{stamp}.json')
+
+        fields = ['frame', 'frame_ms', 'gpu_ms']
+        for row in self.rows:
+            fields += [name for name in row if name not in fields]
+        with open(csv_path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.rows)
+        with open(trace_path, 'w') as file:
+            json.dump({'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}, file)
+        print(f"Profiler: {csv_path}, {trace_path}")
+        return csv_path, trace_path
@@ -0,0 +1,214 @@
+"""
+Render farm: renderiza um caminho de câmera (ou uma lista de poses) em vários processos.
+
+    python src/render_farm.py --orbit 4 --output frames
+    python src/render_farm.py --scene cena.e3ds --frames 0 240 --processes 8 --format raw
+    python src/render_farm.py --poses poses.json --size 1920 1080 --chunk 4
+
+Cada processo monta uma única vez o próprio GraphicsEngine headless (contexto standalone, Mesh e a
+Scene carregada da mesma cena) e renderiza pedaços de frames consecutivos; o processo principal
+recebe os frames, grava-os em ordem e refaz os pedaços que falharem. `--poses` é um JSON com uma
+pose por frame: [[x, y, z], yaw, pitch].
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing as mp
+from camera import CameraPath
+from capture import FORMATS, WRITER_THREADS, write_frame
+from scheduler import STEP_RATE
+
+DEFAULT_PROCESSES = os.cpu_count() or 1
+CHUNK_SIZE = 8     # frames por pedaço enviado a um processo
+MAX_RETRIES = 2    # novas tentativas de um pedaço que falhou
+
+# GraphicsEngine do processo de trabalho (criado no initializer, reaproveitado entre os pedaços)
+worker_app = None
+worker_setup = None
+
+
+def init_worker(scene_path, window_size, instanced, rasterizer_threads):
+    """ Monta o engine headless do processo (roda uma vez em cada processo do pool) """
+    global worker_app, worker_setup
+    # O rasterizador em software do Mesa abre uma thread por núcleo em cada processo; divide os núcleos
+    os.environ.setdefault('LP_NUM_THREADS', str(rasterizer_threads))
+    from main import GraphicsEngine
+    start = time.perf_counter()
+    worker_app = GraphicsEngine(window_size=window_size, instanced=instanced, headless=True,
+                                scene_path=scene_path, workers=1)
+    worker_app.mesh.texture.wait()
+    # Sem coerência temporal: cada frame sai igual independente de como o caminho foi dividido
+    worker_app.scene.occlusion.enabled = False
+    worker_setup = time.perf_counter() - start
+
+
+def render_chunk(start, poses):
+    """ Renderiza os frames start, start + 1, ... nas `poses` e devolve os pixels (RGB, de baixo para cima) """
+    global worker_setup
+    app = worker_app
+    begin = time.perf_counter()
+    frames = []
+    for pose in poses:
+        app.camera.follow(pose)
+        app.camera.previous = None
+        # A histerese do LOD dependeria do frame anterior do mesmo pedaço
+        app.scene.lod.reset()
+        app.profiler.begin_frame()
+        app.render()
+        frames.append(app.resolution.output.read(components=3))
+    setup, worker_setup = worker_setup, None
+    return {'start': start, 'frames': frames, 'pid': os.getpid(),
+            'seconds': time.perf_counter() - begin, 'setup': setup}
+
+
+class RenderFarm:
+    """ Distribui pedaços de frames entre processos e devolve os frames em ordem """
+    def __init__(self, scene_path=None, window_size=(1600, 900), instanced=False,
+                 processes=DEFAULT_PROCESSES, chunk_size=CHUNK_SIZE, retries=MAX_RETRIES):
+        self.scene_path = scene_path
+        self.window_size = tuple(window_size)
+        self.instanced = instanced
+        self.processes = max(1, int(processes))
+        self.chunk_size = max(1, int(chunk_size))
+        self.retries = retries
+        self.workers = {}   # pid -> {'frames', 'seconds', 'setup', 'chunks'}
+        self.failures = 0
+        self.restarts = 0
+        self.executor = None
+
+    def start_pool(self):
+        threads = max(1, (os.cpu_count() or 1) // self.processes)
+        # spawn: um contexto OpenGL não sobrevive a fork
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes, mp_context=mp.get_context('spawn'), initializer=init_worker,
+            initargs=(self.scene_path, self.window_size, self.instanced, threads))
+
+    def render(self, poses):
+        """ Gera (índice, pixels) de cada pose, em ordem, conforme os pedaços ficam prontos """
+        poses = list(poses)
+        chunks = [(start, poses[start:start + self.chunk_size]) for start in range(0, len(poses), self.chunk_size)]
+        attempts = {start: 0 for start, _ in chunks}
+        ready = {}
+        next_start = 0
+        self.start_pool()
+        pending = {self.executor.submit(render_chunk, *chunk): chunk for chunk in chunks}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        pending = self.retry(chunk, error, attempts, pending)
+                        if isinstance(error, BrokenProcessPool):
+                            break  # os demais futures do pool antigo foram reenviados
+                        continue
+                    self.account(result)
+                    ready[result['start']] = result['frames']
+                # Entrega os pedaços na ordem dos frames
+                while next_start in ready:
+                    for offset, frame in enumerate(ready.pop(next_start)):
+                        yield next_start + offset, frame
+                    next_start += self.chunk_size
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def retry(self, chunk, error, attempts, pending):
+        """ Reenvia o pedaço que falhou (e, se o pool quebrou, todos os pendentes num pool novo) """
+        start = chunk[0]
+        attempts[start] += 1
+        self.failures += 1
+        if attempts[start] > self.retries:
+            raise RuntimeError(f"Frames {start}-{start + len(chunk[1]) - 1} falharam {attempts[start]} vezes") from error
+        print(f"Render farm: frames {start}-{start + len(chunk[1]) - 1} falharam ({error!r}), tentativa "
+              f"{attempts[start] + 1}", file=sys.stderr)
+        if isinstance(error, BrokenProcessPool):
+            # Um processo morreu: o pool inteiro fica inutilizável
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.restarts += 1
+            self.start_pool()
+            return {self.executor.submit(render_chunk, *item): item for item in [chunk, *pending.values()]}
+        pending[self.executor.submit(render_chunk, *chunk)] = chunk
+        return pending
+
+    def account(self, result):
+        stats = self.workers.setdefault(result['pid'], {'frames': 0, 'seconds': 0.0, 'setup': 0.0, 'chunks': 0})
+        stats['frames'] += len(result['frames'])
+        stats['seconds'] += result['seconds']
+        stats['chunks'] += 1
+        if result['setup'] is not None:
+            stats['setup'] = result['setup']
+
+    def run(self, poses, directory, fmt='png', first=0):
+        """ Renderiza e grava frame_<first + n>.<fmt> em `directory`; devolve o relatório """
+        os.makedirs(directory, exist_ok=True)
+        start = time.perf_counter()
+        count = 0
+        writes = []
+        with ThreadPoolExecutor(max_workers=WRITER_THREADS) as writers:
+            for index, frame in self.render(poses):
+                path = os.path.join(directory, f'frame_{first + index:06d}.{fmt}')
+                writes.append(writers.submit(write_frame, path, frame, self.window_size, fmt))
+                count += 1
+        for write in writes:
+            write.result()  # propaga erros de disco
+        return self.report(count, time.perf_counter() - start)
+
+    def report(self, frames, seconds):
+        workers = {pid: {**stats, 'fps': stats['frames'] / stats['seconds'] if stats['seconds'] else 0.0}
+                   for pid, stats in self.workers.items()}
+        return {'frames': frames, 'seconds': seconds, 'fps': frames / seconds if seconds else 0.0,
+                'processes': self.processes, 'chunk_size': self.chunk_size, 'failures': self.failures,
+                'restarts': self.restarts, 'workers': workers}
+
+
+def load_poses(path):
+    with open(path) as file:
+        return [(tuple(position), float(yaw), float(pitch)) for position, yaw, pitch in json.load(file)]
+
+
+def path_poses(path, step_rate):
+    """ Uma pose por passo fixo do caminho (os mesmos frames de GraphicsEngine.record) """
+    frames = int(path.duration * step_rate) + 1
+    return [path.pose(i / step_rate) for i in range(frames)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scene', default=None, help='cena .e3ds (padrão: objetos pré-existentes)')
+    parser.add_argument('--poses', default=None, help='JSON com uma pose por frame')
+    parser.add_argument('--orbit', type=float, default=4.0, help='sem --poses: órbita de N segundos')
+    parser.add_argument('--frames', type=int, nargs=2, default=None, metavar=('START', 'STOP'),
+                        help='só os frames em [START, STOP)')
+    parser.add_argument('--step-rate', type=int, default=STEP_RATE, help='frames por segundo do caminho')
+    parser.add_argument('--size', type=int, nargs=2, default=[1600, 900])
+    parser.add_argument('--instanced', action='store_true')
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES)
+    parser.add_argument('--chunk', type=int, default=CHUNK_SIZE, help='frames por pedaço')
+    parser.add_argument('--retries', type=int, default=MAX_RETRIES)
+    parser.add_argument('--format', choices=FORMATS, default='png')
+    parser.add_argument('--output', default='frames')
+    args = parser.parse_args()
+
+    poses = load_poses(args.poses) if args.poses else path_poses(CameraPath.orbit(duration=args.orbit), args.step_rate)
+    first = 0
+    if args.frames:
+        first, stop = args.frames
+        poses = poses[first:stop]
+    farm = RenderFarm(args.scene, args.size, args.instanced, args.processes, args.chunk, args.retries)
+    report = farm.run(poses, args.output, args.format, first)
+
+    print(f"{report['frames']} frames em {report['seconds']:.1f} s ({report['fps']:.2f} FPS) com "
+          f"{report['processes']} processos, {report['failures']} falhas, {report['restarts']} reinícios")
+    for pid, stats in sorted(report['workers'].items()):
+        print(f"  processo {pid}: {stats['frames']:5d} frames em {stats['chunks']} pedaços, "
+              f"{stats['fps']:6.2f} FPS (montagem {stats['setup']:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
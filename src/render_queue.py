@@ -0,0 +1,97 @@
+import numpy as np
+
+# Chave de 64 bits: programa (8) | VAO (12) | textura+camada (12) | profundidade (32, bits do float)
+FIELDS = (('program', 56, 0xFF), ('vao', 44, 0xFFF), ('texture', 32, 0xFFF))
+
+
+class RenderQueue:
+    """ Ordena os draws do frame por estado (programa, VAO, textura) e depois de frente para trás """
+    def __init__(self, app, by_index):
+        self.app = app
+        self.by_index = by_index  # índice no TransformStore -> objeto (o mesmo dict da Scene)
+        self.transforms = app.transforms
+        self.pool = app.pool
+        self.profiler = app.profiler
+        self.texture = app.mesh.texture
+        self.texture_version = self.texture.version
+        self.ids = {name: {} for name, _, _ in FIELDS}
+        self.state_keys = np.zeros(0, dtype=np.uint64)  # parte alta da chave, por índice
+        self.stats = {}
+        app.mesh.vao.program.add_listener(self.on_program)
+
+    def on_program(self, name, old, new):
+        if old is not None:
+            self.refresh()  # hot reload: o programa tem outro glo
+
+    def ensure_capacity(self):
+        capacity = self.transforms.capacity
+        if len(self.state_keys) < capacity:
+            keys = np.zeros(capacity, dtype=np.uint64)
+            keys[:len(self.state_keys)] = self.state_keys
+            self.state_keys = keys
+
+    def get_id(self, field, value, mask):
+        ids = self.ids[field]
+        if value not in ids:
+            ids[value] = len(ids) & mask  # além do limite só perde agrupamento, não corretude
+        return ids[value]
+
+    def state_key(self, obj):
+        values = {'program': obj.program.glo, 'vao': obj.vao_name, 'texture': (obj.texture.glo, obj.layer)}
+        key = 0
+        for field, shift, mask in FIELDS:
+            key |= self.get_id(field, values[field], mask) << shift
+        return key
+
+    def add(self, obj):
+        """ (Re)calcula a chave de estado do objeto (novo, troca de LOD ou de textura) """
+        self.ensure_capacity()
+        self.state_keys[obj.index] = self.state_key(obj)
+
+    def add_many(self, objects):
+        self.ensure_capacity()
+        groups = {}
+        for obj in objects:
+            groups.setdefault((obj.vao_name, obj.tex_id), []).append(obj)
+        for group in groups.values():
+            indices = np.fromiter((obj.index for obj in group), dtype=np.int64, count=len(group))
+            self.state_keys[indices] = self.state_key(group[0])
+
+    def refresh(self):
+        self.add_many(list(self.by_index.values()))
+        self.texture_version = self.texture.version
+
+    def build(self, indices):
+        """ Índices ordenados pela chave completa; a profundidade vem de Camera.view_position """
+        self.ensure_capacity()
+        if self.texture.version != self.texture_version:
+            self.refresh()
+        if not len(indices):
+            self.stats = {}
+            return indices
+        t = self.transforms
+        eye = np.array(self.app.camera.view_position, dtype='f4')
+
+        def depths(chunk):
+            # distância² >= 0: os bits do float32 crescem na mesma ordem que o valor
+            center = (t.aabb_min[chunk] + t.aabb_max[chunk]) * 0.5
+            return ((center - eye) ** 2).sum(axis=1, dtype='f4').view('u4')
+        depth = np.concatenate(self.pool.map_chunks(depths, indices)).astype(np.uint64)
+        keys = self.state_keys[indices] | depth
+        order = indices[np.argsort(keys, kind='stable')]
+
+        # Trocas de estado na ordem em que os candidatos chegam (a do culling) contra a ordem da fila
+        before = self.count_changes(self.state_keys[indices])
+        after = self.count_changes(self.state_keys[order])
+        self.stats = {field: (before[field], after[field]) for field in before}
+        self.profiler.count('state_changes_eliminated', sum(before.values()) - sum(after.values()))
+        return order
+
+    @staticmethod
+    def count_changes(keys):
+        """ Binds necessários por campo numa sequência de chaves (o primeiro conta) """
+        changes = {}
+        for field, shift, mask in FIELDS:
+            values = (keys >> np.uint64(shift)) & np.uint64(mask)
+            changes[field] = int(np.count_nonzero(values[1:] != values[:-1])) + 1
+        return changes
@@ -0,0 +1,115 @@
+FRAME_BLOCK = 'Frame'
+FRAME_BINDING = 0
+# std140: mat4 m_proj, mat4 m_view, vec3 camPos (+4 bytes de padding)
+FRAME_UBO_SIZE = 64 + 64 + 16
+# Unidades de textura, uma por uso (a 0 fica com as texturas dos objetos)
+LIGHT_GRID_UNIT = 1    # (início, quantidade) das luzes de cada tile
+LIGHT_INDEX_UNIT = 2   # índices das luzes
+UPSCALE_UNIT = 3       # quadro da cena ampliado para a janela
+OVERLAY_UNIT = 4
+
+
+class RenderState:
+    """ Lembra o último valor de cada uniform e a textura de cada unidade para pular mudanças redundantes """
+    def __init__(self, app):
+        self.ctx = app.ctx
+        self.camera = app.camera
+        self.profiler = app.profiler
+        self.uniforms = {}  # (program.glo, nome) -> último valor escrito
+        self.textures = {}  # unidade -> textura ligada
+        self.frame_data = None
+        # Contadores do frame atual e acumulados
+        self.issued = 0
+        self.skipped = 0
+        self.total_issued = 0
+        self.total_skipped = 0
+
+        # Uniforms globais do frame ficam num uniform buffer compartilhado por todos os programas
+        self.frame_ubo = self.ctx.buffer(reserve=FRAME_UBO_SIZE)
+        self.frame_ubo.bind_to_uniform_block(FRAME_BINDING)
+        self.resources = app.resources
+        self.resources.track(self.frame_ubo, 'uniform', FRAME_UBO_SIZE)
+        # Programas compilados depois (sob demanda ou no hot reload) também são ligados ao bloco
+        app.mesh.vao.program.add_listener(self.on_program)
+
+    def bind_program(self, program):
+        block = program.get(FRAME_BLOCK, None)
+        if block is not None:
+            block.binding = FRAME_BINDING
+
+    def on_program(self, name, old, new):
+        self.bind_program(new)
+        if old is not None:
+            self.replay(old, new)
+
+    def replay(self, old, new):
+        """ Reenvia para o programa recompilado os uniforms que o antigo tinha """
+        for (glo, name), value in list(self.uniforms.items()):
+            if glo != old.glo:
+                continue
+            del self.uniforms[(glo, name)]
+            if new.get(name, None) is None:
+                continue
+            if isinstance(value, bytes):
+                new[name].write(value)
+            else:
+                new[name].value = value
+            self.uniforms[(new.glo, name)] = value
+
+    def count(self, issued):
+        if issued:
+            self.issued += 1
+        else:
+            self.skipped += 1
+        return issued
+
+    def begin_frame(self):
+        """ Zera os contadores e envia os uniforms do frame (chamado após Camera.update) """
+        self.total_issued += self.issued
+        self.total_skipped += self.skipped
+        self.issued = self.skipped = 0
+
+        data = (self.camera.m_proj.to_bytes() + self.camera.m_view.to_bytes()
+                + self.camera.view_position.to_bytes() + bytes(4))
+        if self.count(data != self.frame_data):
+            self.frame_ubo.write(data)
+            self.frame_data = data
+            self.profiler.count('uniform_writes')
+
+    def write(self, program, name, value):
+        """ program[name].write(value), a menos que o valor já esteja lá """
+        uniform = program.get(name, None)
+        if uniform is None:
+            return  # descartado pelo compilador: o shader (editado no hot reload) não o usa
+        key = (program.glo, name)
+        data = bytes(value)
+        if self.count(self.uniforms.get(key) != data):
+            uniform.write(data)
+            self.uniforms[key] = data
+            self.profiler.count('uniform_writes')
+
+    def set_value(self, program, name, value):
+        """ program[name].value = value para uniforms escalares (ex.: samplers) """
+        uniform = program.get(name, None)
+        if uniform is None:
+            return
+        key = (program.glo, name)
+        if self.count(self.uniforms.get(key) != value):
+            uniform.value = value
+            self.uniforms[key] = value
+            self.profiler.count('uniform_writes')
+
+    def use_texture(self, texture, location=0):
+        if self.count(self.textures.get(location) is not texture):
+            texture.use(location=location)
+            self.textures[location] = texture
+            self.profiler.count('texture_binds')
+
+    def invalidate(self):
+        """ Esquece o estado conhecido (ex.: após código externo mexer no contexto) """
+        self.uniforms.clear()
+        self.textures.clear()
+        self.frame_data = None
+
+    def destroy(self):
+        self.resources.release(self.frame_ubo)
@@ -0,0 +1,143 @@
+import math
+import moderngl as mgl
+from render_state import UPSCALE_UNIT
+
+MIN_SCALE = 0.5
+MAX_SCALE = 1.0
+SCALE_STEP = 0.05       # a escala anda em degraus (evita oscilar a cada frame)
+ADJUST_INTERVAL = 10    # frames entre ajustes do controlador
+SMOOTHING = 0.2         # peso da amostra nova na média móvel do custo do frame
+HEADROOM = 0.75         # sobe a escala quando o custo fica abaixo de 75% do orçamento
+TARGET_LOAD = 0.9       # fração do orçamento que o ajuste tenta ocupar
+
+
+class ResolutionScaler:
+    """
+    Resolução dinâmica: a cena é desenhada num framebuffer offscreen e ampliada para a janela.
+
+    O alvo é alocado uma vez no tamanho de `max_scale`; a escala atual só muda o viewport usado
+    dentro dele, então trocar de resolução não realoca nada. A cada ADJUST_INTERVAL frames o
+    controlador compara o custo médio do frame (tempo de GPU do profiler, ou o tempo de trabalho
+    da CPU sem ele) com o orçamento de `target_fps` e corrige a escala supondo custo proporcional
+    ao número de pixels. Com `adaptive=False` a escala fica fixa (execuções headless reproduzíveis).
+    """
+    def __init__(self, app, target_fps, min_scale=MIN_SCALE, max_scale=MAX_SCALE, scale=None, adaptive=True):
+        if not 0 < min_scale <= max_scale:
+            raise ValueError("Precisa 0 < min_scale <= max_scale")
+        self.app = app
+        self.ctx = app.ctx
+        self.profiler = app.profiler
+        self.shaders = app.mesh.vao.program
+        self.window_size = app.WIN_SIZE
+        self.target_fps = target_fps
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.adaptive = adaptive
+        # Framebuffer da janela (ou o offscreen do modo headless), destino do upscale
+        self.output = app.fbo if app.headless else self.ctx.screen
+        capacity = tuple(math.ceil(side * max_scale) for side in self.window_size)
+        self.color = self.ctx.texture(capacity, 4)
+        self.color.filter = (mgl.LINEAR, mgl.LINEAR)
+        self.depth = self.ctx.depth_renderbuffer(capacity)
+        self.fbo = self.ctx.framebuffer(color_attachments=[self.color], depth_attachment=self.depth)
+        self.resources = app.resources
+        self.resources.track(self.color, 'framebuffer', self.resources.texture_bytes(capacity, 4))
+        self.resources.track(self.depth, 'framebuffer', self.resources.texture_bytes(capacity, 4))
+        self.cost = None  # média móvel do custo do frame, em ms
+        self.frames = 0
+        self.changes = 0
+        self.presented = False
+        self.program = None
+        self.vao = None
+        self.shaders.add_listener(self.on_program)
+        self.set_scale(min(max_scale, max(min_scale, 1.0 if scale is None else scale)))
+
+    def on_program(self, name, old, new):
+        if old is not None and old is self.program:
+            self.vao.release()
+            self.set_program(new)
+
+    def set_program(self, program):
+        self.program = program
+        self.app.render_state.set_value(program, 'u_scene', UPSCALE_UNIT)
+        self.vao = self.ctx.vertex_array(program, [])
+
+    @property
+    def budget_ms(self):
+        return 1000.0 / self.target_fps
+
+    def set_scale(self, scale):
+        """ Escala fixa (limitada a [min_scale, max_scale]); o viewport vale a partir do próximo frame """
+        self.scale = min(self.max_scale, max(self.min_scale, scale))
+        self.size = tuple(max(1, min(side, round(window * self.scale)))
+                          for side, window in zip(self.color.size, self.window_size))
+        self.fbo.viewport = (0, 0, *self.size)
+        # A grade de tiles das luzes segue a resolução em que a cena é desenhada
+        self.app.lights.size = self.size
+
+    def begin_frame(self):
+        """ Liga o alvo offscreen (chamado antes de limpar o frame) """
+        self.fbo.use()
+        self.presented = False
+
+    def present(self):
+        """ Amplia o quadro da cena para a janela (o overlay vem depois, na resolução da janela) """
+        if self.presented:
+            return
+        self.presented = True
+        if self.program is None:
+            self.set_program(self.shaders.programs['upscale'])
+        self.output.use()
+        width, height = self.color.size
+        state = self.app.render_state
+        state.set_value(self.program, 'u_region', (self.size[0] / width, self.size[1] / height))
+        state.set_value(self.program, 'u_texel', (1.0 / width, 1.0 / height))
+        state.use_texture(self.color, UPSCALE_UNIT)
+        self.ctx.disable(mgl.DEPTH_TEST)
+        with self.profiler.gpu_scope('upscale'):
+            self.vao.render(vertices=3)
+        self.ctx.enable(mgl.DEPTH_TEST)
+
+    def frame_cost(self):
+        """ Custo do último frame medido: GPU se o profiler tem o tempo, senão o trabalho da CPU """
+        if self.profiler.gpu_ms:
+            return self.profiler.gpu_ms
+        work = self.app.scheduler.work_times
+        return float(work[-1]) if work else None
+
+    def end_frame(self):
+        self.present()
+        self.frames += 1
+        if not self.adaptive:
+            return
+        cost = self.frame_cost()
+        if not cost:
+            return
+        self.cost = cost if self.cost is None else self.cost + (cost - self.cost) * SMOOTHING
+        if self.frames % ADJUST_INTERVAL == 0:
+            self.adjust()
+
+    def adjust(self):
+        """ Corrige a escala quando o custo passa do orçamento ou sobra folga """
+        budget = self.budget_ms
+        if HEADROOM * budget <= self.cost <= budget:
+            return
+        # Custo ~ pixels ~ escala²
+        target = self.scale * math.sqrt(TARGET_LOAD * budget / self.cost)
+        target = round(round(target / SCALE_STEP) * SCALE_STEP, 4)
+        old = self.scale
+        self.set_scale(target)
+        if self.scale != old:
+            self.cost *= (self.scale / old) ** 2  # estimativa até as próximas medidas
+            self.changes += 1
+
+    def stats(self):
+        return {'scale': self.scale, 'size': self.size, 'adaptive': self.adaptive,
+                'target_fps': self.target_fps, 'cost_ms': self.cost, 'changes': self.changes}
+
+    def destroy(self):
+        if self.vao is not None:
+            self.vao.release()
+        self.fbo.release()
+        self.resources.release(self.color)
+        self.resources.release(self.depth)
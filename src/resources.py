@@ -0,0 +1,144 @@
+from collections import Counter, defaultdict
+
+MIN_BUCKET = 1024                  # menor bloco dos pools de buffers (bytes)
+MAX_POOLED_BYTES = 64 * 1024 * 1024  # buffers livres guardados para reuso; o excedente é liberado
+CATEGORIES = ('vertex', 'index', 'instance', 'uniform', 'texture', 'framebuffer')
+
+
+def bucket_size(nbytes):
+    """ Potência de 2 >= nbytes (mínimo MIN_BUCKET) """
+    return max(MIN_BUCKET, 1 << (max(int(nbytes), 1) - 1).bit_length())
+
+
+class LazyRegistry(dict):
+    """ registry[name] cria o recurso com create(name) no primeiro acesso """
+    def __init__(self, create):
+        super().__init__()
+        self.create = create
+
+    def __missing__(self, name):
+        value = self[name] = self.create(name)
+        return value
+
+
+class ResourceManager:
+    """
+    Recursos de GPU compartilhados: pools de buffers, contagem de referências e memória por categoria.
+
+    Buffers vêm de pools por tamanho (potências de 2): liberar um buffer o devolve ao pool do seu
+    tamanho, e o próximo pedido que cabe nele o reaproveita sem realocar. Cada objeto da cena
+    segura uma referência ao seu VAO base (a cadeia de LOD inteira) e à sua textura; quando a
+    contagem chega a zero, o recurso é descarregado em collect(), no início do frame seguinte, pelos
+    listeners registrados para o tipo ('vao' ou 'texture'), e recriado sob demanda se voltar a ser usado.
+    """
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.pools = defaultdict(list)  # tamanho do bloco -> buffers livres
+        self.pooled_bytes = 0
+        self.live = {}                  # id(recurso) -> (categoria, bytes)
+        self.bytes = Counter()          # categoria -> bytes vivos
+        self.refs = Counter()           # (tipo, nome) -> objetos que usam
+        self.unused = set()             # chaves que chegaram a zero desde o último collect()
+        self.listeners = defaultdict(list)  # tipo -> callback(nome) que descarrega o recurso
+        self.stats_counters = Counter()
+
+    # Memória
+
+    def track(self, resource, category, nbytes):
+        """ Conta `nbytes` de `resource` na categoria até untrack() """
+        self.untrack(resource)
+        self.live[id(resource)] = (category, int(nbytes))
+        self.bytes[category] += int(nbytes)
+
+    def untrack(self, resource):
+        category, nbytes = self.live.pop(id(resource), (None, 0))
+        if category is not None:
+            self.bytes[category] -= nbytes
+
+    def release(self, resource):
+        """ Libera um recurso que não vem do pool (textura, framebuffer, ...) """
+        self.untrack(resource)
+        resource.release()
+
+    @staticmethod
+    def texture_bytes(size, components, layers=1, mipmaps=False, itemsize=1):
+        nbytes = size[0] * size[1] * components * layers * itemsize
+        return nbytes * 4 // 3 if mipmaps else nbytes
+
+    # Pools de buffers
+
+    def buffer(self, data=None, reserve=0, category='vertex'):
+        """ Buffer com pelo menos len(data) (ou `reserve`) bytes, reaproveitado do pool quando possível """
+        if data is not None:
+            data = data.tobytes() if hasattr(data, 'tobytes') else bytes(data)
+        size = bucket_size(len(data) if data is not None else reserve)
+        pool = self.pools[size]
+        if pool:
+            buffer = pool.pop()
+            self.pooled_bytes -= size
+            self.stats_counters['pool_hits'] += 1
+        else:
+            buffer = self.ctx.buffer(reserve=size)
+            self.stats_counters['pool_misses'] += 1
+        if data is not None:
+            buffer.write(data)
+        self.track(buffer, category, size)
+        return buffer
+
+    def release_buffer(self, buffer):
+        """ Devolve o buffer ao pool do seu tamanho (ou o libera se o pool já está cheio) """
+        self.untrack(buffer)
+        if self.pooled_bytes + buffer.size <= MAX_POOLED_BYTES:
+            self.pools[buffer.size].append(buffer)
+            self.pooled_bytes += buffer.size
+        else:
+            buffer.release()
+
+    # Referências dos objetos da cena
+
+    @staticmethod
+    def object_keys(obj):
+        # A cadeia de LOD inteira fica presa ao VAO base: trocar de nível não solta nada
+        return ('vao', obj.lod_chain[0] if obj.lod_chain else obj.vao_name), ('texture', obj.tex_id)
+
+    def acquire(self, objects):
+        for obj in objects:
+            self.refs.update(self.object_keys(obj))
+
+    def release_objects(self, objects):
+        for obj in objects:
+            for key in self.object_keys(obj):
+                self.refs[key] -= 1
+                if self.refs[key] <= 0:
+                    del self.refs[key]
+                    self.unused.add(key)
+
+    def add_listener(self, kind, callback):
+        """ callback(nome) descarrega o recurso `kind` sem referências """
+        self.listeners[kind].append(callback)
+
+    def is_used(self, kind, name):
+        return self.refs[(kind, name)] > 0
+
+    def collect(self):
+        """ Descarrega os recursos que continuam sem referências (chamado no início do frame) """
+        unused, self.unused = self.unused, set()
+        for kind, name in unused:
+            if not self.is_used(kind, name):
+                for callback in self.listeners[kind]:
+                    callback(name)
+                self.stats_counters[f'{kind}_unloads'] += 1
+
+    def stats(self):
+        return {'bytes': {category: self.bytes[category] for category in CATEGORIES},
+                'live_bytes': sum(self.bytes.values()), 'pooled_bytes': self.pooled_bytes,
+                'pool_hits': self.stats_counters['pool_hits'], 'pool_misses': self.stats_counters['pool_misses'],
+                'vao_unloads': self.stats_counters['vao_unloads'],
+                'texture_unloads': self.stats_counters['texture_unloads']}
+
+    def destroy(self):
+        for pool in self.pools.values():
+            for buffer in pool:
+                buffer.release()
+        self.pools.clear()
+        self.pooled_bytes = 0
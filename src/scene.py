@@ -1,75 +1,413 @@
+import gc
+import numpy as np
+from bvh import BVH
+from history import History, RECORD_DTYPE, Spawn, Despawn, TransformChange
 from hotkey_manager import HotkeyManager
+from instancing import InstancedRenderer
+from lod import LODSelector
+from occlusion import OcclusionCuller
+from render_queue import RenderQueue
+from spatial_grid import SpatialGrid
 from objects import *
+from scene_file import IndexedColumn, SceneFile, TYPE_NAMES, save_scene
+
+OBJECT_TYPES = {
+    "cube": Cube,
+    "sphere": Sphere,
+}
 
 # Implementar conceito de lista
 class Scene:
     def __init__(self, app):
         self.app = app
-        self.objects = []
-        self.undo_stack = []
-        self.redo_stack = []
+        # Desfazer/refazer por comandos compactos (handles + transformações), com tamanho limitado
+        self.history = History(self)
+        self.profiler = app.profiler
+        self.resources = app.resources
+        # Modo instanciado: um draw call por (vao_name, texture array)
+        self.instanced = app.instanced
+        self.instanced_renderer = InstancedRenderer(app)
+        # Frustum culling: só objetos dentro do frustum da câmera são desenhados
+        self.culling = True
+        self.bvh = BVH(app.transforms, app.pool)
+        # Occlusion culling: objetos ocultos por outros no frame anterior não são desenhados
+        self.occlusion = OcclusionCuller(app)
+        self.candidates = np.zeros(0, dtype=np.int64)  # no frustum, antes do occlusion culling
+        self.pool = app.pool
+        self.by_index = {}  # índice no TransformStore -> objeto, em ordem de inserção
+        # Grade espacial para picking com o mouse e consultas de vizinhança
+        self.grid = SpatialGrid(app.transforms)
+        self.selected = None  # alvo das hotkeys escolhido com o mouse
+        # Ordem dos draws por objeto: chave de 64 bits (programa, VAO, textura, profundidade)
+        self.queue = RenderQueue(app, self.by_index)
+        # Nível de detalhe escolhido pelo tamanho na tela
+        self.lod = LODSelector(app)
         self.load()
 
         # Criar e configurar o gerenciador de hotkeys
         self.hotkey_manager = HotkeyManager(self)
         self.hotkey_manager.setup_tree()
     
+    @property
+    def objects(self):
+        """ Objetos da cena em ordem de inserção """
+        return list(self.by_index.values())
+
     def add_object(self, obj):
-        self.objects.append(obj)
-        self.undo_stack.append(('add', obj))  # Empilha a operação de adição
+        self.by_index[obj.index] = obj
+        self.resources.acquire([obj])
+        self.bvh.insert(obj.index)
+        self.grid.insert(obj.index)
+        self.occlusion.forget(obj.index)
+        if obj.lod_chain:
+            self.lod.add(obj)
+        self.instanced_renderer.add(obj)
+        self.queue.add(obj)
+        self.history.push(Spawn(self.records([obj])))
+
+    def add_objects(self, objects):
+        """ add_object em lote (carga de cena): estruturas atualizadas de uma vez, sem desfazer """
+        if not objects:
+            return
+        self.by_index.update((obj.index, obj) for obj in objects)
+        self.resources.acquire(objects)
+        indices = np.array([obj.index for obj in objects], dtype=np.int64)
+        self.bvh.insert_many(indices)
+        self.grid.insert_many(indices)
+        self.occlusion.forget(indices)
+        self.lod.add_many([obj for obj in objects if obj.lod_chain])
+        self.instanced_renderer.add_many(objects)
+        self.queue.add_many(objects)
+
+    def add_objects_from_arrays(self, types, tex_ids, pos, rot, scale, vaos=None, vao_names=(None,)):
+        """
+        Instancia vários objetos a partir de colunas (códigos de TYPE_NAMES, rotação em graus);
+        `vaos` são códigos em `vao_names`, onde None é o VAO padrão do tipo
+        """
+        types = np.asarray(types)
+        tex_ids = np.asarray(tex_ids)
+        vaos = np.zeros(len(types), dtype=np.int64) if vaos is None else np.asarray(vaos, dtype=np.int64)
+        kinds = np.stack([types.astype(np.int64), vaos], axis=1)
+        # Bounds locais por objeto, conforme o VAO de cada par (tipo, vao)
+        vbos = self.app.mesh.vao.vbo.vbos
+        groups = {}
+        bounds = np.empty((len(types), 2, 3), dtype='f4')
+        for code, vao in np.unique(kinds, axis=0).tolist():
+            mask = (kinds[:, 0] == code) & (kinds[:, 1] == vao)
+            name = vao_names[vao] or OBJECT_TYPES[TYPE_NAMES[code]].default_vao
+            groups[code, name] = mask
+            bounds[mask] = vbos[name].bounds
+        indices = self.app.transforms.allocate_many(pos, np.radians(rot), scale, bounds)
+
+        objects = np.empty(len(types), dtype=object)
+        for (code, name), mask in groups.items():
+            objects[mask] = OBJECT_TYPES[TYPE_NAMES[code]].bulk(self.app, indices[mask], tex_ids[mask], name)
+        objects = objects.tolist()
+        self.add_objects(objects)
+        return objects
+
+    def paste(self, types, tex_ids, pos, rot, scale, vaos=None, vao_names=(None,)):
+        """ add_objects_from_arrays que entra no histórico como um único comando """
+        objects = self.add_objects_from_arrays(types, tex_ids, pos, rot, scale, vaos, vao_names)
+        if objects:
+            self.history.push(Spawn(self.records(objects)))
+        return objects
 
     def remove_object(self, obj):
-        """ Remove objeto da cena e empilha para desfazer """
-        if obj in self.objects:
-            self.objects.remove(obj)
-            self.undo_stack.append(('remove', obj))  # Empilha a operação de remoção
+        """ Remove objeto da cena e registra no histórico """
+        if self.by_index.get(obj.index) is obj:
+            records = self.records([obj])
+            self.despawn([obj.index])
+            self.history.push(Despawn(records))
+
+    def despawn(self, indices):
+        """ Tira os objetos das estruturas da cena; o índice no TransformStore continua reservado """
+        for index in np.asarray(indices).tolist():
+            obj = self.by_index.pop(index, None)
+            if obj is None:
+                continue
+            self.bvh.remove(index)
+            self.grid.remove(index)
+            if self.selected is obj:
+                self.selected = None
+            self.lod.remove(obj)
+            self.instanced_renderer.remove(obj)
+            # VAO e textura sem outros objetos são descarregados no próximo frame
+            self.resources.release_objects([obj])
+
+    def spawn(self, records):
+        """ Recria objetos a partir de registros do histórico, nos mesmos índices """
+        indices = records['index'].astype(np.int64)
+        self.set_transforms(indices, records['transform'])
+        # Pai de volta se ele ainda está na cena ou volta junto (senão o filho fica na raiz)
+        parents = records['parent'].astype(np.int64)
+        alive = np.isin(parents, indices) | np.isin(parents, np.fromiter(self.by_index, dtype=np.int64))
+        self.app.transforms.set_parent(indices, np.where(alive, parents, -1))
+        self.app.transforms.compute(indices)
+        objects = np.empty(len(records), dtype=object)
+        kinds = np.stack([records['type'].astype(np.int64), records['vao'].astype(np.int64)], axis=1)
+        for code, vao in np.unique(kinds, axis=0).tolist():
+            mask = (kinds[:, 0] == code) & (kinds[:, 1] == vao)
+            objects[mask] = OBJECT_TYPES[TYPE_NAMES[code]].bulk(
+                self.app, indices[mask], records['tex_id'][mask], self.history.vao_names[vao])
+        self.add_objects(objects.tolist())
+
+    def records(self, objects):
+        """ Registros compactos (RECORD_DTYPE) dos objetos, para o histórico """
+        codes = {OBJECT_TYPES[name]: code for code, name in enumerate(TYPE_NAMES)}
+        vao_code = self.history.vao_code
+        records = np.empty(len(objects), dtype=RECORD_DTYPE)
+        records['index'] = [obj.index for obj in objects]
+        records['type'] = [codes[type(obj)] for obj in objects]
+        # VAO base (o nível 0 da cadeia de LOD), para recriar o objeto no estado inicial
+        records['vao'] = [vao_code(obj.lod_chain[0] if obj.lod_chain else obj.vao_name) for obj in objects]
+        records['tex_id'] = [obj.tex_id for obj in objects]
+        records['transform'] = self.get_transforms(records['index'])
+        records['parent'] = self.app.transforms.parents[records['index']]
+        return records
+
+    def get_transforms(self, indices):
+        """ Posição, rotação (radianos) e escala empacotadas em 9 floats por objeto """
+        t = self.app.transforms
+        return np.concatenate([t.positions[indices], t.rotations[indices], t.scales[indices]], axis=1)
+
+    def set_transforms(self, indices, values):
+        t = self.app.transforms
+        t.positions[indices] = values[:, 0:3]
+        t.rotations[indices] = values[:, 3:6]
+        t.scales[indices] = values[:, 6:9]
+        t.dirty[indices] = True
+
+    def attach(self, children, parent):
+        """ Pendura os objetos em `parent` (None solta); pos/rot/scale passam a ser relativos ao pai """
+        children = children if isinstance(children, (list, tuple)) else [children]
+        indices = np.array([obj.index for obj in children], dtype=np.int64)
+        self.app.transforms.set_parent(indices, -1 if parent is None else parent.index)
+
+    def detach(self, children):
+        self.attach(children, None)
+
+    def children(self, obj):
+        """ Filhos diretos do objeto no grafo de cena """
+        indices = self.app.transforms.children_of(np.array([obj.index]))
+        return [self.by_index[i] for i in indices.tolist() if i in self.by_index]
+
+    def parent(self, obj):
+        return self.by_index.get(int(self.app.transforms.parents[obj.index]))
+
+    def translate_object(self, obj, delta):
+        """ Move o objeto registrando no histórico; movimentos seguidos viram uma entrada só """
+        self.record_transforms([obj.index], lambda: obj.translate(delta), 'move')
+
+    def rotate_object(self, obj, delta):
+        """ Rotaciona o objeto (graus) registrando no histórico """
+        self.record_transforms([obj.index], lambda: obj.rotate(delta), 'rotate')
+
+    def record_transforms(self, indices, change, kind='transform'):
+        """ Executa `change` e registra as transformações antes/depois dos índices """
+        indices = np.asarray(indices, dtype=np.int64)
+        before = self.get_transforms(indices)
+        change()
+        self.history.push(TransformChange(indices, before, self.get_transforms(indices), kind), coalesce=True)
 
     def add_object_from_ui(self, pos, obj_type="cube"):
         """ Adiciona um objeto à cena baseado no tipo """
-        obj_map = {
-            "cube": Cube,
-            "sphere": Sphere,
-        }
-        
-        if obj_type in obj_map:
-            new_obj = obj_map[obj_type](self.app, pos=pos) 
+        if obj_type in OBJECT_TYPES:
+            new_obj = OBJECT_TYPES[obj_type](self.app, pos=pos) 
             self.add_object(new_obj)
 
+    def target(self):
+        """ Objeto das hotkeys: o selecionado com o mouse ou, sem seleção, o último adicionado """
+        if self.selected is not None:
+            return self.selected
+        return next(reversed(self.by_index.values()), None)
+
+    def pick(self, screen_pos):
+        """ Seleciona o objeto sob o pixel `screen_pos` (raio da câmera contra a grade) """
+        origin, direction = self.app.camera.get_ray(screen_pos)
+        index, _ = self.grid.raycast(origin, direction)
+        self.selected = self.by_index.get(index)
+        return self.selected
+
+    def nearest(self, point, k=1):
+        """ Os k objetos mais próximos do ponto """
+        indices, _ = self.grid.nearest(point, k)
+        return [self.by_index[i] for i in indices.tolist()]
+
+    def within(self, point, radius):
+        """ Objetos a até `radius` do ponto, do mais próximo ao mais distante """
+        indices, _ = self.grid.within(point, radius)
+        return [self.by_index[i] for i in indices.tolist()]
+
     def undo(self):
-        """ Desfaz a última operação (adicionar ou remover objeto) """
-        if self.undo_stack:
-            last_action, obj = self.undo_stack.pop()
-            if last_action == 'add':
-                self.remove_object(obj)  # Se a última ação foi adicionar, remove
-                self.redo_stack.append(('add', obj))  # Empilha para refazer
-            elif last_action == 'remove':
-                self.add_object(obj)  # Se a última ação foi remover, adiciona de volta
-                self.redo_stack.append(('remove', obj))  # Empilha para refazer
-    
+        """ Desfaz o último comando do histórico """
+        self.history.undo()
+
     def redo(self):
-        """ Refaz a última operação desfeita """
-        if self.redo_stack:
-            last_action, obj = self.redo_stack.pop()
-            if last_action == 'add':
-                self.add_object(obj)  # Se a última ação foi desfazer adição, adiciona de volta
-            elif last_action == 'remove':
-                self.remove_object(obj)  # Se a última ação foi desfazer remoção, remove novamente
-
-    def load(self):
-        """ Carrega objetos pré-existentes """
+        """ Refaz o último comando desfeito """
+        self.history.redo()
+
+    def load(self, path=None, chunks=None):
+        """ Carrega a cena de um arquivo .e3ds (ou os objetos pré-existentes se não houver) """
+        path = path or self.app.scene_path
+        if path:
+            return self.load_file(path, chunks)
         app = self.app
-        add = self.add_object
-
-        add(Cube(app))
-        add(Cube(app, tex_id=0, pos=(-2.5, 0, 0), rot=(45, 0, 0), scale=(1, 1, 1)))
-        add(Cube(app, tex_id=1, pos=(2.5, 0, 0), rot=(-45,0,0), scale=(1, 1, 1)))
-        add(Cube(app, tex_id=2, pos=(-5, 0, 0), rot=(-45,0,0), scale=(1, 1, 1)))
-        add(Cube(app, tex_id=2, pos=(5, 0, 0), rot=(-45,0,0), scale=(1, 1, 1)))
-        add(Sphere(app, tex_id=3, pos=(7.5, 0, 0)))
+
+        # Carga da cena não entra no histórico
+        self.add_objects([
+            Cube(app),
+            Cube(app, tex_id=0, pos=(-2.5, 0, 0), rot=(45, 0, 0), scale=(1, 1, 1)),
+            Cube(app, tex_id=1, pos=(2.5, 0, 0), rot=(-45,0,0), scale=(1, 1, 1)),
+            Cube(app, tex_id=2, pos=(-5, 0, 0), rot=(-45,0,0), scale=(1, 1, 1)),
+            Cube(app, tex_id=2, pos=(5, 0, 0), rot=(-45,0,0), scale=(1, 1, 1)),
+            Sphere(app, tex_id=3, pos=(7.5, 0, 0)),
+        ])
     
+    def load_file(self, path, chunks=None):
+        """ Instancia os objetos do arquivo chunk a chunk; `chunks` limita a um subconjunto """
+        scene_file = SceneFile(path)
+        vao_names = [None] + [self.load_mesh(mesh, path) for mesh in scene_file.meshes]
+        if chunks is None:
+            chunks = range(len(scene_file.chunks))
+        loaded = 0
+        # Milhões de objetos novos disparariam o coletor de ciclos várias vezes durante a carga
+        gc.disable()
+        try:
+            # Linha do arquivo -> índice no TransformStore (-1 nas linhas de chunks não carregados)
+            rows = np.full(len(scene_file), -1, dtype=np.int64)
+            for chunk in chunks:
+                start = int(scene_file.chunks[chunk]['start'])
+                columns = scene_file.read_chunk(chunk)
+                objects = self.add_objects_from_arrays(columns['type'], columns['tex_id'], columns['pos'],
+                                                       columns['rot'], columns['scale'], columns['vao'], vao_names)
+                rows[start:start + len(objects)] = [obj.index for obj in objects]
+                loaded += len(columns['type'])
+        finally:
+            gc.enable()
+        # Pais ligados depois de tudo carregado: o pai pode estar num chunk posterior
+        parents = np.asarray(scene_file.columns['parent'], dtype=np.int64)
+        children = np.flatnonzero((rows >= 0) & (parents >= 0))
+        children = children[rows[parents[children]] >= 0]
+        if len(children):
+            self.app.transforms.set_parent(rows[children], rows[parents[children]])
+        return loaded
+
+    def load_mesh(self, mesh, path):
+        """ Entrada da tabela de malhas de um .e3ds -> nome do VAO, importando a malha se preciso """
+        vao = self.app.mesh.vao
+        name = mesh['name']
+        if name not in vao.vbo.factories:
+            if not mesh.get('path'):
+                raise ValueError(f"{path}: malha '{name}' não existe e não tem arquivo para importar")
+            vao.import_mesh(name, mesh['path'], mesh.get('program', 'default'))
+        return name
+
+    def mesh_entry(self, name):
+        """ Entrada da tabela de malhas do .e3ds para o VAO `name` """
+        vao = self.app.mesh.vao
+        return {'name': name, 'path': vao.imports.get(name), 'program': vao.programs.get(name, 'default')}
+
+    def save(self, path, chunk_size=None):
+        """ Grava Scene.objects num .e3ds, lendo as colunas direto do TransformStore """
+        t = self.app.transforms
+        codes = {OBJECT_TYPES[name]: code for code, name in enumerate(TYPE_NAMES)}
+        objects = self.objects
+        types = np.fromiter((codes[type(obj)] for obj in objects), dtype='u1', count=len(objects))
+        tex_ids = np.fromiter((obj.tex_id for obj in objects), dtype='i4', count=len(objects))
+        # VAO base de cada objeto (nível 0 da cadeia de LOD); 0 é o VAO padrão do tipo
+        vao_codes = {}
+        vaos = np.zeros(len(objects), dtype='<u2')
+        for row, obj in enumerate(objects):
+            name = obj.lod_chain[0] if obj.lod_chain else obj.vao_name
+            if name != obj.default_vao:
+                vaos[row] = vao_codes.setdefault(name, len(vao_codes) + 1)
+        indices = np.fromiter((obj.index for obj in objects), dtype=np.int64, count=len(objects))
+        # Pais como linhas do arquivo; um pai fora da cena (removido) deixa o filho na raiz
+        rows = np.full(t.capacity, -1, dtype=np.int64)
+        rows[indices] = np.arange(len(indices))
+        parents = t.parents[indices]
+        parents = np.where(parents >= 0, rows[np.maximum(parents, 0)], -1)
+        kwargs = {'chunk_size': chunk_size} if chunk_size else {}
+        return save_scene(path, types, tex_ids, IndexedColumn(t.positions, indices),
+                          IndexedColumn(t.rotations, indices, np.degrees), IndexedColumn(t.scales, indices),
+                          parents, IndexedColumn(t.matrices, indices, lambda m: m[:, 3, :3]),
+                          vaos, [self.mesh_entry(name) for name in vao_codes], **kwargs)
+
     def render(self):
-        for obj in self.objects:
-            obj.render()
+        self.update()
+        self.draw()
+
+    def update(self, alpha=1.0):
+        """ Etapa de CPU do frame: transformações, BVH, culling e LOD; `alpha` interpola os passos fixos """
+        profiler = self.profiler
+        # Recalcula de uma vez as matrizes dos objetos movidos
+        with profiler.scope('scene/transforms'):
+            moved = self.app.transforms.update()
+            interpolated = self.app.transforms.interpolate(alpha)
+        with profiler.scope('scene/bvh'):
+            self.bvh.refit(moved)
+            self.grid.update(moved)
+            self.instanced_renderer.update(moved)
+            self.instanced_renderer.update(interpolated)
+
+        self.visible = None
+        if self.culling:
+            with profiler.scope('scene/culling'):
+                self.visible = self.bvh.query(self.app.camera.get_frustum_planes())
+        if self.occlusion.enabled:
+            with profiler.scope('scene/occlusion'):
+                if self.visible is None:
+                    self.visible = np.fromiter(self.by_index, dtype=np.int64, count=len(self.by_index))
+                self.candidates = self.visible
+                self.visible = self.occlusion.filter(self.candidates)
+
+        # Objetos que trocaram de LOD mudam de lote no modo instanciado
+        with profiler.scope('scene/lod'):
+            for obj, level in self.lod.select(self.visible):
+                self.instanced_renderer.remove(obj)
+                obj.set_lod(level)
+                self.instanced_renderer.add(obj)
+                self.queue.add(obj)
+
+        # Preparação paralela do que o draw() só precisa enviar
+        with profiler.scope('scene/prepare'):
+            self.prepare_draws()
+
+    def prepare_draws(self):
+        """ Modo instanciado: dados dos lotes; por objeto: ordem dos draws pela RenderQueue """
+        visible = self.visible
+        self.prepared_instanced = self.instanced
+        if self.instanced:
+            mask = None
+            if visible is not None:
+                mask = np.zeros(self.app.transforms.capacity, dtype=bool)
+                mask[visible] = True
+            self.instanced_renderer.prepare(mask)
+        else:
+            if visible is None:
+                visible = np.fromiter(self.by_index, dtype=np.int64, count=len(self.by_index))
+            self.draw_order = self.queue.build(visible)
+
+    def draw(self):
+        """ Envia os draw calls já preparados em update() (etapa serial, thread do GL) """
+        if self.prepared_instanced != self.instanced:
+            self.prepare_draws()  # modo trocado entre update() e draw()
+        with self.profiler.scope('scene/draw'):
+            if self.instanced:
+                self.instanced_renderer.submit()
+            else:
+                objects = [self.by_index[i] for i in self.draw_order.tolist()]
+                with self.profiler.gpu_scope('objects'):
+                    for obj in objects:
+                        obj.render()
+            # Com a profundidade do frame pronta, consulta as caixas para o próximo frame
+            if self.occlusion.enabled:
+                self.occlusion.issue(self.candidates)
+
+    def destroy(self):
+        self.instanced_renderer.destroy()
+        self.occlusion.destroy()
     
     def handle_input(self, key):
         """ Chama o gerenciador de hotkeys para lidar com a entrada """
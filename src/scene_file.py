@@ -0,0 +1,165 @@
+"""
+Formato binário colunar de cena (.e3ds).
+
+    cabeçalho (64 bytes) | tabela de chunks | type u1[n] | tex_id i4[n] | pos f4[n,3] | rot f4[n,3] | scale f4[n,3]
+    | parent i4[n] | vao u2[n] | tabela de malhas (JSON)
+
+Cada coluna é contígua e alinhada a 16 bytes, então o arquivo inteiro é lido com np.memmap e
+qualquer intervalo de objetos vira uma fatia das colunas. Os objetos são divididos em chunks de
+`chunk_size`; a tabela guarda, por chunk, o intervalo e a AABB das posições para carregar só
+uma região da cena. Rotações ficam em graus, como nos construtores de Cube/Sphere.
+
+pos/rot/scale são relativos ao pai; `parent` é a linha do pai no próprio arquivo (-1 na raiz).
+Arquivos da versão 1, sem a coluna, são lidos com todos os objetos na raiz.
+
+`vao` é 0 para o VAO padrão do tipo e k para a k-ésima entrada da tabela de malhas, uma lista
+JSON de {"name", "path", "program"}: `path` é o arquivo de models/ das malhas importadas, para
+importá-las de novo ao carregar. Arquivos anteriores à versão 3 usam só os VAOs padrão.
+"""
+import json
+import os
+import numpy as np
+
+MAGIC = b'E3DS'
+VERSION = 3
+CHUNK_SIZE = 65536
+ALIGN = 16
+WRITE_BLOCK = 65536  # objetos por escrita ao salvar
+# Código gravado na coluna `type` -> nome usado por Scene.add_object_from_ui
+TYPE_NAMES = ('cube', 'sphere')
+
+HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u4'), ('count', '<u8'),
+                         ('chunk_size', '<u4'), ('chunk_count', '<u4'), ('meshes_offset', '<u8'),
+                         ('meshes_size', '<u4'), ('reserved', 'u1', 28)])
+CHUNK_DTYPE = np.dtype([('start', '<u8'), ('count', '<u8'),
+                        ('bounds_min', '<f4', 3), ('bounds_max', '<f4', 3)])
+COLUMNS = (('type', 'u1', ()), ('tex_id', '<i4', ()), ('pos', '<f4', (3,)),
+           ('rot', '<f4', (3,)), ('scale', '<f4', (3,)), ('parent', '<i4', ()), ('vao', '<u2', ()))
+# Colunas presentes em cada versão lida
+VERSION_COLUMNS = {1: COLUMNS[:5], 2: COLUMNS[:6], 3: COLUMNS}
+
+
+def aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def column_offsets(count, chunk_count, columns=COLUMNS):
+    """ Posição de cada coluna no arquivo e o tamanho total """
+    offset = aligned(HEADER_DTYPE.itemsize + chunk_count * CHUNK_DTYPE.itemsize)
+    offsets = {}
+    for name, dtype, shape in columns:
+        offsets[name] = offset
+        offset = aligned(offset + count * np.dtype(dtype).itemsize * int(np.prod(shape)))
+    return offsets, offset
+
+
+class SceneFile:
+    """ Leitura de um .e3ds via memmap; nada é copiado até uma fatia ser usada """
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype='u1', mode='r')
+        header = self.data[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)[0]
+        version = int(header['version'])
+        if header['magic'] != MAGIC or version not in VERSION_COLUMNS:
+            raise ValueError(f"{path}: não é uma cena .e3ds (versões {', '.join(map(str, VERSION_COLUMNS))})")
+        self.count = int(header['count'])
+        self.chunk_size = int(header['chunk_size'])
+        chunk_count = int(header['chunk_count'])
+        table_end = HEADER_DTYPE.itemsize + chunk_count * CHUNK_DTYPE.itemsize
+        self.chunks = self.data[HEADER_DTYPE.itemsize:table_end].view(CHUNK_DTYPE)
+
+        columns = VERSION_COLUMNS[version]
+        offsets, size = column_offsets(self.count, chunk_count, columns)
+        if len(self.data) < size:
+            raise ValueError(f"{path}: arquivo truncado ({len(self.data)} de {size} bytes)")
+        self.columns = {}
+        for name, dtype, shape in columns:
+            nbytes = self.count * np.dtype(dtype).itemsize * int(np.prod(shape))
+            column = self.data[offsets[name]:offsets[name] + nbytes].view(dtype)
+            self.columns[name] = column.reshape(self.count, *shape)
+        if 'parent' not in self.columns:
+            self.columns['parent'] = np.full(self.count, -1, dtype='<i4')
+        if 'vao' not in self.columns:
+            self.columns['vao'] = np.zeros(self.count, dtype='<u2')
+        # Entrada k da tabela = código k + 1 da coluna vao
+        self.meshes = []
+        if version >= 3 and header['meshes_size']:
+            start = int(header['meshes_offset'])
+            self.meshes = json.loads(bytes(self.data[start:start + int(header['meshes_size'])]))
+
+    def __len__(self):
+        return self.count
+
+    def read(self, start=0, stop=None):
+        """ Colunas dos objetos [start, stop) """
+        return {name: column[start:stop] for name, column in self.columns.items()}
+
+    def read_chunk(self, chunk):
+        start, count = int(self.chunks[chunk]['start']), int(self.chunks[chunk]['count'])
+        return self.read(start, start + count)
+
+    def chunks_in(self, bounds_min, bounds_max):
+        """ Chunks cuja AABB de posições intersecta a caixa dada """
+        overlap = ((self.chunks['bounds_min'] <= np.asarray(bounds_max, dtype='f4')).all(axis=1)
+                   & (self.chunks['bounds_max'] >= np.asarray(bounds_min, dtype='f4')).all(axis=1))
+        return np.flatnonzero(overlap)
+
+
+class IndexedColumn:
+    """ Coluna "virtual" array[indices], montada só no bloco pedido por save_scene """
+    def __init__(self, array, indices, transform=None):
+        self.array = array
+        self.indices = indices
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, block):
+        values = self.array[self.indices[block]]
+        return self.transform(values) if self.transform else values
+
+
+def save_scene(path, types, tex_ids, pos, rot, scale, parents=None, world_pos=None, vaos=None, meshes=(),
+               chunk_size=CHUNK_SIZE):
+    """
+    Grava as colunas num .e3ds. Os argumentos podem ser arrays ou memmaps de qualquer tamanho:
+    cada coluna é escrita em blocos de WRITE_BLOCK objetos, sem montar o arquivo em memória.
+
+    `parents` são linhas do próprio arquivo (padrão: todos na raiz) e `world_pos`, as posições no
+    mundo usadas nas AABBs dos chunks (padrão: `pos`, que só vale no mundo para as raízes).
+    `vaos` são códigos na tabela `meshes` (padrão: 0, o VAO do tipo).
+    """
+    count = len(types)
+    chunk_count = -(-count // chunk_size)
+    offsets, size = column_offsets(count, chunk_count)
+
+    chunks = np.zeros(chunk_count, dtype=CHUNK_DTYPE)
+    for chunk in range(chunk_count):
+        start = chunk * chunk_size
+        block = np.asarray((pos if world_pos is None else world_pos)[start:start + chunk_size], dtype='f4')
+        chunks[chunk] = (start, len(block), block.min(axis=0), block.max(axis=0))
+    meshes = json.dumps(list(meshes)).encode() if len(meshes) else b''
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header[0] = (MAGIC, VERSION, count, chunk_size, chunk_count, size, len(meshes), 0)
+
+    if parents is None:
+        parents = np.full(count, -1, dtype='<i4')
+    if vaos is None:
+        vaos = np.zeros(count, dtype='<u2')
+    columns = {'type': types, 'tex_id': tex_ids, 'pos': pos, 'rot': rot, 'scale': scale, 'parent': parents,
+               'vao': vaos}
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(header.tobytes())
+        file.write(chunks.tobytes())
+        for name, dtype, shape in COLUMNS:
+            file.seek(offsets[name])
+            for start in range(0, count, WRITE_BLOCK):
+                block = np.asarray(columns[name][start:start + WRITE_BLOCK])
+                file.write(block.astype(dtype, copy=False).reshape(-1, *shape).tobytes())
+        file.truncate(size)
+        file.seek(size)
+        file.write(meshes)
+    os.replace(tmp_path, path)
+    return count
@@ -0,0 +1,118 @@
+import time
+from collections import deque
+import numpy as np
+
+STEP_RATE = 120         # passos de simulação por segundo
+TARGET_FPS = 60
+MAX_STEPS = 8           # passos por frame antes de descartar o atraso (evita a "espiral da morte")
+MAX_FRAME_MS = 250.0    # frames mais longos (ex.: janela arrastada) contam como este valor
+HISTORY = 240           # frames usados nas estatísticas
+PACING_MODES = ('capped', 'uncapped', 'adaptive')
+# Alvos do modo adaptativo, do mais alto ao mais baixo
+ADAPTIVE_RATES = (240, 144, 120, 90, 60, 45, 30)
+ADAPTIVE_WINDOW = 30    # frames avaliados antes de mudar o alvo
+ADAPTIVE_HEADROOM = 0.7  # sobe de alvo se o trabalho usa menos que 70% do orçamento do alvo acima
+
+
+class FrameScheduler:
+    """
+    Passo fixo de simulação com acumulador, desacoplado do render.
+
+    Cada frame soma o tempo real ao acumulador e roda quantos passos de `step_ms` couberem
+    (app.simulate); a sobra vira `alpha`, usado para interpolar câmera e objetos entre o
+    estado anterior e o atual. Com `deterministic`, cada frame avança exatamente um passo,
+    independente do relógio (execuções headless reproduzíveis).
+    """
+    def __init__(self, app, step_rate=STEP_RATE, pacing='capped', target_fps=TARGET_FPS, deterministic=False):
+        if pacing not in PACING_MODES:
+            raise ValueError(f"pacing deve ser um de {PACING_MODES}")
+        self.app = app
+        self.clock = app.clock
+        self.step_ms = 1000.0 / step_rate
+        self.pacing = pacing
+        self.target_fps = target_fps
+        self.deterministic = deterministic
+        self.accumulator = 0.0
+        self.alpha = 1.0
+        self.sim_time = 0.0     # ms simulados
+        self.steps = 0          # passos do último frame
+        self.total_steps = 0
+        self.dropped_steps = 0  # passos descartados por MAX_STEPS
+        self.last_time = None
+        self.frame_times = deque(maxlen=HISTORY)
+        self.work_times = deque(maxlen=HISTORY)  # tempo do frame sem a espera do pacing
+        self.step_counts = deque(maxlen=HISTORY)
+
+    def advance(self):
+        """ Roda os passos de simulação devidos neste frame e calcula alpha """
+        now = time.perf_counter()
+        frame_ms = 0.0 if self.last_time is None else (now - self.last_time) * 1000
+        self.last_time = now
+        if self.deterministic:
+            frame_ms = self.step_ms
+        else:
+            self.frame_times.append(frame_ms)
+        self.accumulator += min(frame_ms, MAX_FRAME_MS)
+
+        steps = 0
+        while self.accumulator >= self.step_ms and steps < MAX_STEPS:
+            self.app.simulate(self.step_ms)
+            self.accumulator -= self.step_ms
+            self.sim_time += self.step_ms
+            steps += 1
+        if self.accumulator >= self.step_ms:
+            dropped = int(self.accumulator // self.step_ms)
+            self.dropped_steps += dropped
+            self.accumulator -= dropped * self.step_ms
+        self.steps = steps
+        self.total_steps += steps
+        self.step_counts.append(steps)
+        self.alpha = self.accumulator / self.step_ms
+        return steps
+
+    def pace(self):
+        """ Espera conforme o modo: capped (alvo fixo), uncapped (sem espera) ou adaptive """
+        if self.pacing == 'uncapped':
+            self.app.delta_time = self.clock.tick()
+        else:
+            if self.pacing == 'adaptive':
+                self.adapt()
+            self.app.delta_time = self.clock.tick(self.target_fps)
+        self.work_times.append(self.clock.get_rawtime())
+        if self.deterministic:
+            self.frame_times.append(self.clock.get_time())
+
+    def adapt(self):
+        """ Baixa o alvo quando o trabalho não cabe no orçamento; sobe quando sobra folga """
+        if len(self.work_times) < ADAPTIVE_WINDOW:
+            return
+        recent = np.fromiter(self.work_times, dtype='f8')[-ADAPTIVE_WINDOW:]
+        work = np.percentile(recent, 90)
+        lower = [rate for rate in ADAPTIVE_RATES if rate < self.target_fps]
+        higher = [rate for rate in ADAPTIVE_RATES if rate > self.target_fps]
+        if work > 1000 / self.target_fps and lower:
+            self.target_fps = lower[0]
+            self.work_times.clear()
+        elif higher and work < ADAPTIVE_HEADROOM * 1000 / higher[-1]:
+            self.target_fps = higher[-1]
+            self.work_times.clear()
+
+    def stats(self):
+        """ Estatísticas de tempo de frame das últimas HISTORY amostras """
+        if not self.frame_times:
+            return {}
+        times = np.fromiter(self.frame_times, dtype='f8')
+        p50, p95, p99 = np.percentile(times, (50, 95, 99))
+        return {
+            'pacing': self.pacing,
+            'target_fps': self.target_fps if self.pacing != 'uncapped' else None,
+            'step_rate': 1000.0 / self.step_ms,
+            'fps': 1000.0 / times.mean() if times.mean() > 0 else 0.0,
+            'frame_ms': times.mean(),
+            'p50': p50, 'p95': p95, 'p99': p99,
+            'max': times.max(),
+            'jitter_ms': times.std(),
+            'steps_per_frame': float(np.mean(self.step_counts)),
+            'dropped_steps': self.dropped_steps,
+            'alpha': self.alpha,
+        }
@@ -1,18 +1,119 @@
+import glob
+import hashlib
+import os
+import time
+
+SHADER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shaders')
+STAGES = (('vertex_shader', '.vert'), ('fragment_shader', '.frag'), ('geometry_shader', '.geom'))
+WATCH_INTERVAL = 0.5  # segundos entre verificações dos arquivos
+
+
+class ProgramRegistry(dict):
+    """ programs[name] compila o programa no primeiro acesso """
+    def __init__(self, shader_program):
+        super().__init__()
+        self.shader_program = shader_program
+
+    def __missing__(self, name):
+        program = self.shader_program.get_program(name)
+        self[name] = program
+        self.shader_program.notify(name, None, program)
+        return program
+
+
 class ShaderProgram:
+    """
+    Registro dos programas em shaders/: compilação sob demanda, cache por hash do código e hot reload.
+
+    O cache vale só para o processo: o moderngl não expõe os binários dos programas para gravar em disco.
+    """
     def __init__(self, ctx):
         self.ctx = ctx
-        self.programs = {}
-        self.programs['default'] = self.get_program('default')
+        self.sources = self.discover()
+        self.programs = ProgramRegistry(self)
+        self.cache = {}      # sha1 do código -> programa já linkado
+        self.hashes = {}     # nome -> sha1 do código em uso
+        self.mtimes = {}     # nome -> mtime dos arquivos na última compilação
+        # callback(name, old, new) quando um programa é compilado (old=None) ou trocado no hot reload
+        self.listeners = []
+        self.last_check = time.perf_counter()
 
-    def get_program(self, shader_program_name):
-        with open(f'shaders/{shader_program_name}.vert') as file:
-            vertex_shader = file.read()
+    @staticmethod
+    def discover():
+        """ Um programa para cada <nome>.vert com .frag correspondente (.geom é opcional) """
+        sources = {}
+        for vert in sorted(glob.glob(os.path.join(SHADER_DIR, '*.vert'))):
+            base = vert[:-len('.vert')]
+            paths = {stage: base + ext for stage, ext in STAGES if os.path.exists(base + ext)}
+            if 'fragment_shader' in paths:
+                sources[os.path.basename(base)] = paths
+        return sources
+
+    def read_sources(self, name):
+        if name not in self.sources:
+            raise KeyError(f"Shader '{name}' não encontrado em {SHADER_DIR}")
+        code = {}
+        for stage, path in self.sources[name].items():
+            with open(path) as file:
+                code[stage] = file.read()
+        return code
 
-        with open(f'shaders/{shader_program_name}.frag') as file:
-            fragment_shader = file.read()
+    def get_mtimes(self, name):
+        """ mtime dos arquivos do programa; None se algum sumiu (ex.: editor que salva renomeando) """
+        try:
+            return tuple(os.path.getmtime(path) for path in self.sources[name].values())
+        except OSError:
+            return None
+
+    def get_program(self, shader_program_name):
+        name = shader_program_name
+        self.mtimes[name] = self.get_mtimes(name)
+        code = self.read_sources(name)
+        digest = hashlib.sha1(repr(sorted(code.items())).encode()).hexdigest()
+        self.hashes[name] = digest
+        if digest in self.cache:
+            return self.cache[digest]
 
-        program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
+        start = time.perf_counter()
+        program = self.ctx.program(**code)
+        self.cache[digest] = program
+        print(f"Shader {name}: compilado em {(time.perf_counter() - start) * 1000:.1f} ms")
         return program
 
+    def add_listener(self, callback):
+        """ Registra o callback e o chama para os programas já compilados """
+        self.listeners.append(callback)
+        for name, program in self.programs.items():
+            callback(name, None, program)
+
+    def notify(self, name, old, new):
+        for callback in self.listeners:
+            callback(name, old, new)
+
+    def poll(self):
+        """ Recompila os programas cujos arquivos mudaram e avisa quem usa o programa antigo """
+        now = time.perf_counter()
+        if now - self.last_check < WATCH_INTERVAL:
+            return
+        self.last_check = now
+        for name in list(self.programs):
+            mtimes = self.get_mtimes(name)
+            # Arquivo ausente: conta como inalterado e é verificado de novo na próxima vez
+            if mtimes is not None and mtimes != self.mtimes[name]:
+                self.reload(name)
+
+    def reload(self, name):
+        old, old_hash = self.programs[name], self.hashes[name]
+        try:
+            new = self.get_program(name)
+        except Exception as error:
+            # Mantém o programa que funciona até o arquivo ser corrigido
+            self.hashes[name] = old_hash
+            print(f"Shader {name}: erro ao recompilar, mantendo a versão anterior\n{error}")
+            return
+        if new is not old:
+            self.programs[name] = new
+            self.notify(name, old, new)
+
     def destroy(self):
-        [program.release() for program in self.programs.values()]
+        [program.release() for program in self.cache.values()]
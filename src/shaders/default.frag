@@ -6,39 +6,65 @@ in vec2 uv_0;
 in vec3 normal;
 in vec3 fragPos;
 
-struct Light { 
-    vec3 position;
-    vec3 Ia;
-    vec3 Id;
-    vec3 Is;
+// Constantes iguais às de light.py
+const int MAX_LIGHTS = 256;
+const int TILE_SIZE = 16;
+const int INDEX_WIDTH = 4096;
+
+struct Light {
+    vec4 position;  // xyz; w = alcance (0: ilumina tudo)
+    vec4 Ia;
+    vec4 Id;
+    vec4 Is;
 };
 
-uniform Light light;
-uniform sampler2D u_texture_0;
-uniform vec3 camPos;
+layout (std140) uniform Lights {
+    Light lights[MAX_LIGHTS];
+};
+uniform isampler2D u_light_grid;   // (início, quantidade) das luzes de cada tile
+uniform isampler2D u_light_index;  // índices das luzes, tile após tile
+uniform sampler2DArray u_texture_0;
+uniform vec3 u_ambient;           // luz ambiente da cena, somada uma vez fora do laço dos tiles
+uniform int u_layer;
+layout (std140) uniform Frame {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 camPos;
+};
 
 vec3 getLight(vec3 color) {
     vec3 Normal = normalize(normal);
+    vec3 viewDir = normalize(camPos - fragPos);
+    vec3 result = u_ambient;
 
-    // ambient light
-    vec3 ambient = light.Ia;
+    // Só as luzes que alcançam o tile deste pixel
+    ivec2 tile = texelFetch(u_light_grid, ivec2(gl_FragCoord.xy) / TILE_SIZE, 0).xy;
+    for (int i = tile.x; i < tile.x + tile.y; i++) {
+        Light light = lights[texelFetch(u_light_index, ivec2(i % INDEX_WIDTH, i / INDEX_WIDTH), 0).r];
+        vec3 toLight = light.position.xyz - fragPos;
+        float attenuation = 1.0;
+        if (light.position.w > 0) {
+            float x = length(toLight) / light.position.w;
+            attenuation = pow(clamp(1.0 - x * x * x * x, 0.0, 1.0), 2.0);
+        }
 
-    // diffuse light
-    vec3 lightDir = normalize(light.position - fragPos);
-    float diff = max(0, dot(lightDir, Normal));
-    vec3 diffuse = diff * light.Id;
+        // diffuse light
+        vec3 lightDir = normalize(toLight);
+        float diff = max(0, dot(lightDir, Normal));
+        vec3 diffuse = diff * light.Id.rgb;
 
-    // specular light
-    vec3 viewDir = normalize(camPos - fragPos);
-    vec3 reflecDir = reflect(-lightDir, Normal);
-    float spec = pow(max(dot(viewDir, reflecDir), 0), 32);
-    vec3 specular = spec * light.Is;
+        // specular light
+        vec3 reflecDir = reflect(-lightDir, Normal);
+        float spec = pow(max(dot(viewDir, reflecDir), 0), 32);
+        vec3 specular = spec * light.Is.rgb;
 
-    return color * (ambient + diffuse + specular);
+        result += attenuation * (diffuse + specular);
+    }
+    return color * result;
 };
 
 void main() {
-    vec3 color = texture(u_texture_0, uv_0).rgb;
+    vec3 color = texture(u_texture_0, vec3(uv_0, u_layer)).rgb;
     color = getLight(color);
     fragColor = vec4(color, 1.0);
 }
\ No newline at end of file
@@ -1,6 +1,6 @@
 #version 330 core
 
-layout (location = 0) in vec2 in_textcoord_0;
+layout (location = 0) in vec2 in_texcoord_0;
 layout (location = 1) in vec3 in_normal;
 layout (location = 2) in vec3 in_position;
 
@@ -8,12 +8,16 @@ out vec2 uv_0;
 out vec3 normal;
 out vec3 fragPos;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
+layout (std140) uniform Frame {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 camPos;
+};
+
 uniform mat4 m_model;
 
 void main() {
-    uv_0 = in_textcoord_0;
+    uv_0 = in_texcoord_0;
     fragPos = vec3(m_model * vec4(in_position, 1.0));
     normal = mat3(transpose(inverse(m_model))) * normalize(in_normal);
     gl_Position = m_proj * m_view * m_model * vec4(in_position, 1.0);
@@ -0,0 +1,8 @@
+#version 330 core
+
+layout (location = 0) out vec4 fragColor;
+
+void main() {
+    // Cor e profundidade não são gravadas; só conta se algum sample passou no teste de profundidade
+    fragColor = vec4(1.0);
+}
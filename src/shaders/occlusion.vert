@@ -0,0 +1,22 @@
+#version 330 core
+
+layout (std140) uniform Frame {
+    mat4 m_proj;
+    mat4 m_view;
+    vec3 camPos;
+};
+
+// AABB do objeto no mundo; a caixa sai de gl_VertexID, sem vertex buffer
+uniform vec3 u_min;
+uniform vec3 u_max;
+
+// 12 triângulos; cada canto é um número de 3 bits (x, y, z)
+const int FACES[36] = int[36](0, 2, 6, 0, 6, 4,  1, 5, 7, 1, 7, 3,
+                              0, 4, 5, 0, 5, 1,  2, 3, 7, 2, 7, 6,
+                              0, 1, 3, 0, 3, 2,  4, 6, 7, 4, 7, 5);
+
+void main() {
+    int corner = FACES[gl_VertexID];
+    vec3 t = vec3(corner & 1, (corner >> 1) & 1, (corner >> 2) & 1);
+    gl_Position = m_proj * m_view * vec4(mix(u_min, u_max, t), 1.0);
+}
@@ -0,0 +1,11 @@
+#version 330 core
+
+layout (location = 0) out vec4 fragColor;
+
+in vec2 uv_0;
+
+uniform sampler2D u_overlay;
+
+void main() {
+    fragColor = texture(u_overlay, uv_0);
+}
\ No newline at end of file
@@ -0,0 +1,15 @@
+#version 330 core
+
+layout (location = 0) out vec4 fragColor;
+
+in vec2 uv_0;
+
+uniform sampler2D u_scene;
+uniform vec2 u_region;  // fração da textura ocupada pelo frame (escala atual / escala máxima)
+uniform vec2 u_texel;   // 1 / tamanho da textura
+
+void main() {
+    // clamp to the rendered region so bilinear filtering never reads past its edge
+    vec2 uv = clamp(uv_0 * u_region, 0.5 * u_texel, u_region - 0.5 * u_texel);
+    fragColor = vec4(texture(u_scene, uv).rgb, 1.0);
+}
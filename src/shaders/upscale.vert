@@ -0,0 +1,10 @@
+#version 330 core
+
+out vec2 uv_0;
+
+void main() {
+    // full-screen triangle from gl_VertexID, no vertex buffer needed
+    vec2 position = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+    uv_0 = position;
+    gl_Position = vec4(position * 2.0 - 1.0, 0.0, 1.0);
+}
@@ -0,0 +1,226 @@
+import numpy as np
+
+CELL_SIZE = 4.0          # aresta da célula; objetos com aresta maior que isso ficam na lista de grandes
+KEY_BITS = 21            # bits por eixo na chave empacotada da célula
+KEY_OFFSET = 1 << (KEY_BITS - 1)
+KEY_MASK = (1 << KEY_BITS) - 1
+OUTSIDE, LARGE = -1, -2  # valores de cell_of para índices fora da grade e na lista de grandes
+NEIGHBORS = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)], dtype=np.int64)
+
+
+def pack(coords):
+    coords = np.clip(np.asarray(coords, dtype=np.int64) + KEY_OFFSET, 0, KEY_MASK)
+    return (coords[..., 0] << (2 * KEY_BITS)) | (coords[..., 1] << KEY_BITS) | coords[..., 2]
+
+
+def unpack(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return np.stack([keys >> (2 * KEY_BITS), (keys >> KEY_BITS) & KEY_MASK, keys & KEY_MASK], axis=-1) - KEY_OFFSET
+
+
+class SpatialGrid:
+    """
+    Grade uniforme "solta" sobre as AABBs do TransformStore, para picking e consultas de proximidade.
+
+    Cada objeto fica numa única célula, a do centro da sua AABB; como a meia-extensão não passa de
+    meia célula, a AABB só alcança essa célula e as 26 vizinhas. Objetos maiores ficam numa lista
+    à parte, testada em toda consulta. Inserir, mover e remover custam O(1) por objeto (a remoção
+    troca o índice com o último da célula).
+    """
+    def __init__(self, transforms, cell_size=CELL_SIZE):
+        self.transforms = transforms
+        self.cell_size = float(cell_size)
+        self.cells = {}   # chave da célula -> lista de índices no TransformStore
+        self.large = {}   # índices grandes demais para uma célula (dict: remoção O(1))
+        self.cell_of = np.full(0, OUTSIDE, dtype=np.int64)
+        self.slot = np.zeros(0, dtype=np.int64)  # posição do índice na lista da sua célula
+        # Células ocupadas (só cresce): limita o percurso dos raios e as consultas amplas
+        self.bounds_min = np.full(3, np.iinfo(np.int64).max // 4, dtype=np.int64)
+        self.bounds_max = np.full(3, np.iinfo(np.int64).min // 4, dtype=np.int64)
+
+    def ensure_capacity(self):
+        capacity = self.transforms.capacity
+        if len(self.cell_of) < capacity:
+            grow = capacity - len(self.cell_of)
+            self.cell_of = np.concatenate([self.cell_of, np.full(grow, OUTSIDE, dtype=np.int64)])
+            self.slot = np.concatenate([self.slot, np.zeros(grow, dtype=np.int64)])
+
+    def cell_coords(self, points):
+        return np.floor(np.asarray(points, dtype='f8') / self.cell_size).astype(np.int64)
+
+    def keys_for(self, indices):
+        """ Chave da célula do centro de cada AABB (LARGE se a AABB passa de uma célula) """
+        t = self.transforms
+        center = (t.aabb_min[indices] + t.aabb_max[indices]) * 0.5
+        half = (t.aabb_max[indices] - t.aabb_min[indices]) * 0.5
+        coords = self.cell_coords(center)
+        keys = pack(coords)
+        large = half.max(axis=1) > self.cell_size * 0.5
+        keys[large] = LARGE
+        if (~large).any():
+            self.bounds_min = np.minimum(self.bounds_min, coords[~large].min(axis=0))
+            self.bounds_max = np.maximum(self.bounds_max, coords[~large].max(axis=0))
+        return keys
+
+    def insert(self, index):
+        self.insert_many(np.array([index], dtype=np.int64))
+
+    def insert_many(self, indices):
+        self.ensure_capacity()
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices):
+            self.place(indices, self.keys_for(indices))
+
+    def place(self, indices, keys):
+        self.cell_of[indices] = keys
+        large = keys == LARGE
+        self.large.update(dict.fromkeys(indices[large].tolist()))
+        indices, keys = indices[~large], keys[~large]
+        order = np.argsort(keys, kind='stable')
+        indices, keys = indices[order], keys[order]
+        unique, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        for key, start, count in zip(unique.tolist(), starts.tolist(), counts.tolist()):
+            members = self.cells.setdefault(key, [])
+            group = indices[start:start + count]
+            self.slot[group] = np.arange(len(members), len(members) + count)
+            members.extend(group.tolist())
+
+    def remove(self, index):
+        key = int(self.cell_of[index])
+        if key == OUTSIDE:
+            return
+        self.cell_of[index] = OUTSIDE
+        if key == LARGE:
+            del self.large[index]
+            return
+        members = self.cells[key]
+        slot = int(self.slot[index])
+        last = members.pop()
+        if last != index:
+            members[slot] = last
+            self.slot[last] = slot
+        if not members:
+            del self.cells[key]
+
+    def update(self, indices):
+        """ Move para a célula nova os objetos (já recalculados) que mudaram de célula """
+        indices = np.asarray(indices, dtype=np.int64)
+        indices = indices[self.cell_of[indices] != OUTSIDE] if len(indices) else indices
+        if not len(indices):
+            return
+        keys = self.keys_for(indices)
+        changed = keys != self.cell_of[indices]
+        for index in indices[changed].tolist():
+            self.remove(index)
+        self.place(indices[changed], keys[changed])
+
+    def gather(self, keys):
+        """ Índices das células `keys` mais os objetos grandes """
+        cells = self.cells
+        found = [cells[key] for key in keys if key in cells]
+        found.append(list(self.large))
+        return np.fromiter((index for members in found for index in members), dtype=np.int64)
+
+    def box_keys(self, low, high):
+        """ Chaves das células ocupadas entre as coordenadas `low` e `high` (inclusive) """
+        low, high = np.maximum(low, self.bounds_min), np.minimum(high, self.bounds_max)
+        if (low > high).any():
+            return []
+        if np.prod(high - low + 1) > len(self.cells):
+            # Caixa maior que a grade ocupada: filtra as células existentes
+            keys = np.fromiter(self.cells, dtype=np.int64, count=len(self.cells))
+            coords = unpack(keys)
+            return keys[((coords >= low) & (coords <= high)).all(axis=1)].tolist()
+        axes = [np.arange(lo, hi + 1) for lo, hi in zip(low.tolist(), high.tolist())]
+        return pack(np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)).tolist()
+
+    def distances(self, indices, point):
+        """ Distância do ponto à AABB de cada índice (0 dentro dela) """
+        t = self.transforms
+        gap = np.maximum(np.maximum(t.aabb_min[indices] - point, point - t.aabb_max[indices]), 0)
+        return np.linalg.norm(gap, axis=1)
+
+    def within(self, point, radius):
+        """ (índices, distâncias) das AABBs a até `radius` do ponto, da mais próxima à mais distante """
+        point = np.asarray(point, dtype='f4')
+        # +1 célula: a AABB pode avançar meia célula além da célula do centro
+        low = self.cell_coords(point - radius) - 1
+        high = self.cell_coords(point + radius) + 1
+        indices = self.gather(self.box_keys(low, high))
+        dist = self.distances(indices, point)
+        keep = dist <= radius
+        indices, dist = indices[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        return indices[order], dist[order]
+
+    def nearest(self, point, k=1):
+        """ (índices, distâncias) dos k objetos mais próximos, por raios dobrando a partir de uma célula """
+        point = np.asarray(point, dtype='f4')
+        radius = self.cell_size
+        while True:
+            indices, dist = self.within(point, radius)
+            # Tudo a até `radius` foi visto: com k resultados, os k mais próximos estão entre eles
+            covers = ((self.cell_coords(point - radius) <= self.bounds_min).all()
+                      and (self.cell_coords(point + radius) >= self.bounds_max).all())
+            if len(indices) >= k or covers:
+                return indices[:k], dist[:k]
+            radius *= 2
+
+    def ray_hits(self, indices, origin, inverse):
+        """ Distância de entrada do raio em cada AABB (inf se não atinge) """
+        t = self.transforms
+        t1 = (t.aabb_min[indices] - origin) * inverse
+        t2 = (t.aabb_max[indices] - origin) * inverse
+        near = np.minimum(t1, t2).max(axis=1)
+        far = np.maximum(t1, t2).min(axis=1)
+        return np.where((near <= far) & (far >= 0), np.maximum(near, 0), np.inf)
+
+    def raycast(self, origin, direction, max_distance=np.inf):
+        """ (índice, distância) da primeira AABB atingida pelo raio, ou (None, inf) """
+        origin = np.asarray(origin, dtype='f8')
+        direction = np.asarray(direction, dtype='f8')
+        direction = direction / np.linalg.norm(direction)
+        inverse = 1.0 / np.where(direction == 0, 1e-30, direction)
+        best, best_t = None, np.inf
+
+        def test(indices):
+            nonlocal best, best_t
+            if len(indices):
+                hits = self.ray_hits(indices, origin, inverse)
+                i = int(np.argmin(hits))
+                if hits[i] < best_t and hits[i] <= max_distance:
+                    best, best_t = int(indices[i]), float(hits[i])
+
+        test(np.fromiter(self.large, dtype=np.int64, count=len(self.large)))
+        if not self.cells:
+            return best, best_t
+        # Recorta o raio à região ocupada (+1 célula de folga) e percorre as células com 3D-DDA
+        cell = self.cell_size
+        box_min = (self.bounds_min - 1) * cell
+        box_max = (self.bounds_max + 2) * cell
+        t1, t2 = (box_min - origin) * inverse, (box_max - origin) * inverse
+        t_enter = max(np.minimum(t1, t2).max(), 0.0)
+        t_exit = min(np.maximum(t1, t2).min(), max_distance)
+        if t_enter > t_exit:
+            return best, best_t
+
+        coords = np.clip(self.cell_coords(origin + direction * t_enter), self.bounds_min - 1, self.bounds_max + 1)
+        step = np.where(direction >= 0, 1, -1)
+        boundary = (coords + (step > 0)) * cell
+        t_next = np.where(direction != 0, (boundary - origin) * inverse, np.inf)
+        t_delta = np.where(direction != 0, cell * np.abs(inverse), np.inf)
+        seen = set()
+        t = t_enter
+        # Um objeto atingido em t tem o centro na célula de origin + direction * t ou numa vizinha,
+        # então depois de visitar as células com entrada <= best_t nenhum acerto mais próximo falta
+        while t <= min(t_exit, best_t):
+            keys = [key for key in pack(coords + NEIGHBORS).tolist() if key not in seen]
+            seen.update(keys)
+            cells = self.cells
+            found = [cells[key] for key in keys if key in cells]
+            test(np.fromiter((index for members in found for index in members), dtype=np.int64))
+            axis = int(np.argmin(t_next))
+            t = t_next[axis]
+            coords[axis] += step[axis]
+            t_next[axis] += t_delta[axis]
+        return best, best_t
@@ -1,21 +1,261 @@
+import ctypes
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pygame as pg
 import moderngl as mgl
+from resources import LazyRegistry
 
-class Texture:
+TEXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'textures')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'textures')
+CACHE_VERSION = 2
+TEXTURE_WORKERS = 4
+# Filtragem padrão: trilinear com mipmaps + anisotrópica (limitada por ctx.max_anisotropy)
+DEFAULT_FILTER = (mgl.LINEAR_MIPMAP_LINEAR, mgl.LINEAR)
+DEFAULT_ANISOTROPY = 8.0
+# Cabeçalho do cache: largura, altura, componentes, níveis de mipmap (uint32)
+HEADER_SIZE = 16
+
+# Constantes do OpenGL para enviar os níveis de mipmap (o TextureArray do moderngl só escreve o nível 0)
+GL_TEXTURE0 = 0x84C0
+GL_TEXTURE_2D_ARRAY = 0x8C1A
+GL_TEXTURE_MAX_LEVEL = 0x813D
+GL_UNPACK_ALIGNMENT = 0x0CF5
+GL_UNSIGNED_BYTE = 0x1401
+GL_FORMATS = {3: (0x8051, 0x1907), 4: (0x8058, 0x1908)}  # componentes -> (GL_RGB8, GL_RGB), (GL_RGBA8, GL_RGBA)
+
+
+def mip_sizes(size):
+    """ (largura, altura) de cada nível, do 0 até 1x1 """
+    width, height = size
+    sizes = [(width, height)]
+    while width > 1 or height > 1:
+        width, height = max(1, width // 2), max(1, height // 2)
+        sizes.append((width, height))
+    return sizes
+
+
+def build_mips(image):
+    """ Níveis 1.. da cadeia de mipmaps de `image` (altura, largura, componentes), média de blocos 2x2 """
+    levels = []
+    while image.shape[0] > 1 or image.shape[1] > 1:
+        height, width = image.shape[:2]
+        fy, fx = (2 if height > 1 else 1), (2 if width > 1 else 1)
+        block = image[:height // fy * fy, :width // fx * fx].astype(np.uint16)
+        block = block.reshape(height // fy, fy, width // fx, fx, -1).sum(axis=(1, 3))
+        image = ((block + fy * fx // 2) // (fy * fx)).astype(np.uint8)
+        levels.append(image)
+    return levels
+
+
+def cache_key(path):
+    """ Chave do cache pelo caminho, mtime e tamanho: um acerto não lê nem decodifica a imagem """
+    stat = os.stat(path)
+    key = f'{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}:{CACHE_VERSION}'
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def decode_image(path):
+    """
+    Decodifica a imagem (ou lê do cache) em RGB já invertido no eixo y, com a cadeia de mipmaps;
+    roda nas threads de fundo. Retorna os bytes de cada nível, do 0 ao 1x1.
+    """
+    start = time.perf_counter()
+    cache_path = os.path.join(CACHE_DIR, cache_key(path) + '.mip')
+
+    if os.path.exists(cache_path):
+        raw = np.memmap(cache_path, dtype='u1', mode='r')
+        width, height, components, _ = (int(value) for value in raw[:HEADER_SIZE].view('<u4'))
+        levels, offset = [], HEADER_SIZE
+        for level_width, level_height in mip_sizes((width, height)):
+            nbytes = level_width * level_height * components
+            levels.append(raw[offset:offset + nbytes])
+            offset += nbytes
+        cached = True
+    else:
+        surface = pg.image.load(path)
+        width, height = surface.get_size()
+        components = 3
+        base = np.frombuffer(pg.image.tostring(surface, 'RGB', True), dtype='u1')
+        levels = [base] + [level.ravel() for level in build_mips(base.reshape(height, width, components))]
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        header = np.array([width, height, components, len(levels)], dtype='<u4').tobytes()
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(header)
+            for level in levels:
+                file.write(level.tobytes())
+        os.replace(tmp_path, cache_path)
+        cached = False
+
+    elapsed = time.perf_counter() - start
+    return (width, height), components, levels, cached, elapsed
+
+
+class MipUpload:
+    """
+    Envia níveis de mipmap prontos para um texture array.
+
+    O moderngl só escreve o nível 0 de um TextureArray, então as funções do GL vêm do carregador do
+    glcontext do próprio contexto. Sem ele (`available` falso), os mipmaps são gerados na GPU.
+    """
     def __init__(self, ctx):
         self.ctx = ctx
-        self.textures = {}
-        self.textures[0] = self.get_texture(path='textures\\img.png')
-        self.textures[1] = self.get_texture(path='textures\\img_1.png')
-        self.textures[2] = self.get_texture(path='textures\\img_2.png')
-        self.textures[3] = self.get_texture(path='textures\\ground\\Ground080_1K-PNG_AmbientOcclusion.png')
-
-    def get_texture(self, path):
-        texture = pg.image.load(path).convert()
-        texture = pg.transform.flip(texture, flip_x=False, flip_y=True)
-        texture = self.ctx.texture(size=texture.get_size(), components=3,
-                                   data=pg.image.tostring(texture, 'RGB'))
+        try:
+            load = ctx.mglo._context.load
+        except AttributeError:
+            self.available = False
+            return
+        void, uint, int_ = None, ctypes.c_uint, ctypes.c_int
+        functions = {'glActiveTexture': (void, uint), 'glBindTexture': (void, uint, uint),
+                     'glPixelStorei': (void, uint, int_), 'glTexParameteri': (void, uint, uint, int_),
+                     'glTexImage3D': (void, uint, int_, int_, int_, int_, int_, int_, uint, uint, ctypes.c_void_p)}
+        for name, signature in functions.items():
+            setattr(self, name, ctypes.CFUNCTYPE(*signature)(load(name)))
+        self.available = True
+
+    def upload(self, texture, components, layers, levels):
+        """ `levels[i]` são os bytes do nível i + 1 de todas as camadas, uma depois da outra """
+        internal, fmt = GL_FORMATS[components]
+        # Unidade que o moderngl usa para as próprias escritas: não mexe nas ligações do RenderState
+        self.glActiveTexture(GL_TEXTURE0 + self.ctx.default_texture_unit)
+        self.glBindTexture(GL_TEXTURE_2D_ARRAY, texture.glo)
+        self.glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        sizes = mip_sizes(texture.size[:2])
+        for level, data in enumerate(levels, start=1):
+            data = np.ascontiguousarray(data)
+            width, height = sizes[level]
+            self.glTexImage3D(GL_TEXTURE_2D_ARRAY, level, internal, width, height, layers, 0, fmt,
+                              GL_UNSIGNED_BYTE, data.ctypes.data)
+        self.glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAX_LEVEL, len(levels))
+
+
+class Texture:
+    def __init__(self, ctx, resources):
+        self.ctx = ctx
+        self.resources = resources
+        self.start = time.perf_counter()
+        self.executor = ThreadPoolExecutor(max_workers=TEXTURE_WORKERS)
+        self.pending = {}  # tex_id -> Future da decodificação
+        self.stats = {}    # tex_id -> (ms de decodificação, veio do cache)
+        self.options = {}  # tex_id -> (filter, anisotropy)
+        self.decoded = {}  # tex_id -> (size, components, níveis) esperando para entrar num array
+        self.mips = MipUpload(ctx)
+        # Texturas de mesmo tamanho e opções dividem um texture_array; tex_id vira uma camada
+        self.arrays = []
+        self.layers = {}   # tex_id -> camada no array
+        self.version = 0   # muda sempre que textures/layers são trocados
+        # Até a textura real chegar, todos os ids apontam para o placeholder
+        self.placeholder = self.get_placeholder()
+        # tex_id -> texture_array que contém a textura; o primeiro acesso agenda a decodificação
+        self.textures = LazyRegistry(self.request)
+        self.sources = {}  # tex_id -> (path, filter, anisotropy)
+        self.register(0, 'img.png')
+        self.register(1, 'img_1.png')
+        self.register(2, 'img_2.png')
+        self.register(3, os.path.join('ground', 'Ground080_1K-PNG_AmbientOcclusion.png'))
+        resources.add_listener('texture', self.unload)
+
+    def register(self, tex_id, path, filter=DEFAULT_FILTER, anisotropy=DEFAULT_ANISOTROPY):
+        """ Associa `tex_id` ao arquivo sem carregá-lo; a decodificação começa no primeiro uso """
+        self.sources[tex_id] = (path, filter, anisotropy)
+
+    def request(self, tex_id):
+        if tex_id not in self.sources:
+            raise KeyError(f"Textura {tex_id} não registrada")
+        self.load(tex_id, *self.sources[tex_id])
+        return self.placeholder
+
+    def load(self, tex_id, path, filter=DEFAULT_FILTER, anisotropy=DEFAULT_ANISOTROPY):
+        """ Agenda a decodificação em segundo plano; `path` é relativo a textures/ """
+        self.sources[tex_id] = (path, filter, anisotropy)
+        self.textures[tex_id] = self.placeholder
+        self.layers[tex_id] = 0
+        self.options[tex_id] = (filter, anisotropy)
+        self.pending[tex_id] = self.executor.submit(decode_image, os.path.join(TEXTURE_DIR, path))
+
+    def poll(self):
+        """ Envia para a GPU as texturas já decodificadas (chamar na thread do OpenGL) """
+        for tex_id, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[tex_id]
+                size, components, levels, cached, elapsed = future.result()
+                self.decoded[tex_id] = (size, components, levels)
+                self.stats[tex_id] = (elapsed * 1000, cached)
+        # Os arrays só podem ser montados quando todas as camadas estão prontas
+        if self.decoded and not self.pending:
+            self.build_arrays()
+            self.report()
+
+    def build_arrays(self):
+        """ Agrupa as texturas decodificadas por (tamanho, componentes, opções) em texture arrays """
+        groups = {}
+        for tex_id, (size, components, levels) in sorted(self.decoded.items()):
+            key = (size, components, self.options[tex_id])
+            groups.setdefault(key, []).append((tex_id, levels))
+
+        for (size, components, (filter, anisotropy)), members in groups.items():
+            # Nível a nível, as camadas uma depois da outra
+            levels = [np.concatenate([layer_levels[level] for _, layer_levels in members])
+                      for level in range(len(members[0][1]))]
+            texture = self.get_texture_array(size, components, len(members), levels, filter, anisotropy)
+            self.arrays.append(texture)
+            for layer, (tex_id, _) in enumerate(members):
+                self.textures[tex_id] = texture
+                self.layers[tex_id] = layer
+        self.decoded.clear()
+        self.version += 1
+
+    def wait(self):
+        """ Bloqueia até todas as texturas estarem na GPU """
+        for future in list(self.pending.values()):
+            future.result()
+        self.poll()
+
+    def report(self):
+        total = (time.perf_counter() - self.start) * 1000
+        decode = sum(ms for ms, _ in self.stats.values())
+        cached = sum(hit for _, hit in self.stats.values())
+        print(f"Texturas: {len(self.stats)} prontas em {total:.1f} ms, decodificação {decode:.1f} ms "
+              f"({cached} do cache, {'warm' if cached == len(self.stats) else 'cold'} start)")
+
+    def unload(self, tex_id):
+        """ Libera o texture array de `tex_id` se nenhuma das suas camadas é usada; volta a carregar no próximo acesso """
+        texture = dict.get(self.textures, tex_id)
+        if texture is None or texture is self.placeholder:
+            return
+        members = [other for other, array in self.textures.items() if array is texture]
+        if any(self.resources.is_used('texture', other) for other in members):
+            return
+        for other in members:
+            del self.textures[other]
+            self.layers.pop(other, None)
+        self.arrays.remove(texture)
+        self.resources.release(texture)
+        self.version += 1
+
+    def get_placeholder(self):
+        texture = self.ctx.texture_array(size=(1, 1, 1), components=3, data=bytes((128, 128, 128)))
+        self.resources.track(texture, 'texture', 3)
+        return texture
+
+    def get_texture_array(self, size, components, layers, levels, filter=DEFAULT_FILTER,
+                          anisotropy=DEFAULT_ANISOTROPY):
+        """ Texture array com `levels` (bytes de cada nível de mipmap, todas as camadas) """
+        texture = self.ctx.texture_array(size=(*size, layers), components=components, data=levels[0])
+        # mipmaps do cache; sem o carregador do GL, gerados na GPU
+        if self.mips.available and len(levels) > 1:
+            self.mips.upload(texture, components, layers, levels[1:])
+        else:
+            texture.build_mipmaps()
+        texture.filter = filter
+        texture.anisotropy = min(anisotropy, self.ctx.max_anisotropy)
+        self.resources.track(texture, 'texture', self.resources.texture_bytes(size, components, layers, mipmaps=True))
         return texture
 
     def destroy(self):
-        [tex.release() for tex in self.textures.values()]
\ No newline at end of file
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        [self.resources.release(tex) for tex in self.arrays]
+        self.resources.release(self.placeholder)
@@ -0,0 +1,255 @@
+import numpy as np
+from parallel import PARALLEL_MIN
+
+INITIAL_CAPACITY = 64
+
+
+class TransformStore:
+    """
+    Posições, rotações, escalas e matrizes de modelo de todos os objetos em arrays contíguos.
+
+    Também guarda o grafo de cena: `parents[i]` é o pai de i (-1 na raiz) e posição/rotação/escala
+    são relativas ao pai. Um índice sujo recalcula a subárvore inteira, nível por nível (pais antes
+    dos filhos), cada nível numa única passada vetorizada.
+    """
+    def __init__(self, capacity=INITIAL_CAPACITY, pool=None):
+        self.pool = pool  # WorkerPool: lotes grandes são calculados em pedaços paralelos
+        self.size = 0
+        self.free = []
+        self.positions = np.zeros((capacity, 3), dtype='f4')
+        self.rotations = np.zeros((capacity, 3), dtype='f4')  # radianos
+        self.scales = np.ones((capacity, 3), dtype='f4')
+        # Matrizes já no layout column-major do OpenGL
+        self.matrices = np.zeros((capacity, 4, 4), dtype='f4')
+        # AABB local (extensão do VBO) e AABB no mundo, atualizada junto com a matriz
+        self.local_center = np.zeros((capacity, 3), dtype='f4')
+        self.local_extent = np.ones((capacity, 3), dtype='f4')
+        self.aabb_min = np.zeros((capacity, 3), dtype='f4')
+        self.aabb_max = np.zeros((capacity, 3), dtype='f4')
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.parents = np.full(capacity, -1, dtype=np.int64)
+        self.depth = np.zeros(capacity, dtype=np.int32)  # 0 na raiz
+        self.linked = np.zeros(0, dtype=np.int64)  # índices com pai, para achar filhos sem percorrer tudo
+        # Passo fixo (FrameScheduler): matrizes antes/depois do último passo dos objetos que se moveram
+        self.moving = np.zeros(0, dtype=np.int64)
+        self.step_from = np.zeros((0, 4, 4), dtype='f4')
+        self.step_to = np.zeros((0, 4, 4), dtype='f4')
+        self.stepped = np.zeros(0, dtype=np.int64)  # recalculados nos passos, reportados no próximo update()
+
+    @property
+    def capacity(self):
+        return len(self.dirty)
+
+    def grow(self, capacity=0):
+        capacity = max(capacity, 2 * self.capacity)
+        for name, fill in (('positions', 0), ('rotations', 0), ('scales', 1),
+                           ('matrices', 0), ('local_center', 0), ('local_extent', 1),
+                           ('aabb_min', 0), ('aabb_max', 0), ('dirty', False),
+                           ('parents', -1), ('depth', 0)):
+            old = getattr(self, name)
+            new = np.full((capacity, *old.shape[1:]), fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def allocate(self, pos=(0, 0, 0), rot=(0, 0, 0), scale=(1, 1, 1), bounds=((-1, -1, -1), (1, 1, 1))):
+        """ Reserva um índice para um novo objeto e calcula sua matriz e AABB """
+        if self.free:
+            index = self.free.pop()
+        else:
+            if self.size == self.capacity:
+                self.grow()
+            index = self.size
+            self.size += 1
+        self.positions[index] = tuple(pos)
+        self.rotations[index] = tuple(rot)
+        self.scales[index] = tuple(scale)
+        local_min, local_max = np.asarray(bounds, dtype='f4')
+        self.local_center[index] = (local_min + local_max) * 0.5
+        self.local_extent[index] = (local_max - local_min) * 0.5
+        self.compute(np.array([index]))
+        # Continua sujo para que o próximo update() reporte o novo objeto
+        self.dirty[index] = True
+        return index
+
+    def allocate_many(self, pos, rot, scale, bounds):
+        """ Reserva índices contíguos para vários objetos de uma vez; `bounds` é (2, 3) ou (n, 2, 3) """
+        count = len(pos)
+        if self.size + count > self.capacity:
+            self.grow(self.size + count)
+        indices = np.arange(self.size, self.size + count)
+        block = slice(self.size, self.size + count)
+        self.size += count
+        self.positions[block] = pos
+        self.rotations[block] = rot
+        self.scales[block] = scale
+        bounds = np.broadcast_to(np.asarray(bounds, dtype='f4'), (count, 2, 3))
+        self.local_center[block] = (bounds[:, 0] + bounds[:, 1]) * 0.5
+        self.local_extent[block] = (bounds[:, 1] - bounds[:, 0]) * 0.5
+        self.compute(indices)
+        self.dirty[block] = True
+        return indices
+
+    def release(self, index):
+        # Filhos de um índice liberado passam a ser raízes (a transformação local vira a do mundo)
+        children = self.linked[self.parents[self.linked] == index]
+        if len(children):
+            self.set_parent(children, -1)
+        if self.parents[index] >= 0:
+            self.set_parent(index, -1)
+        self.dirty[index] = False
+        self.free.append(index)
+
+    def set_parent(self, indices, parent):
+        """
+        Pendura um ou vários índices em `parent` (-1 solta); a transformação local é mantida.
+
+        `parent` pode ser um índice só ou um por filho (carga de cena, desfazer uma remoção).
+        """
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+        parents = np.broadcast_to(np.asarray(parent, dtype=np.int64), indices.shape)
+        previous = self.parents[indices].copy()
+        self.parents[indices] = parents
+        # Só as ligações novas podem fechar um ciclo, e ele passa por um dos índices
+        ancestors = self.parents[indices]
+        while (ancestors >= 0).any():
+            if (ancestors == indices).any():
+                self.parents[indices] = previous
+                raise ValueError(f"{indices[ancestors == indices][0]} não pode ser filho de um descendente seu")
+            ancestors = np.where(ancestors >= 0, self.parents[np.maximum(ancestors, 0)], -1)
+        self.linked = np.flatnonzero(self.parents[:self.size] >= 0)
+        # Profundidade de cada nó da subárvore: quantos ancestrais ele tem
+        subtree = self.descendants(indices)
+        depth = np.zeros(len(subtree), dtype=np.int32)
+        ancestors = self.parents[subtree]
+        while (ancestors >= 0).any():
+            depth += ancestors >= 0
+            ancestors = np.where(ancestors >= 0, self.parents[np.maximum(ancestors, 0)], -1)
+        self.depth[subtree] = depth
+        self.dirty[indices] = True
+
+    def children_of(self, indices):
+        """ Filhos diretos de qualquer um dos índices """
+        if not len(self.linked):
+            return np.zeros(0, dtype=np.int64)
+        mask = np.zeros(self.size, dtype=bool)
+        mask[indices] = True
+        return self.linked[mask[self.parents[self.linked]]]
+
+    def descendants(self, indices):
+        """ Os índices e todos os seus descendentes """
+        found = [np.asarray(indices, dtype=np.int64)]
+        level = self.children_of(found[0])
+        while len(level):
+            found.append(level)
+            level = self.children_of(level)
+        return np.unique(np.concatenate(found))
+
+    def compute_dirty(self):
+        """ Recalcula os índices sujos e suas subárvores, em ordem topológica; retorna os índices """
+        indices = np.flatnonzero(self.dirty[:self.size])
+        if len(indices) and len(self.linked):
+            indices = self.descendants(indices)
+            depth = self.depth[indices]
+            for level in np.unique(depth).tolist():
+                self.compute(indices[depth == level])
+        elif len(indices):
+            self.compute(indices)
+        self.dirty[indices] = False
+        return indices
+
+    def mark_dirty(self, index):
+        self.dirty[index] = True
+
+    def translate(self, indices, delta):
+        """ Desloca um ou vários objetos de uma vez """
+        self.positions[indices] += np.asarray(delta, dtype='f4')
+        self.dirty[indices] = True
+
+    def rotate(self, indices, delta):
+        """ Soma `delta` (radianos) à rotação de um ou vários objetos """
+        self.rotations[indices] += np.asarray(delta, dtype='f4')
+        self.dirty[indices] = True
+
+    def snap_dirty(self):
+        """ Recalcula o que mudou fora dos passos (ex.: hotkey): salta para o estado novo, sem interpolar """
+        if len(self.moving) and len(self.linked):
+            # Filhos recalculados aqui partem da matriz do passo do pai, não da interpolada
+            self.matrices[self.moving] = self.step_to
+        indices = self.compute_dirty()
+        if len(indices):
+            keep = ~np.isin(self.moving, indices)
+            self.moving, self.step_from, self.step_to = self.moving[keep], self.step_from[keep], self.step_to[keep]
+        return indices
+
+    def update(self):
+        """ Recalcula numa única passada vetorizada as matrizes (e AABBs) sujas e retorna seus índices """
+        indices = self.snap_dirty()
+        if len(self.stepped):
+            indices = np.union1d(indices, self.stepped)
+            self.stepped = np.zeros(0, dtype=np.int64)
+        return indices
+
+    def begin_step(self):
+        """ Início de um passo fixo: edições feitas antes dele (eventos do frame) não entram na interpolação """
+        self.stepped = np.union1d(self.stepped, self.snap_dirty())
+
+    def end_step(self):
+        """ Fim de um passo fixo: recalcula os objetos movidos guardando a matriz anterior para interpolar """
+        if len(self.moving):
+            self.matrices[self.moving] = self.step_to
+        dirty = np.flatnonzero(self.dirty[:self.size])
+        indices = self.descendants(dirty) if len(dirty) and len(self.linked) else dirty
+        before = self.matrices[indices].copy()
+        self.compute_dirty()
+        self.stepped = np.union1d(self.stepped, indices)
+        # Objetos novos já tinham a matriz final: só interpola quem de fato mudou
+        changed = (before != self.matrices[indices]).any(axis=(1, 2))
+        self.moving = indices[changed]
+        self.step_from = before[changed]
+        self.step_to = self.matrices[self.moving].copy()
+
+    def interpolate(self, alpha):
+        """ Matrizes de render entre o passo anterior e o atual; retorna os índices alterados """
+        if len(self.moving):
+            self.matrices[self.moving] = self.step_from + (self.step_to - self.step_from) * alpha
+        return self.moving
+
+    def compute(self, indices):
+        if self.pool is not None and len(indices) >= 2 * PARALLEL_MIN:
+            # Cada pedaço escreve em índices distintos, então as threads não disputam memória
+            self.pool.map_chunks(self.compute_chunk, indices)
+        else:
+            self.compute_chunk(indices)
+
+    def compute_chunk(self, indices):
+        # M = T * Rx * Ry * Rz * S, a mesma ordem usada antes com glm
+        sx, sy, sz = np.sin(self.rotations[indices]).T
+        cx, cy, cz = np.cos(self.rotations[indices]).T
+        zero, one = np.zeros_like(sx), np.ones_like(sx)
+
+        rx = np.stack([one, zero, zero, zero, cx, -sx, zero, sx, cx], axis=-1).reshape(-1, 3, 3)
+        ry = np.stack([cy, zero, sy, zero, one, zero, -sy, zero, cy], axis=-1).reshape(-1, 3, 3)
+        rz = np.stack([cz, -sz, zero, sz, cz, zero, zero, zero, one], axis=-1).reshape(-1, 3, 3)
+        linear = rx @ ry @ rz * self.scales[indices][:, None, :]
+
+        # Column-major: a coluna j da matriz matemática vira a linha j do array
+        m_model = np.zeros((len(indices), 4, 4), dtype='f4')
+        m_model[:, :3, :3] = linear.transpose(0, 2, 1)
+        m_model[:, 3, :3] = self.positions[indices]
+        m_model[:, 3, 3] = 1
+        position = self.positions[indices]
+
+        # Filhos: mundo = pai * local, que no layout column-major é local @ pai
+        parents = self.parents[indices]
+        child = parents >= 0
+        if child.any():
+            m_model[child] = m_model[child] @ self.matrices[parents[child]]
+            linear = m_model[:, :3, :3].transpose(0, 2, 1)
+            position = m_model[:, 3, :3]
+        self.matrices[indices] = m_model
+
+        # AABB no mundo: centro transformado e extensão projetada por |M|
+        center = np.einsum('nij,nj->ni', linear, self.local_center[indices]) + position
+        extent = np.einsum('nij,nj->ni', np.abs(linear), self.local_extent[indices])
+        self.aabb_min[indices] = center - extent
+        self.aabb_max[indices] = center + extent
@@ -1,27 +1,100 @@
+import re
+from functools import partial
+import moderngl as mgl
 from vbo import VBO
+from mesh_import import ImportedVBO
+from resources import LazyRegistry
 from shader_program import ShaderProgram
 
+def attribute_bytes(token):
+    """ Bytes de um item do formato de buffer do moderngl ('2f', '3f2', '1i', ...) """
+    count, _, size = re.fullmatch(r'(\d*)([fiu])(\d?)', token).groups()
+    return int(count or 1) * int(size or 4)
+
+
+def layout(program, fmt, attribs):
+    """ Formato e atributos do buffer para `program`: atributos que ele não declara viram padding """
+    tokens = fmt.split()
+    tokens[-1], slash, divisor = tokens[-1].partition('/')
+    parts, names = [], []
+    for token, name in zip(tokens, attribs):
+        if isinstance(program.get(name, None), mgl.Attribute):
+            parts.append(token)
+            names.append(name)
+        else:
+            parts.append(f'{attribute_bytes(token)}x')
+    return ' '.join(parts) + slash + divisor, names
+
+
 class VAO:
-    def __init__(self, ctx):
+    def __init__(self, ctx, resources):
         self.ctx = ctx
-        self.vbo = VBO(ctx)
+        self.vbo = VBO(ctx, resources)
         self.program = ShaderProgram(ctx)
-        self.vaos = {}
-
-        # cube vao
-        self.vaos['cube'] = self.get_vao(
-            program=self.program.programs['default'],
-            vbo = self.vbo.vbos['cube'])
-
-        # sphere
-        self.vaos['sphere'] = self.get_vao(
-            program=self.program.programs['default'],
-            vbo = self.vbo.vbos['sphere'])
-        
-    def get_vao(self, program, vbo):
-        vao = self.ctx.vertex_array(program, [(vbo.vbo, vbo.format, *vbo.attribs)], skip_errors=True)
+        # cube, sphere and the sphere LOD variants are built on first use (vaos[name])
+        self.vaos = LazyRegistry(self.create)
+        self.programs = {}  # vao name -> program name (default: 'default')
+        self.imports = {}   # vao name -> file in models/ of imported meshes (saved with scenes)
+        self.unused = set()  # (program glo, attribute) already reported as missing from the shader
+        self.program.add_listener(self.on_program)
+        resources.add_listener('vao', self.unload)
+
+    def create(self, name):
+        program = self.program.programs[self.programs.get(name, 'default')]
+        return self.get_vao(program=program, vbo=self.vbo.vbos[name])
+
+    def get_vao(self, program, vbo, instance_buffer=None):
+        buffers = [(vbo.vbo, vbo.format, vbo.attribs)]
+        # per-instance model matrix and texture array layer
+        if instance_buffer is not None:
+            buffers.append((instance_buffer, '16f 1i/i', ['in_model', 'in_layer']))
+        content = []
+        for buffer, fmt, attribs in buffers:
+            fmt, names = layout(program, fmt, attribs)
+            # an attribute the shader does not declare is padded explicitly, so a misspelled
+            # input shows up here instead of silently reading a constant
+            for name in set(attribs) - set(names):
+                self.report_unused(program, name)
+            if names:
+                content.append((buffer, fmt, *names))
+        vao = self.ctx.vertex_array(program, content, index_buffer=vbo.ibo, index_element_size=4)
+        # the index buffer comes from a pool and may be larger than the mesh
+        vao.vertices = vbo.index_count
         return vao
 
+    def report_unused(self, program, name):
+        key = (program.glo, name)
+        if key not in self.unused:
+            self.unused.add(key)
+            print(f"VAO: o programa {program.glo} não declara o atributo {name}; os dados dele são ignorados")
+
+    def on_program(self, name, old, new):
+        """ Hot reload: refaz com o programa novo os VAOs que usavam o antigo """
+        if old is None:
+            return
+        for vao_name, vao in list(self.vaos.items()):
+            if vao.program is old:
+                self.vaos[vao_name] = self.get_vao(program=new, vbo=self.vbo.vbos[vao_name])
+                vao.release()
+
+    def unload(self, name):
+        """ Solta o VAO `name` (e as variantes de LOD) sem objetos na cena; recriado no próximo uso """
+        for variant in self.vbo.lods.get(name, [name]):
+            vao = self.vaos.pop(variant, None)
+            if vao is not None:
+                vao.release()
+            self.vbo.unload(variant)
+
+    def import_mesh(self, name, path, program='default'):
+        """ Importa um .obj/.glb (relativo a models/) e registra o VBO e o VAO como `name` """
+        self.unload(name)  # reimportação com o mesmo nome
+        self.vbo.register(name, partial(ImportedVBO, path=path))
+        self.imports[name] = path
+        self.programs[name] = program
+        return self.vaos[name]
+
     def destroy(self):
+        [vao.release() for vao in self.vaos.values()]
+        self.vaos.clear()
         self.vbo.destroy()
-        self.program.destroy()
\ No newline at end of file
+        self.program.destroy()
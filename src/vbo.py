@@ -1,44 +1,91 @@
+from functools import partial
 import numpy as np
+from resources import LazyRegistry
+
+# bands per sphere LOD level, finest first (level 0 is 'sphere')
+SPHERE_LODS = (20, 12, 8, 5)
 
 class VBO:
-    def __init__(self, ctx):
-        self.vbos = {}
-        self.vbos['cube'] = CubeVBO(ctx)
-        self.vbos['sphere'] = SphereVBO(ctx)
+    def __init__(self, ctx, resources):
+        self.ctx = ctx
+        self.resources = resources
+        # name -> factory(ctx, resources); the VBO is built on first access to vbos[name]
+        self.factories = {'cube': CubeVBO, 'sphere': SphereVBO}
+        self.vbos = LazyRegistry(self.create)
+
+        # LOD chains: base name -> names of the variants, finest first
+        self.lods = {'sphere': ['sphere']}
+        for level, bands in enumerate(SPHERE_LODS[1:], start=1):
+            name = f'sphere_lod{level}'
+            self.factories[name] = partial(SphereVBO, latitude_bands=bands, longitude_bands=bands)
+            self.lods['sphere'].append(name)
+
+    def create(self, name):
+        if name not in self.factories:
+            raise KeyError(f"VBO '{name}' não registrado")
+        return self.factories[name](self.ctx, self.resources)
+
+    def register(self, name, factory):
+        self.factories[name] = factory
+
+    def unload(self, name):
+        """ Devolve os buffers do VBO ao pool; ele é recriado no próximo acesso """
+        vbo = self.vbos.pop(name, None)
+        if vbo is not None:
+            vbo.destroy()
 
     def destroy(self):
         [vbo.destroy() for vbo in self.vbos.values()]
+        self.vbos.clear()
 
 
 class BaseVBO:
-    def __init__(self, ctx):
+    def __init__(self, ctx, resources):
         self.ctx = ctx
+        self.resources = resources
         self.vbo = self.get_vbo()
         self.format: str = None
         self.attribs: list = None
 
+    # returns (vertex_data, index_data): compact vertices + uint32 triangle indices
     def get_vertex_data(self): ...
 
-    # Vertex data to GPU memory
+    # Vertex and index data to GPU memory
     def get_vbo(self):
-        vertex_data = self.get_vertex_data()
-        vbo = self.ctx.buffer(vertex_data)
+        vertex_data, index_data = self.get_vertex_data()
+        self.vertex_count = len(vertex_data)
+        self.index_count = len(index_data)
+        # local AABB of in_position (last 3 floats of each vertex)
+        positions = vertex_data[:, -3:]
+        self.bounds = (positions.min(axis=0), positions.max(axis=0))
+        # pooled buffers may be larger than the data: draws use index_count (VAO.get_vao)
+        self.ibo = self.resources.buffer(index_data.astype('u4'), category='index')
+        vbo = self.resources.buffer(vertex_data.astype('f4'), category='vertex')
         return vbo
 
+    @staticmethod
+    def deduplicate(vertex_data):
+        # unique rows in first-occurrence order, plus the index of each original row
+        unique, first, inverse = np.unique(vertex_data, axis=0, return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        remap = np.empty_like(order)
+        remap[order] = np.arange(len(order))
+        return unique[order], remap[inverse.ravel()].astype('u4')
+
     def destroy(self):
-        self.vbo.release()
+        self.resources.release_buffer(self.vbo)
+        self.resources.release_buffer(self.ibo)
 
 
 class CubeVBO(BaseVBO):
-    def __init__(self, ctx):
-        super().__init__(ctx)
+    def __init__(self, ctx, resources):
+        super().__init__(ctx, resources)
         self.format = '2f 3f 3f'
         self.attribs = ['in_texcoord_0', 'in_normal', 'in_position']
 
     @staticmethod
     def get_data(vertices, indices):
-        data = [vertices[ind] for triangle in indices for ind in triangle]
-        return np.array(data, dtype='f4')
+        return np.array(vertices, dtype='f4')[np.array(indices).ravel()]
 
     def get_vertex_data(self):
         vertices = [(-1, -1, 1), ( 1, -1,  1), (1,  1,  1), (-1, 1,  1),
@@ -71,64 +118,45 @@ class CubeVBO(BaseVBO):
 
         vertex_data = np.hstack([normals, vertex_data])
         vertex_data = np.hstack([tex_coord_data, vertex_data])
-        return vertex_data
+        # 36 expanded corners -> 24 unique (uv, normal, position) vertices
+        return self.deduplicate(vertex_data)
 
 class SphereVBO(BaseVBO):
-    def __init__(self, ctx, latitude_bands=20, longitude_bands=20):
+    def __init__(self, ctx, resources, latitude_bands=20, longitude_bands=20):
         self.latitude_bands = latitude_bands
         self.longitude_bands = longitude_bands
-        super().__init__(ctx)
+        super().__init__(ctx, resources)
         self.format = '2f 3f 3f'
         self.attribs = ['in_texcoord_0', 'in_normal', 'in_position']
     
     def get_vertex_data(self):
         vertices, normals, tex_coords, indices = self.generate_sphere()
-        
-        vertex_data = np.array([vertices[i] for i in indices], dtype='f4')
-        normal_data = np.array([normals[i] for i in indices], dtype='f4')
-        tex_coord_data = np.array([tex_coords[i] for i in indices], dtype='f4')
-        
-        vertex_data = np.hstack([tex_coord_data, normal_data, vertex_data])
-        return vertex_data
-    
+        vertex_data = np.hstack([tex_coords, normals, vertices]).astype('f4')
+        return vertex_data, indices
+
     def generate_sphere(self):
-        vertices = []
-        normals = []
-        tex_coords = []
-        indices = []
-        
-        for lat in range(self.latitude_bands + 1):
-            theta = lat * np.pi / self.latitude_bands
-            sin_theta = np.sin(theta)
-            cos_theta = np.cos(theta)
-            
-            for lon in range(self.longitude_bands + 1):
-                phi = lon * 2 * np.pi / self.longitude_bands
-                sin_phi = np.sin(phi)
-                cos_phi = np.cos(phi)
-                
-                x = cos_phi * sin_theta
-                y = cos_theta
-                z = sin_phi * sin_theta
-                
-                u = 1 - (lon / self.longitude_bands)
-                v = 1 - (lat / self.latitude_bands)
-                
-                vertices.append((x, y, z))
-                normals.append((x, y, z))
-                tex_coords.append((u, v))
-        
-        for lat in range(self.latitude_bands):
-            for lon in range(self.longitude_bands):
-                first = lat * (self.longitude_bands + 1) + lon
-                second = first + self.longitude_bands + 1
-                
-                indices.append(first)
-                indices.append(second)
-                indices.append(first + 1)
-                
-                indices.append(second)
-                indices.append(second + 1)
-                indices.append(first + 1)
-        
-        return vertices, normals, tex_coords, indices
\ No newline at end of file
+        lat = np.arange(self.latitude_bands + 1)
+        lon = np.arange(self.longitude_bands + 1)
+        theta = lat * np.pi / self.latitude_bands
+        phi = lon * 2 * np.pi / self.longitude_bands
+
+        # (lat, lon) grid flattened row by row, latitude outermost
+        sin_theta, cos_theta = np.sin(theta)[:, None], np.cos(theta)[:, None]
+        sin_phi, cos_phi = np.sin(phi)[None, :], np.cos(phi)[None, :]
+        x = (cos_phi * sin_theta).ravel()
+        y = np.broadcast_to(cos_theta, (len(lat), len(lon))).ravel()
+        z = (sin_phi * sin_theta).ravel()
+        vertices = np.stack([x, y, z], axis=1)
+        normals = vertices
+
+        u = np.broadcast_to(1 - lon / self.longitude_bands, (len(lat), len(lon))).ravel()
+        v = np.broadcast_to((1 - lat / self.latitude_bands)[:, None], (len(lat), len(lon))).ravel()
+        tex_coords = np.stack([u, v], axis=1)
+
+        # two triangles per quad: (first, second, first + 1), (second, second + 1, first + 1)
+        first = (lat[:-1, None] * (self.longitude_bands + 1) + lon[None, :-1]).ravel()
+        second = first + self.longitude_bands + 1
+        indices = np.stack([first, second, first + 1,
+                            second, second + 1, first + 1], axis=1).ravel().astype('u4')
+
+        return vertices, normals, tex_coords, indices
@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """ GraphicsEngine headless pequeno, sem os objetos padrão (shaders e texturas lidos de src/) """
+    monkeypatch.chdir(SRC)
+    from main import GraphicsEngine
+    engine = GraphicsEngine(window_size=(320, 180), headless=True)
+    engine.scene.despawn(list(engine.scene.by_index))
+    engine.mesh.texture.wait()
+    yield engine
+    engine.destroy()
+
@@ -0,0 +1,42 @@
+import numpy as np
+from bvh import BVH, OUTSIDE, classify_aabbs
+
+
+def brute_force(transforms, alive, planes):
+    indices = np.array(sorted(alive), dtype=np.int64)
+    state = classify_aabbs(transforms.aabb_min[indices], transforms.aabb_max[indices], planes)
+    return indices[state != OUTSIDE]
+
+
+def test_query_matches_brute_force(app):
+    t = app.transforms
+    rng = np.random.default_rng(1)
+    count = 10000  # acima de 2 * PARALLEL_MIN: a consulta também passa pelo caminho em threads
+    indices = t.allocate_many(rng.uniform(-60, 60, (count, 3)).astype('f4'), np.zeros((count, 3), 'f4'),
+                              rng.uniform(0.2, 3, (count, 3)).astype('f4'), ((-1, -1, -1), (1, 1, 1)))
+    bvh = BVH(t, app.pool)
+    bvh.insert_many(indices)
+    bvh.build()
+    alive = set(indices.tolist())
+
+    # Movidos (refit), removidos e inseridos depois da construção (pendentes)
+    moved = rng.choice(indices, 300, replace=False)
+    t.translate(moved, rng.uniform(-20, 20, (300, 3)).astype('f4'))
+    t.update()
+    bvh.refit(moved)
+    for index in rng.choice(indices, 200, replace=False).tolist():
+        bvh.remove(index)
+        alive.discard(index)
+    extra = t.allocate_many(rng.uniform(-60, 60, (50, 3)).astype('f4'), np.zeros((50, 3), 'f4'),
+                            np.ones((50, 3), 'f4'), ((-1, -1, -1), (1, 1, 1)))
+    bvh.insert_many(extra)
+    alive.update(extra.tolist())
+
+    for pose in (((0, 0, 80), -90, 0), ((90, 20, 0), 180, -10), ((-50, 60, -90), 60, -30)):
+        app.camera.follow(pose)
+        planes = app.camera.get_frustum_planes()
+        expected = brute_force(t, alive, planes)
+        assert 0 < len(expected) < len(alive)
+        for pool in (app.pool, None):
+            bvh.pool = pool
+            assert np.array_equal(np.sort(bvh.query(planes)), expected)
@@ -0,0 +1,94 @@
+import numpy as np
+import history
+from objects import Cube
+
+
+def add_cubes(app, count):
+    positions = np.zeros((count, 3), 'f4')
+    positions[:, 0] = np.arange(count) * 3
+    return app.scene.add_objects_from_arrays(np.zeros(count, 'u1'), np.zeros(count, 'i4'), positions,
+                                             np.zeros((count, 3), 'f4'), np.ones((count, 3), 'f4'))
+
+
+def test_moves_of_the_same_object_coalesce(app, monkeypatch):
+    scene = app.scene
+    cube, other = add_cubes(app, 2)
+    scene.translate_object(cube, (1, 0, 0))
+    scene.translate_object(cube, (1, 0, 0))
+    assert len(scene.history) == 1
+    # Outro tipo de comando, outro objeto ou fora da janela: entradas separadas
+    scene.rotate_object(cube, (10, 0, 0))
+    scene.translate_object(other, (0, 1, 0))
+    monkeypatch.setattr(history.time, 'perf_counter', lambda: 1e9)
+    scene.translate_object(other, (0, 1, 0))
+    assert len(scene.history) == 4
+
+    for _ in range(4):
+        scene.undo()
+    assert tuple(cube.pos) == (0, 0, 0) and tuple(cube.rot) == (0, 0, 0)
+    assert tuple(other.pos) == (3, 0, 0)
+    scene.redo()
+    assert tuple(cube.pos) == (2, 0, 0)
+
+
+def test_batch_undoes_in_one_step(app):
+    scene = app.scene
+    cube, = add_cubes(app, 1)
+    with scene.history.batch():
+        scene.translate_object(cube, (1, 0, 0))
+        pasted = scene.paste(np.ones(2, 'u1'), np.zeros(2, 'i4'), np.ones((2, 3), 'f4'),
+                             np.zeros((2, 3), 'f4'), np.ones((2, 3), 'f4'))
+    assert len(scene.history) == 1
+    scene.undo()
+    assert tuple(cube.pos) == (0, 0, 0)
+    assert all(obj.index not in scene.by_index for obj in pasted)
+    scene.redo()
+    assert tuple(cube.pos) == (1, 0, 0)
+    assert all(obj.index in scene.by_index for obj in pasted)
+
+
+def test_entry_and_byte_caps_drop_the_oldest(app):
+    scene = app.scene
+    objects = add_cubes(app, 5)
+    scene.history.max_entries = 3
+    for obj in objects:
+        scene.translate_object(obj, (0, 1, 0))
+    assert len(scene.history) == 3
+    assert scene.history.evicted == 2
+    # Desfazer só alcança as entradas que ficaram
+    for _ in range(5):
+        scene.undo()
+    assert [obj.pos.y for obj in objects] == [1, 1, 0, 0, 0]
+
+    scene.history.clear()
+    removed = objects[0]
+    scene.remove_object(removed)
+    scene.history.max_bytes = scene.history.nbytes
+    scene.translate_object(objects[1], (0, 1, 0))
+    # A remoção saiu do histórico: o handle do objeto removido volta para o TransformStore
+    assert len(scene.history) == 1
+    assert removed.index in app.transforms.free
+
+
+def test_undo_redo_spawn_and_despawn(app):
+    scene = app.scene
+    parent = Cube(app, pos=(1, 2, 3))
+    scene.add_object(parent)
+    child = Cube(app, pos=(0, 1, 0), rot=(0, 45, 0), tex_id=2)
+    scene.add_object(child)
+
+    scene.undo()  # desfaz a criação do filho
+    assert child.index not in scene.by_index
+    scene.redo()
+    respawned = scene.by_index[child.index]
+    assert respawned.tex_id == 2
+    assert np.allclose(respawned.rot, child.rot)
+
+    scene.attach([respawned], parent)
+    scene.remove_object(respawned)
+    assert child.index not in scene.by_index
+    scene.undo()  # a remoção volta com o pai e a transformação relativa a ele
+    restored = scene.by_index[child.index]
+    assert scene.parent(restored) is parent
+    app.run_frames(1)
+    assert np.allclose(restored.world_pos, (1, 3, 3))
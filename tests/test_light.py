@@ -0,0 +1,20 @@
+import numpy as np
+from light import Light
+
+
+def test_tiles_without_lights_keep_the_ambient(app):
+    # Única luz com alcance curto e longe da câmera: nenhum tile da tela tem luzes
+    app.lights.remove(app.light)
+    light = app.lights.add(Light(position=(0, 0, 500), color=(1, 1, 1), radius=1.0))
+    app.scene.add_objects_from_arrays(np.zeros(1, 'u1'), np.zeros(1, 'i4'), np.zeros((1, 3), 'f4'),
+                                      np.zeros((1, 3), 'f4'), np.full((1, 3), 1.5, 'f4'))
+    assert np.allclose(app.lights.ambient(), light.Ia)
+    for instanced in (False, True):
+        app.scene.instanced = instanced
+        app.run_frames(1)
+        assert app.lights.stats['pairs'] == 0
+        pixels = np.frombuffer(app.fbo.read(components=3), dtype=np.uint8).reshape(app.WIN_SIZE[1], app.WIN_SIZE[0], 3)
+        height, width = pixels.shape[:2]
+        center = pixels[height // 2 - 10:height // 2 + 10, width // 2 - 10:width // 2 + 10]
+        # Só a ambiente (0.1 da cor da luz) ilumina a face
+        assert center.max() > 0
@@ -0,0 +1,47 @@
+import json
+import struct
+import numpy as np
+import mesh_import
+
+OBJ = """\
+# tabs, recuo e faces com formatos misturados
+v 0 0 0
+\tv 1 0 0
+  v 0 1 0
+v 1 1 0
+vt 0 0
+vt 1 0
+vt 0 1
+vn 0 0 1
+f 1 2 3
+f\t2/2/1 4/1/1 3/3/1
+f 1//1 2 3/3/1
+"""
+
+
+def test_obj_keywords_and_mixed_face_formats(tmp_path):
+    path = tmp_path / 'mixed.obj'
+    path.write_text(OBJ)
+    vertex_data, index_data = mesh_import.load_obj(str(path))
+    corners = vertex_data[index_data].reshape(3, 3, 8)
+    assert np.array_equal(corners[:, :, 5:], [[[0, 0, 0], [1, 0, 0], [0, 1, 0]],
+                                              [[1, 0, 0], [1, 1, 0], [0, 1, 0]],
+                                              [[0, 0, 0], [1, 0, 0], [0, 1, 0]]])
+    # Sem vt, uv (0, 0); sem vn, a normal da face (aqui a mesma declarada)
+    assert np.array_equal(corners[0, :, :2], np.zeros((3, 2)))
+    assert np.array_equal(corners[1, :, :2], [[1, 0], [0, 0], [0, 1]])
+    assert np.array_equal(corners[2, :, :2], [[0, 0], [0, 0], [0, 1]])
+    assert np.allclose(corners[:, :, 2:5], (0, 0, 1))
+
+
+def test_glb_normalized_minimum_is_minus_one(tmp_path):
+    values = np.array([[-128, 127], [0, -127]], dtype='i1')
+    gltf = {'asset': {'version': '2.0'}, 'buffers': [{'byteLength': 4}],
+            'bufferViews': [{'buffer': 0, 'byteLength': 4}],
+            'accessors': [{'bufferView': 0, 'componentType': 5120, 'normalized': True,
+                           'count': 2, 'type': 'VEC2'}]}
+    text = json.dumps(gltf).encode().ljust(-(-len(json.dumps(gltf)) // 4) * 4, b' ')
+    chunks = struct.pack('<II', len(text), 0x4E4F534A) + text + struct.pack('<II', 4, 0x004E4942) + values.tobytes()
+    path = tmp_path / 'normalized.glb'
+    path.write_bytes(struct.pack('<4sII', b'glTF', 2, 12 + len(chunks)) + chunks)
+    assert np.allclose(mesh_import.GLBReader(str(path)).accessor(0), [[-1, 1], [0, -1]])
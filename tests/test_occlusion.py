@@ -0,0 +1,37 @@
+import math
+import numpy as np
+from occlusion import MAX_QUERIES, QUERY_LATENCY, RECHECK_INTERVAL
+
+
+def add_cubes(app, positions, scale):
+    n = len(positions)
+    return app.scene.add_objects_from_arrays(np.zeros(n, 'u1'), np.zeros(n, 'i4'), np.asarray(positions, 'f4'),
+                                             np.zeros((n, 3), 'f4'), np.tile(np.asarray(scale, 'f4'), (n, 1)))
+
+
+def test_all_occluded_objects_come_back_past_max_queries(app):
+    # Grade de cubos pequenos que não se cobrem, toda dentro do frustum, atrás de uma parede
+    xs, ys = np.meshgrid(np.linspace(-14, 14, 48), np.linspace(-8, 8, 32))
+    grid = np.c_[xs.ravel(), ys.ravel(), np.full(xs.size, -16)]
+    hidden = np.array([obj.index for obj in add_cubes(app, grid, (0.15, 0.15, 0.15))])
+    wall = add_cubes(app, [(0, 0, 2)], (3, 2, 0.05))[0]
+    assert len(hidden) > MAX_QUERIES
+    occlusion = app.scene.occlusion
+
+    # Visíveis são consultados 1 em RECHECK_INTERVAL por frame
+    app.run_frames(RECHECK_INTERVAL + 2)
+    assert occlusion.occluded[hidden].all()
+
+    app.scene.translate_object(wall, (0, 100, 0))
+    app.run_frames(math.ceil(len(hidden) / MAX_QUERIES) + 2)
+    assert not occlusion.occluded[hidden].any()
+
+
+def test_queries_are_read_only_after_query_latency_frames(app):
+    add_cubes(app, [(0, 0, 0), (3, 0, 0)], (1, 1, 1))
+    occlusion = app.scene.occlusion
+    for _ in range(QUERY_LATENCY + 3):
+        app.run_frames(1)
+        # Os lotes deste frame e do anterior continuam na GPU; só os mais velhos foram lidos
+        assert len(occlusion.in_flight) <= QUERY_LATENCY
+    assert len(occlusion.in_flight) == QUERY_LATENCY
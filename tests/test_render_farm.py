@@ -0,0 +1,21 @@
+import numpy as np
+import render_farm
+from lod import LOD_THRESHOLDS, HYSTERESIS
+
+
+def test_frame_does_not_depend_on_previous_frames_of_the_chunk(app, monkeypatch):
+    monkeypatch.setattr(render_farm, 'worker_app', app)
+    sphere, = app.scene.add_objects_from_arrays(np.ones(1, 'u1'), np.zeros(1, 'i4'), np.zeros((1, 3), 'f4'),
+                                                np.zeros((1, 3), 'f4'), np.ones((1, 3), 'f4'))
+    app.run_frames(1)
+    lod = app.scene.lod
+    _, radius = sphere.bounding_sphere
+    # Distância em que o raio na tela fica dentro da margem de histerese do primeiro limiar
+    far = radius * lod.pixel_scale / (LOD_THRESHOLDS[0] * (1 - HYSTERESIS / 2))
+    near_pose, far_pose = ((0, 0, far / 4), -90, 0), ((0, 0, far), -90, 0)
+
+    alone = render_farm.render_chunk(0, [far_pose])['frames'][0]
+    assert sphere.lod == 1
+    after_near = render_farm.render_chunk(0, [near_pose, far_pose])['frames'][1]
+    assert sphere.lod == 1
+    assert after_near == alone
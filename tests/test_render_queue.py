@@ -0,0 +1,27 @@
+import numpy as np
+
+
+def test_draws_sorted_by_state_then_front_to_back(app):
+    rng = np.random.default_rng(2)
+    count = 60
+    positions = rng.uniform(-4, 4, (count, 3)).astype('f4')
+    positions[:, 2] -= 15
+    app.scene.add_objects_from_arrays(rng.integers(0, 2, count).astype('u1'), rng.integers(0, 4, count).astype('i4'),
+                                      positions, np.zeros((count, 3), 'f4'), np.full((count, 3), 0.5, 'f4'))
+    app.run_frames(1)
+    queue = app.scene.queue
+    indices = np.fromiter(app.scene.by_index, dtype=np.int64)
+    order = queue.build(rng.permutation(indices))
+    assert np.array_equal(np.sort(order), np.sort(indices))
+
+    # Estado (programa, VAO, textura) não decresce; dentro do mesmo estado, de frente para trás
+    state = queue.state_keys[order]
+    assert (np.diff(state.astype(np.float64)) >= 0).all()
+    t = app.transforms
+    eye = np.array(app.camera.view_position, dtype='f4')
+    distance = (((t.aabb_min[order] + t.aabb_max[order]) * 0.5 - eye) ** 2).sum(axis=1)
+    same = state[1:] == state[:-1]
+    assert (distance[1:][same] >= distance[:-1][same]).all()
+    # Cada combinação de estado aparece num único trecho contíguo, então a fila não troca mais estado
+    assert np.count_nonzero(state[1:] != state[:-1]) + 1 == len(np.unique(state))
+    assert all(after <= before for before, after in queue.stats.values())
@@ -0,0 +1,39 @@
+import numpy as np
+import mesh_import
+from objects import Cube, Sphere
+
+
+def test_save_load_round_trip(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(mesh_import, 'CACHE_DIR', str(tmp_path / 'cache'))
+    mesh = tmp_path / 'tri.obj'
+    mesh.write_text("v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n")
+    scene = app.scene
+    app.mesh.vao.import_mesh('tri', str(mesh))
+
+    root = Sphere(app, tex_id=3, pos=(1, 2, 3), rot=(0, 30, 0))
+    child = Cube(app, tex_id=1, pos=(0, 2, 0), scale=(0.5, 0.5, 0.5))
+    imported = Cube(app, vao_name='tri', tex_id=2, pos=(-4, 0, 0))
+    for obj in (child, root, imported):  # filho antes do pai no arquivo
+        scene.add_object(obj)
+    scene.attach([child], root)
+    scene.attach([imported], child)
+    app.run_frames(1)
+    expected = [(type(obj), obj.vao_name, obj.tex_id, np.array(obj.pos), np.array(obj.world_pos))
+                for obj in scene.objects]
+
+    path = str(tmp_path / 'scene.e3ds')
+    assert scene.save(path, chunk_size=1) == 3
+    scene.despawn(list(scene.by_index))
+    app.mesh.vao.unload('tri')
+    del app.mesh.vao.vbo.factories['tri']
+
+    # Um chunk por objeto: o pai do primeiro só é lido no chunk seguinte
+    assert scene.load(path) == 3
+    app.run_frames(1)
+    loaded = scene.objects
+    assert [(type(obj), obj.vao_name, obj.tex_id) for obj in loaded] == [row[:3] for row in expected]
+    for obj, row in zip(loaded, expected):
+        assert np.allclose(obj.pos, row[3]) and np.allclose(obj.world_pos, row[4], atol=1e-5)
+    assert scene.parent(loaded[0]) is loaded[1]
+    assert scene.parent(loaded[2]) is loaded[0]
+    assert scene.parent(loaded[1]) is None
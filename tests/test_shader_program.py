@@ -0,0 +1,43 @@
+import shutil
+import numpy as np
+
+
+def test_reload_with_unused_uniforms_keeps_running(app, tmp_path):
+    app.scene.add_objects_from_arrays(np.zeros(1, 'u1'), np.zeros(1, 'i4'), np.zeros((1, 3), 'f4'),
+                                      np.zeros((1, 3), 'f4'), np.ones((1, 3), 'f4'))
+    app.run_frames(1)
+    shaders = app.mesh.vao.program
+    paths = dict(shaders.sources['default'])
+    # Cor constante: o compilador descarta as luzes, a textura e u_layer
+    vert = shutil.copy(paths['vertex_shader'], tmp_path / 'default.vert')
+    frag = tmp_path / 'default.frag'
+    source = open(paths['fragment_shader']).read()
+    frag.write_text(source[:source.index('void main()')] + 'void main() {\n    fragColor = vec4(1.0);\n}\n')
+    shaders.sources['default'] = {'vertex_shader': str(vert), 'fragment_shader': str(frag)}
+
+    old = shaders.programs['default']
+    shaders.reload('default')
+    assert shaders.programs['default'] is not old
+    app.run_frames(2)
+
+
+def test_poll_survives_missing_shader_file(app, tmp_path):
+    shaders = app.mesh.vao.program
+    old = shaders.programs['default']
+    paths = {stage: shutil.copy(path, tmp_path / path.rsplit('/', 1)[-1])
+             for stage, path in shaders.sources['default'].items()}
+    shaders.sources['default'] = {stage: str(path) for stage, path in paths.items()}
+    shaders.mtimes['default'] = shaders.get_mtimes('default')
+
+    # Salvar renomeando: o arquivo some por um instante
+    frag = tmp_path / 'default.frag'
+    source = frag.read_text()
+    frag.unlink()
+    shaders.last_check = 0
+    shaders.poll()
+    assert shaders.programs['default'] is old
+
+    frag.write_text(source.replace('void main() {', 'void main() {\n    float unused = 0.0;', 1))
+    shaders.last_check = 0
+    shaders.poll()
+    assert shaders.programs['default'] is not old
@@ -0,0 +1,24 @@
+import numpy as np
+import pygame as pg
+import texture
+
+
+def test_cache_keeps_mip_chain_and_skips_the_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(texture, 'CACHE_DIR', str(tmp_path / 'cache'))
+    image = np.random.default_rng(0).integers(0, 256, (8, 16, 3), dtype=np.uint8)
+    path = str(tmp_path / 'noise.png')
+    pg.image.save(pg.surfarray.make_surface(image.transpose(1, 0, 2)), path)
+
+    size, components, levels, cached, _ = texture.decode_image(path)
+    assert (size, components, cached) == ((16, 8), 3, False)
+    assert [len(level) for level in levels] == [w * h * 3 for w, h in texture.mip_sizes(size)]
+    # Nível 1 é a média de cada bloco 2x2 do nível 0
+    base = levels[0].reshape(8, 16, 3).astype(int)
+    expected = (base.reshape(4, 2, 8, 2, 3).sum(axis=(1, 3)) + 2) // 4
+    assert np.array_equal(levels[1].reshape(4, 8, 3), expected)
+
+    # Acerto do cache: a imagem não é aberta de novo
+    monkeypatch.setattr(pg.image, 'load', None)
+    _, _, warm, cached, _ = texture.decode_image(path)
+    assert cached
+    assert all(np.array_equal(a, b) for a, b in zip(levels, warm))
@@ -0,0 +1,14 @@
+import numpy as np
+
+
+def test_edit_outside_step_renders_final_pose(app):
+    obj = app.scene.add_objects_from_arrays(np.zeros(1, 'u1'), np.zeros(1, 'i4'), np.zeros((1, 3), 'f4'),
+                                            np.zeros((1, 3), 'f4'), np.ones((1, 3), 'f4'))[0]
+    app.run_frames(2)
+
+    # Como uma hotkey em check_events: antes de scheduler.advance() e do passo fixo
+    app.scene.translate_object(obj, (1, 0, 0))
+    app.run_frames(1)
+    assert app.scheduler.alpha == 0  # headless: um passo por frame, sem sobra para interpolar
+    np.testing.assert_allclose(app.transforms.matrices[obj.index][3, :3], (1, 0, 0))
+    assert obj.index not in app.transforms.moving
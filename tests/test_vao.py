@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def frame_pixels(app):
+    app.run_frames(1)
+    pixels = np.frombuffer(app.fbo.read(components=3), dtype=np.uint8).astype(int)
+    return pixels.reshape(app.WIN_SIZE[1], app.WIN_SIZE[0], 3)
+
+
+def test_mesh_attributes_bound_in_both_render_modes(app):
+    # Um cubo texturizado de frente para a câmera: sem UVs a face sairia de uma cor só
+    app.scene.add_objects_from_arrays(np.zeros(1, 'u1'), np.zeros(1, 'i4'), np.zeros((1, 3), 'f4'),
+                                      np.zeros((1, 3), 'f4'), np.full((1, 3), 1.5, 'f4'))
+    per_object = frame_pixels(app)
+    app.scene.instanced = True
+    instanced = frame_pixels(app)
+
+    assert app.mesh.vao.unused == set()
+    # Centro da face: a textura varia, a iluminação quase não
+    height, width = per_object.shape[:2]
+    center = per_object[height // 2 - 20:height // 2 + 20, width // 2 - 20:width // 2 + 20]
+    assert center.reshape(-1, 3).std(axis=0).max() > 1
+    assert np.abs(per_object - instanced).max() <= 1